@@ -0,0 +1,47 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from studydeck import caching
+
+PERMISSION_TIMEOUT = 60 * 60
+VERSION_KEY = "accounts:permissions:version"
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def invalidate():
+    # Any group or permission change can affect many users, so every cached
+    # permission set is dropped at once by moving to a new version
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend whose per-user permission sets are cached across requests
+    instead of being loaded from the user/group permission tables on every
+    page that checks ``perms``.
+
+    Only with a shared cache: a local-memory cache would keep serving a
+    revoked permission in every other worker until it expired, so without
+    one this behaves exactly like ModelBackend.
+    """
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        if not caching.is_shared():
+            return super()._get_permissions(user_obj, obj, from_name)
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        perm_cache_name = f"_{from_name}_perm_cache"
+        if not hasattr(user_obj, perm_cache_name):
+            key = f"accounts:permissions:{_version()}:{user_obj.pk}:{from_name}"
+            perms = cache.get(key)
+            if perms is None:
+                perms = super()._get_permissions(user_obj, obj, from_name)
+                cache.set(key, perms, PERMISSION_TIMEOUT)
+            setattr(user_obj, perm_cache_name, perms)
+        return getattr(user_obj, perm_cache_name)
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import permissions
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_on_membership_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        permissions.invalidate()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_on_delete(sender, **kwargs):
+    permissions.invalidate()
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only touch last_login; superuser/active changes alter the set
+    if created or update_fields == frozenset({"last_login"}):
+        return
+    permissions.invalidate()
@@ -1,3 +1,47 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+User = get_user_model()
+
+
+class CachedPermissionBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("alice", "alice@example.com", "pw")
+        cls.permission = Permission.objects.get(codename="view_report_page")
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_user(self):
+        # Permission sets are also memoized on the user object
+        return User.objects.get(pk=self.user.pk)
+
+    def test_without_a_shared_cache_revocations_apply_at_once(self):
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.fresh_user().has_perm("forum.view_report_page"))
+        # Another worker's invalidation never reaches this process's cache
+        User.user_permissions.through.objects.filter(user=self.user).delete()
+        self.assertFalse(self.fresh_user().has_perm("forum.view_report_page"))
+
+    def test_shared_cache_serves_permissions_until_they_change(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+        ):
+            self.user.user_permissions.add(self.permission)
+            self.assertTrue(self.fresh_user().has_perm("forum.view_report_page"))
+            user = self.fresh_user()
+            with self.assertNumQueries(0):
+                self.assertTrue(user.has_perm("forum.view_report_page"))
+
+            self.user.user_permissions.remove(self.permission)
+            self.assertFalse(self.fresh_user().has_perm("forum.view_report_page"))
@@ -1,12 +1,246 @@
+import json
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.functions import Left
+from django.utils.functional import cached_property
 
 from . import models
 
-# Register your models here.
-admin.site.register(models.Course)
-admin.site.register(models.Resource)
-admin.site.register(models.Thread)
-admin.site.register(models.Tag)
-admin.site.register(models.Category)
-admin.site.register(models.Reply)
-admin.site.register(models.Report)
+# Planner estimates below this are cheap enough to replace with an exact count
+EXACT_COUNT_THRESHOLD = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    # NOTE: Estimates are only available on PostgreSQL, other databases
+    # fall back to the exact COUNT(*)
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return super().count
+
+        with connection.cursor() as cursor:
+            if queryset.query.where:
+                sql, params = queryset.values("pk").query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = int(plan[0]["Plan"]["Plan Rows"])
+            else:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                # reltuples is -1 for tables that were never analyzed
+                estimate = row[0] if row else -1
+
+        if estimate < EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/forum/large_table_change_list.html"
+
+
+@admin.register(models.Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = ("code", "title", "department")
+    search_fields = ("code", "title")
+    ordering = ("code",)
+
+
+@admin.register(models.Resource)
+class ResourceAdmin(admin.ModelAdmin):
+    list_display = ("title", "course", "type")
+    list_select_related = ("course",)
+    list_filter = ("type",)
+    search_fields = ("title", "course__code")
+    autocomplete_fields = ("course",)
+
+
+@admin.register(models.Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug")
+    search_fields = ("name",)
+    prepopulated_fields = {"slug": ("name",)}
+
+
+@admin.register(models.Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug")
+    search_fields = ("name",)
+    prepopulated_fields = {"slug": ("name",)}
+
+
+@admin.register(models.Thread)
+class ThreadAdmin(LargeTableAdmin):
+    list_display = (
+        "title",
+        "author",
+        "category",
+        "course",
+        "created_timestamp",
+        "is_locked",
+        "is_deleted",
+    )
+    list_select_related = ("author", "category", "course")
+    list_filter = ("is_deleted", "is_locked", "category")
+    search_fields = ("title",)
+    date_hierarchy = "created_timestamp"
+    ordering = ("-created_timestamp",)
+    raw_id_fields = ("author",)
+    autocomplete_fields = ("course", "resource", "category", "tags")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("content")
+
+
+@admin.register(models.Reply)
+class ReplyAdmin(LargeTableAdmin):
+    list_display = (
+        "id",
+        "thread_title",
+        "author",
+        "content_preview",
+        "created_timestamp",
+        "is_deleted",
+    )
+    list_select_related = ("author", "thread")
+    list_filter = ("is_deleted",)
+    date_hierarchy = "created_timestamp"
+    ordering = ("-created_timestamp",)
+    raw_id_fields = ("thread", "parent", "author")
+
+    def get_queryset(self, request):
+        # Only the first 100 characters are shown, so don't fetch whole bodies
+        return (
+            super()
+            .get_queryset(request)
+            .defer("content", "thread__content")
+            .annotate(content_preview=Left("content", 100))
+        )
+
+    @admin.display(description="Thread", ordering="thread__title")
+    def thread_title(self, obj):
+        return obj.thread.title
+
+    @admin.display(description="Content")
+    def content_preview(self, obj):
+        return obj.content_preview
+
+
+@admin.register(models.Report)
+class ReportAdmin(LargeTableAdmin):
+    list_display = (
+        "id",
+        "thread_title",
+        "reply_id",
+        "author",
+        "created_timestamp",
+        "resolved",
+    )
+    list_select_related = ("author", "thread")
+    list_filter = ("resolved",)
+    date_hierarchy = "created_timestamp"
+    ordering = ("-created_timestamp",)
+    raw_id_fields = ("author", "thread", "reply")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("thread__content")
+
+    @admin.display(description="Thread", ordering="thread__title")
+    def thread_title(self, obj):
+        return obj.thread.title
+
+
+@admin.register(models.SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("short_sql", "view", "count", "max_ms", "average_ms", "last_seen")
+    list_filter = ("view",)
+    search_fields = ("sql", "view", "frame")
+    ordering = ("-max_ms",)
+    readonly_fields = [field.name for field in models.SlowQuery._meta.fields]
+
+    @admin.display(description="SQL")
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    @admin.display(description="Average ms")
+    def average_ms(self, obj):
+        return round(obj.total_ms / obj.count, 1)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.ForumEvent)
+class ForumEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "sequence",
+        "type",
+        "actor_id",
+        "thread_id",
+        "reply_id",
+        "created_timestamp",
+    )
+    list_filter = ("type",)
+    ordering = ("-id",)
+    readonly_fields = [field.name for field in models.ForumEvent._meta.fields]
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.EventConsumer)
+class EventConsumerAdmin(admin.ModelAdmin):
+    list_display = ("name", "position", "updated_timestamp")
+    readonly_fields = ("name", "updated_timestamp")
+
+
+@admin.register(models.UserActivity)
+class UserActivityAdmin(admin.ModelAdmin):
+    list_display = ("user_id", "threads", "replies", "likes", "reports", "last_active")
+    ordering = ("-last_active",)
+    readonly_fields = [field.name for field in models.UserActivity._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(models.DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ("day", "dimension", "key", "threads", "replies", "upvotes")
+    list_filter = ("dimension",)
+    date_hierarchy = "day"
+    ordering = ("-day", "dimension", "key")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("name", "last_day")
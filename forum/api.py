@@ -0,0 +1,307 @@
+"""
+Read-only JSON API (``/api/v1/``) for integrations that used to scrape HTML.
+
+Rows are read with ``values_list`` so no model instances are built, pages
+are addressed by opaque keyset cursors instead of offsets, and responses are
+encoded row by row into a streaming response rather than assembled in memory.
+"""
+
+import base64
+import binascii
+import json
+from functools import wraps
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+
+from . import listing, models, tagging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 100
+
+# Public field name -> ORM path
+THREAD_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "content": "content",
+    "category": "category__slug",
+    "course": "course__code",
+    "author": "author__username",
+    "created_timestamp": "created_timestamp",
+    "last_activity_timestamp": "last_activity_timestamp",
+    "reply_count": "reply_count",
+    "is_locked": "is_locked",
+}
+# "tags" isn't a column, it is fetched per chunk of threads
+THREAD_LIST_DEFAULT = [name for name in THREAD_FIELDS if name != "content"] + ["tags"]
+REPLY_FIELDS = {
+    "id": "id",
+    "parent": "parent_id",
+    "author": "author__username",
+    "content": "content",
+    "created_timestamp": "created_timestamp",
+}
+CATEGORY_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "slug": "slug",
+    "thread_count": "stats__thread_count",
+    "reply_count": "stats__reply_count",
+    "last_activity_timestamp": "stats__last_activity_timestamp",
+}
+COURSE_FIELDS = {
+    "id": "id",
+    "code": "code",
+    "title": "title",
+    "department": "department",
+}
+# Ordering keys whose cursor values are datetimes, the others are numbers
+DATETIME_KEYS = {"created_timestamp", "last_activity_timestamp"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+
+
+def api_view(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return JsonResponse({"error": "Method not allowed."}, status=405)
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except Http404:
+            return JsonResponse({"error": "Not found."}, status=404)
+
+    return wrapper
+
+
+def selected_fields(fields, allowed, default=None):
+    if not fields:
+        return list(default or allowed)
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",")))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}.")
+    return names
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get("limit", PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("limit must be an integer.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequest(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+    return limit
+
+
+def encode_cursor(key, descending, value, pk):
+    # Datetimes are written in full; DjangoJSONEncoder would drop microseconds
+    # and the cursor would skip rows sharing a millisecond
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    return (
+        base64.urlsafe_b64encode(dumps([key, descending, value, pk]))
+        .decode()
+        .rstrip("=")
+    )
+
+
+def decode_cursor(request, key, descending):
+    """
+    Return the ``(value, pk)`` position of the request's cursor, which must
+    have been issued for a listing ordered by ``key`` in the same direction.
+    """
+    token = request.GET.get("cursor")
+    if not token:
+        return None
+    try:
+        cursor_key, cursor_descending, value, pk = json.loads(
+            base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        )
+        if key in DATETIME_KEYS:
+            value = parse_datetime(value)
+    except (binascii.Error, ValueError, TypeError):
+        raise BadRequest("Invalid cursor.")
+    if (
+        cursor_key != key
+        or cursor_descending is not descending
+        or value is None
+        or (key not in DATETIME_KEYS and not isinstance(value, (int, float)))
+        or isinstance(value, bool)
+        or not isinstance(pk, int)
+        or isinstance(pk, bool)
+    ):
+        raise BadRequest("Invalid cursor.")
+    return value, pk
+
+
+def keyset(rows, key, descending, cursor):
+    # cursor comes from decode_cursor(request, key, descending)
+    if descending:
+        rows = rows.order_by(f"-{key}", "-id")
+    else:
+        rows = rows.order_by(key, "id")
+    if cursor is not None:
+        value, pk = cursor
+        op = "lt" if descending else "gt"
+        rows = rows.filter(
+            Q(**{f"{key}__{op}": value}) | Q(**{key: value, f"id__{op}": pk})
+        )
+    return rows
+
+
+def thread_tags(thread_ids):
+    tags = {}
+    for thread_id, slug in (
+        models.ThreadTag.objects.filter(thread_id__in=thread_ids)
+        .order_by("tag__slug")
+        .values_list("thread_id", "tag__slug")
+    ):
+        tags.setdefault(thread_id, []).append(slug)
+    return tags
+
+
+def stream_results(
+    rows, names, allowed, limit=None, key=None, descending=False, with_tags=False
+):
+    """
+    Yield ``{"results": [...], "next": cursor}`` in chunks. ``rows`` is
+    ordered; when ``limit`` is given, ``key`` and ``descending`` describe the
+    ordering the next cursor is built for.
+    """
+    columns = [allowed[name] for name in names if name in allowed]
+    width = len(columns)
+    if limit is not None:
+        rows = rows.values_list(*columns, key, "id")[: limit + 1]
+    else:
+        rows = rows.values_list(*columns, "id")
+    fields = [name for name in names if name in allowed]
+
+    yield b'{"results":['
+    iterator = rows.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    sent = 0
+    last = None
+    has_more = False
+    while chunk := list(islice(iterator, STREAM_CHUNK_SIZE)):
+        if limit is not None and sent + len(chunk) > limit:
+            chunk = chunk[: limit - sent]
+            has_more = True
+        tags = thread_tags([row[-1] for row in chunk]) if with_tags else None
+        parts = []
+        for row in chunk:
+            item = dict(zip(fields, row[:width]))
+            if tags is not None:
+                item["tags"] = tags.get(row[-1], [])
+            parts.append(dumps(item))
+        if parts:
+            yield (b"," if sent else b"") + b",".join(parts)
+            sent += len(parts)
+            last = chunk[-1]
+        if has_more:
+            break
+    cursor = encode_cursor(key, descending, last[-2], last[-1]) if has_more else None
+    yield b'],"next":' + dumps(cursor) + b"}"
+
+
+def json_stream(chunks):
+    return StreamingHttpResponse(chunks, content_type="application/json")
+
+
+@api_view
+def thread_list(request):
+    names = selected_fields(
+        request.GET.get("fields"), {**THREAD_FIELDS, "tags": None}, THREAD_LIST_DEFAULT
+    )
+    requested_tags = request.GET.getlist("tag")
+    tags = tagging.resolve_tags(requested_tags) if requested_tags else []
+    threads = listing.filter_threads(request.GET.get("category"), tags, requested_tags)
+    order = request.GET.get("order", "desc")
+    threads, key = listing.order_threads(
+        threads, request.GET.get("sort", "latest"), order, request.GET.get("search")
+    )
+    descending = key == "similarity" or order == "desc"
+    threads = keyset(threads, key, descending, decode_cursor(request, key, descending))
+    return json_stream(
+        stream_results(
+            threads,
+            names,
+            THREAD_FIELDS,
+            limit=page_size(request),
+            key=key,
+            descending=descending,
+            with_tags="tags" in names,
+        )
+    )
+
+
+@api_view
+def thread_detail(request, pk):
+    thread_names = selected_fields(
+        request.GET.get("fields"), {**THREAD_FIELDS, "tags": None}
+    )
+    columns = [THREAD_FIELDS[name] for name in thread_names if name != "tags"]
+    row = models.Thread.live.filter(pk=pk).values_list(*columns).first()
+    if row is None:
+        raise Http404
+    thread = dict(zip([name for name in thread_names if name != "tags"], row))
+    if "tags" in thread_names:
+        thread["tags"] = thread_tags([pk]).get(pk, [])
+
+    descending = request.GET.get("order", "asc") == "desc"
+    replies = keyset(
+        models.Reply.live.filter(thread_id=pk),
+        "created_timestamp",
+        descending,
+        decode_cursor(request, "created_timestamp", descending),
+    )
+    reply_names = selected_fields(request.GET.get("reply_fields"), REPLY_FIELDS)
+    limit = page_size(request)
+
+    def chunks():
+        yield b'{"thread":' + dumps(thread) + b',"replies":'
+        yield from stream_results(
+            replies, reply_names, REPLY_FIELDS, limit, "created_timestamp", descending
+        )
+        yield b"}"
+
+    return json_stream(chunks())
+
+
+@api_view
+def category_list(request):
+    names = selected_fields(request.GET.get("fields"), CATEGORY_FIELDS)
+    return json_stream(
+        stream_results(models.Category.objects.order_by("name"), names, CATEGORY_FIELDS)
+    )
+
+
+@api_view
+def course_list(request):
+    names = selected_fields(request.GET.get("fields"), COURSE_FIELDS)
+    courses = keyset(
+        models.Course.objects.all(), "id", False, decode_cursor(request, "id", False)
+    )
+    return json_stream(
+        stream_results(courses, names, COURSE_FIELDS, page_size(request), "id")
+    )
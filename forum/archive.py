@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models import Count
+
+from . import models
+
+THREAD_COLUMNS = [
+    "id",
+    "title",
+    "course_id",
+    "resource_id",
+    "author_id",
+    "content",
+    "created_timestamp",
+    "is_locked",
+    "is_deleted",
+    "category_id",
+    "reply_count",
+    "last_activity_timestamp",
+]
+REPLY_COLUMNS = [
+    "id",
+    "thread_id",
+    "parent_id",
+    "author_id",
+    "content",
+    "created_timestamp",
+    "is_deleted",
+]
+REPORT_COLUMNS = [
+    "id",
+    "thread_id",
+    "reply_id",
+    "author_id",
+    "reason",
+    "created_timestamp",
+    "resolved",
+]
+
+
+def candidates(deleted_before, locked_before):
+    threads = models.Thread.objects.filter(
+        is_deleted=True, last_activity_timestamp__lt=deleted_before
+    ) | models.Thread.objects.filter(
+        is_locked=True, last_activity_timestamp__lt=locked_before
+    )
+    # Moderators still need the thread while a report on it is open
+    return threads.exclude(report__resolved=False)
+
+
+@transaction.atomic
+def archive_threads(thread_ids):
+    # Locked so a report can't be filed between the check and the delete; one
+    # filed since candidates() ran keeps its thread live
+    thread_ids = list(
+        models.Thread.objects.select_for_update()
+        .filter(id__in=thread_ids)
+        .exclude(
+            id__in=models.Report.objects.filter(resolved=False).values("thread_id")
+        )
+        .values_list("id", flat=True)
+    )
+    if not thread_ids:
+        return 0
+
+    tags = {}
+    for thread_id, name in models.ThreadTag.objects.filter(
+        thread_id__in=thread_ids
+    ).values_list("thread_id", "tag__name"):
+        tags.setdefault(thread_id, []).append(name)
+
+    threads = (
+        models.Thread.objects.filter(id__in=thread_ids)
+        .annotate(upvote_count=Count("upvotethread"))
+        .values(*THREAD_COLUMNS, "upvote_count")
+    )
+    models.ArchivedThread.objects.bulk_create(
+        [models.ArchivedThread(**row, tags=tags.get(row["id"], [])) for row in threads]
+    )
+    replies = (
+        models.Reply.objects.filter(thread_id__in=thread_ids)
+        .annotate(upvote_count=Count("upvotereply"))
+        .values(*REPLY_COLUMNS, "upvote_count")
+        .order_by("id")
+    )
+    models.ArchivedReply.objects.bulk_create(
+        (models.ArchivedReply(**row) for row in replies.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+    models.ArchivedReport.objects.bulk_create(
+        models.ArchivedReport(**row)
+        for row in models.Report.objects.filter(thread_id__in=thread_ids).values(
+            *REPORT_COLUMNS
+        )
+    )
+    # A regular delete so the signals keep category stats and the in-memory
+    # indexes right; replies, reports, upvotes and notifications cascade
+    models.Thread.objects.filter(id__in=thread_ids).delete()
+    return len(thread_ids)
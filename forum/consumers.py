@@ -0,0 +1,68 @@
+"""
+Event log consumers shipped with the forum, see ``forum.events``.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from . import events, models
+
+# Event type -> (UserActivity field, change) for the event's actor
+ACTIVITY_COUNTS = {
+    events.THREAD_CREATED: ("threads", 1),
+    events.REPLY_CREATED: ("replies", 1),
+    events.THREAD_LIKED: ("likes", 1),
+    events.THREAD_UNLIKED: ("likes", -1),
+    events.REPLY_LIKED: ("likes", 1),
+    events.REPLY_UNLIKED: ("likes", -1),
+    events.REPORT_CREATED: ("reports", 1),
+}
+
+
+class UserActivityConsumer(events.Consumer):
+    """
+    Keeps UserActivity: what each user has posted, liked and reported, and
+    when they last did anything that is logged.
+    """
+
+    name = "user-activity"
+
+    def handle(self, batch):
+        changes = defaultdict(Counter)
+        last_active = {}
+        for event in batch:
+            if event.actor_id is None:
+                continue
+            last_active[event.actor_id] = max(
+                event.created_timestamp,
+                last_active.get(event.actor_id, event.created_timestamp),
+            )
+            if event.type in ACTIVITY_COUNTS:
+                field, change = ACTIVITY_COUNTS[event.type]
+                changes[event.actor_id][field] += change
+
+        existing = set(
+            models.UserActivity.objects.filter(user_id__in=last_active).values_list(
+                "user_id", flat=True
+            )
+        )
+        models.UserActivity.objects.bulk_create(
+            models.UserActivity(user_id=user_id)
+            for user_id in last_active
+            if user_id not in existing
+        )
+        for user_id, timestamp in last_active.items():
+            models.UserActivity.objects.filter(user_id=user_id).update(
+                last_active=Greatest(
+                    Coalesce("last_active", Value(timestamp)), Value(timestamp)
+                ),
+                **{
+                    field: F(field) + change
+                    for field, change in changes[user_id].items()
+                },
+            )
+
+    def reset(self):
+        models.UserActivity.objects.all().delete()
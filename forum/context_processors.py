@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import notifications
+
+
+def notification_count(request):
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    # Only queried when a template actually renders the badge
+    return {
+        "unread_notification_count": SimpleLazyObject(
+            lambda: notifications.unread_count(user)
+        )
+    }
@@ -0,0 +1,185 @@
+"""
+Append-only forum event log (change feed).
+
+Every mutation in ``forum.views`` appends a ``ForumEvent`` in the same
+transaction as the change itself, so an event exists if and only if the
+change committed. Consumers (subclasses of ``Consumer`` listed in
+``FORUM_EVENT_CONSUMERS``) read the log in sequence order from their stored
+offset, a batch at a time, off the request path; see the
+``consume_events`` command.
+
+Ids are allocated before commit, so a transaction that commits late can
+land behind an id a consumer has already passed. Consumers therefore read by
+``sequence`` instead, a number ``assign_sequence`` hands out to events only
+once they have committed, each run continuing after the highest number
+given so far. Two runs that race pick the same numbers and the unique
+constraint rejects the second, so numbers become visible in order.
+"""
+
+import abc
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import models
+
+SEQUENCE_BATCH = 1000
+# EventConsumer row recording the last sequence number pruned from the log
+PRUNED = "(pruned)"
+
+THREAD_CREATED = "thread.created"
+THREAD_DELETED = "thread.deleted"
+THREAD_LOCKED = "thread.locked"
+THREAD_UNLOCKED = "thread.unlocked"
+THREAD_FOLLOWED = "thread.followed"
+THREAD_UNFOLLOWED = "thread.unfollowed"
+THREAD_LIKED = "thread.liked"
+THREAD_UNLIKED = "thread.unliked"
+REPLY_CREATED = "reply.created"
+REPLY_DELETED = "reply.deleted"
+REPLY_LIKED = "reply.liked"
+REPLY_UNLIKED = "reply.unliked"
+REPORT_CREATED = "report.created"
+REPORT_RESOLVED = "report.resolved"
+
+
+def record(event_type, actor=None, thread_id=None, reply_id=None, **data):
+    # Must run inside the transaction making the change it describes
+    return models.ForumEvent.objects.create(
+        type=event_type,
+        actor_id=actor.id if actor is not None else None,
+        thread_id=thread_id,
+        reply_id=reply_id,
+        data=data,
+    )
+
+
+class Consumer(abc.ABC):
+    """
+    Base class for event consumers. ``handle`` runs in the transaction that
+    advances the offset, so changes it makes to the database are applied
+    exactly once.
+    """
+
+    name = None
+    batch_size = 500
+
+    @abc.abstractmethod
+    def handle(self, events):
+        """
+        Apply a batch of events, in sequence order.
+        """
+
+    def reset(self):
+        """
+        Drop the derived data before a replay from the start of the log.
+        """
+
+
+def consumers():
+    return [import_string(path)() for path in settings.FORUM_EVENT_CONSUMERS]
+
+
+def assign_sequence(limit=SEQUENCE_BATCH):
+    """
+    Number up to ``limit`` committed events that have no sequence yet, in id
+    order. Returns how many were numbered.
+    """
+    try:
+        with transaction.atomic():
+            last = models.ForumEvent.objects.aggregate(last=Max("sequence"))["last"]
+            pending = list(
+                models.ForumEvent.objects.filter(sequence__isnull=True)
+                .order_by("id")
+                .only("id")[:limit]
+            )
+            for number, event in enumerate(pending, (last or 0) + 1):
+                event.sequence = number
+            models.ForumEvent.objects.bulk_update(pending, ["sequence"])
+    except IntegrityError:
+        # Another run numbered them first
+        return 0
+    return len(pending)
+
+
+def process_batch(consumer):
+    """
+    Hand the next batch of committed events to ``consumer`` and advance its
+    offset. Returns the number of events processed.
+    """
+    assign_sequence()
+    with transaction.atomic():
+        offset, _ = models.EventConsumer.objects.get_or_create(name=consumer.name)
+        # Locks the row, so two runs of one consumer can't share a batch
+        offset = models.EventConsumer.objects.select_for_update().get(pk=offset.pk)
+        events = list(
+            models.ForumEvent.objects.filter(sequence__gt=offset.position).order_by(
+                "sequence"
+            )[: consumer.batch_size]
+        )
+        if not events:
+            return 0
+        consumer.handle(events)
+        offset.position = events[-1].sequence
+        offset.updated_timestamp = timezone.now()
+        offset.save(update_fields=["position", "updated_timestamp"])
+    return len(events)
+
+
+def pruned_through():
+    marker = models.EventConsumer.objects.filter(name=PRUNED).first()
+    return marker.position if marker else 0
+
+
+def rewind(consumer, position=0):
+    """
+    Move ``consumer`` back (or forward) to ``position`` so its next batches
+    replay the log from there; from the start its derived data is reset.
+    Raises ``ValueError`` when events after ``position`` have been pruned.
+    """
+    if position < pruned_through():
+        raise ValueError(
+            f"Events up to {pruned_through()} have been pruned, "
+            f"{consumer.name} can't replay from {position}."
+        )
+    with transaction.atomic():
+        if position == 0:
+            consumer.reset()
+        models.EventConsumer.objects.update_or_create(
+            name=consumer.name,
+            defaults={"position": position, "updated_timestamp": timezone.now()},
+        )
+
+
+def prune(before):
+    """
+    Delete the events created before ``before`` that every configured
+    consumer has processed. Returns the number of events deleted.
+    """
+    positions = dict.fromkeys((consumer.name for consumer in consumers()), 0)
+    positions.update(
+        models.EventConsumer.objects.filter(name__in=positions).values_list(
+            "name", "position"
+        )
+    )
+    events = models.ForumEvent.objects.filter(
+        created_timestamp__lt=before, sequence__isnull=False
+    )
+    if positions:
+        events = events.filter(sequence__lte=min(positions.values()))
+    last = events.aggregate(last=Max("sequence"))["last"]
+    if last is None:
+        return 0
+    with transaction.atomic():
+        deleted, _ = models.ForumEvent.objects.filter(sequence__lte=last).delete()
+        models.EventConsumer.objects.update_or_create(
+            name=PRUNED,
+            defaults={
+                "position": max(last, pruned_through()),
+                "updated_timestamp": timezone.now(),
+            },
+        )
+    return deleted
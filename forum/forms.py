@@ -1,5 +1,6 @@
 from django import forms
 
+from . import reference
 from .models import Reply, Report, Resource, Thread
 
 
@@ -41,6 +42,15 @@ class CreateThreadForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Render dropdowns from the reference cache; the querysets are still
+        # used to validate submitted values
+        self.fields["course"].choices = [
+            ("", self.fields["course"].empty_label)
+        ] + reference.course_choices()
+        self.fields["category"].choices = [
+            ("", self.fields["category"].empty_label)
+        ] + reference.category_choices()
+        self.fields["tags"].choices = reference.tag_choices()
         self.fields["resource"].queryset = Resource.objects.none()
         if "course" in self.data:
             try:
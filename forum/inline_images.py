@@ -0,0 +1,63 @@
+import base64
+import binascii
+import hashlib
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Images pasted into the editor arrive as base64 data URIs, either in
+# markdown image syntax or in raw <img> tags. SVG is deliberately left alone
+# since it would be served from our own origin.
+DATA_URI_RE = re.compile(
+    r"data:image/(?P<type>png|jpe?g|gif|webp);base64,(?P<payload>[A-Za-z0-9+/=\s]+)",
+    re.IGNORECASE,
+)
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "jpg": "jpg", "gif": "gif", "webp": "webp"}
+UPLOAD_DIR = "forum/inline"
+# Larger pastes (and anything that isn't really an image of the declared
+# type) keep their data URI instead of being written to MEDIA_ROOT
+MAX_IMAGE_BYTES = 2 * 1024 * 1024
+
+
+def is_image(data, extension):
+    if extension == "png":
+        return data.startswith(b"\x89PNG\r\n\x1a\n")
+    if extension == "jpg":
+        return data.startswith(b"\xff\xd8\xff")
+    if extension == "gif":
+        return data.startswith((b"GIF87a", b"GIF89a"))
+    if extension == "webp":
+        return data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+    return False
+
+
+def store_image(data, extension):
+    digest = hashlib.sha256(data).hexdigest()
+    # Content addressed, so identical pastes share one file and the URL of a
+    # file never changes
+    name = f"{UPLOAD_DIR}/{digest[:2]}/{digest}.{extension}"
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return default_storage.url(name)
+
+
+def _replace(match):
+    payload = re.sub(r"\s+", "", match["payload"])
+    # Checked before decoding, every 4 base64 characters hold 3 bytes
+    if len(payload) // 4 * 3 > MAX_IMAGE_BYTES:
+        return match.group(0)
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return match.group(0)
+    extension = EXTENSIONS[match["type"].lower()]
+    if len(data) > MAX_IMAGE_BYTES or not is_image(data, extension):
+        return match.group(0)
+    return store_image(data, extension)
+
+
+def extract_inline_images(content):
+    if not content or "data:image/" not in content:
+        return content
+    return DATA_URI_RE.sub(_replace, content)
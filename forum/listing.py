@@ -0,0 +1,89 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.paginator import Page, Paginator
+from django.db.models import Count
+
+from . import models, singleflight, tagging
+
+SORT_FIELDS = {"latest": "created_timestamp", "popular": "upvote_count"}
+
+
+def filter_threads(category_slug, tags, requested_tags):
+    threads = models.Thread.live.all()
+    if category_slug:
+        threads = threads.filter(category__slug=category_slug)
+    return tagging.filter_by_tags(threads, tags, requested_tags)
+
+
+def order_threads(threads, sort, order, search_query=None):
+    """
+    Apply the home page ordering and return ``(threads, key)`` where ``key``
+    is the field the listing is ordered by, descending when ``order`` is
+    "desc" (a search always ranks by descending similarity).
+    """
+    if search_query:
+        # NOTE: The database should be PostgreSQL
+        threads = threads.annotate(
+            similarity=TrigramSimilarity("title", search_query)
+        ).filter(similarity__gt=0.3)
+        return threads.order_by("-similarity"), "similarity"
+
+    order_field = SORT_FIELDS.get(sort, "created_timestamp")
+    if order_field == "upvote_count":
+        threads = threads.annotate(upvote_count=Count("upvotethread"))
+    if order == "desc":
+        return threads.order_by(f"-{order_field}"), order_field
+    return threads.order_by(order_field), order_field
+
+
+def listing_key(category_slug, requested_tags, sort, order, search_query, page):
+    # Normalized the way order_threads reads them, so equivalent URLs share
+    # an entry (trigram matching ignores case and runs of whitespace)
+    params = [
+        category_slug or "",
+        sorted(set(requested_tags)),
+        sort if sort in SORT_FIELDS else "latest",
+        "desc" if order == "desc" else "asc",
+        " ".join((search_query or "").lower().split()),
+        page,
+    ]
+    digest = hashlib.sha1(json.dumps(params).encode()).hexdigest()
+    return f"forum:listing:{digest}"
+
+
+def cached_page(threads, page_number, per_page, key_params, load):
+    """
+    Paginate ``threads`` with the page's ids and the total count served from
+    the listing cache for ``LISTING_CACHE_TIMEOUT`` seconds. ``load`` turns a
+    queryset of the page's threads into the objects to render, so per-user
+    annotations are never cached.
+    """
+    try:
+        page_number = max(int(page_number), 1)
+    except (TypeError, ValueError):
+        page_number = 1
+    paginator = Paginator(threads.values_list("id", flat=True), per_page)
+
+    def compute():
+        page = paginator.get_page(page_number)
+        return paginator.count, page.number, list(page.object_list)
+
+    if settings.LISTING_CACHE_TIMEOUT > 0:
+        count, number, ids = singleflight.get_or_compute(
+            listing_key(*key_params, page_number),
+            compute,
+            settings.LISTING_CACHE_TIMEOUT,
+            "listing.cache",
+        )
+        paginator.count = count
+    else:
+        count, number, ids = compute()
+
+    # Threads deleted since the ids were cached drop out of the page
+    by_id = {
+        thread.id: thread for thread in load(models.Thread.live.filter(id__in=ids))
+    }
+    return Page([by_id[pk] for pk in ids if pk in by_id], number, paginator)
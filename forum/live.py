@@ -0,0 +1,320 @@
+"""
+Live updates for thread pages and the home feed, sent as server-sent events.
+
+Each ASGI worker keeps an in-process ``Broker`` that fans events out to the
+open streams of that worker. Events reach other workers through the
+transport named by ``LIVE_TRANSPORT``:
+
+``PollingTransport``
+    The fallback that needs nothing but the database. Local events are
+    delivered straight away, and every ``LIVE_POLL_INTERVAL`` seconds one task
+    per worker reads new replies, threads and likes past its id cursors and
+    re-reads the counts of the threads someone is watching.
+``RedisTransport``
+    Publishes every event on a Redis channel that all workers subscribe to.
+
+The broker drops an event it has already delivered with the same payload, so
+an event seen both locally and by the poller is only sent once.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from . import models
+
+HOME = "home"
+QUEUE_SIZE = 100
+# Delivered payloads remembered per channel for deduplication
+SEEN_PER_CHANNEL = 1000
+POLL_BATCH = 500
+
+logger = logging.getLogger(__name__)
+
+
+def thread_channel(thread_id):
+    return f"thread:{thread_id}"
+
+
+def _offer(queue, message):
+    # A client that stopped reading loses events rather than memory
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # channel -> {queue: event loop of the stream reading it}
+        self._listeners = defaultdict(dict)
+        self._seen = {}
+        self._transport = None
+        self._task = None
+
+    @property
+    def transport(self):
+        with self._lock:
+            if self._transport is None:
+                self._transport = import_string(settings.LIVE_TRANSPORT)(self)
+            return self._transport
+
+    def has_listeners(self, channel):
+        return bool(self._listeners.get(channel))
+
+    def watched_threads(self):
+        with self._lock:
+            return [
+                int(channel.partition(":")[2])
+                for channel in self._listeners
+                if channel.startswith("thread:")
+            ]
+
+    def subscribe(self, channel):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        transport = self.transport
+        with self._lock:
+            self._listeners[channel][queue] = loop
+            if self._task is None or self._task.done():
+                self._task = loop.create_task(transport.run())
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            listeners = self._listeners.get(channel, {})
+            listeners.pop(queue, None)
+            if not listeners:
+                self._listeners.pop(channel, None)
+                self._seen.pop(channel, None)
+
+    def deliver(self, channel, name, key, data):
+        with self._lock:
+            listeners = list(self._listeners.get(channel, {}).items())
+            if not listeners:
+                return
+            seen = self._seen.setdefault(channel, OrderedDict())
+            if seen.get(key) == data:
+                return
+            seen[key] = data
+            seen.move_to_end(key)
+            if len(seen) > SEEN_PER_CHANNEL:
+                seen.popitem(last=False)
+        message = f"event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+        for queue, loop in listeners:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+
+broker = Broker()
+
+
+class PollingTransport:
+    def __init__(self, broker):
+        self.broker = broker
+        self._cursors = {}
+        self._reply_likes = {}
+
+    def wants(self, channel):
+        # Other workers find out by polling, so only local streams matter
+        return self.broker.has_listeners(channel)
+
+    def publish(self, channel, name, key, data):
+        self.broker.deliver(channel, name, key, data)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+            try:
+                events = await sync_to_async(self.poll)()
+            except DatabaseError:
+                logger.exception("Polling for live events failed")
+                continue
+            for event in events:
+                self.broker.deliver(*event)
+
+    def _new_rows(self, name, queryset, *fields):
+        cursor = self._cursors.get(name)
+        if cursor is None:
+            # Start at the current end of the table, streams don't replay
+            last = queryset.order_by("-id").values_list("id", flat=True).first()
+            self._cursors[name] = last or 0
+            return []
+        rows = list(
+            queryset.filter(id__gt=cursor)
+            .order_by("id")
+            .values_list("id", *fields)[:POLL_BATCH]
+        )
+        if rows:
+            self._cursors[name] = rows[-1][0]
+        return rows
+
+    def poll(self):
+        close_old_connections()
+        events = []
+        touched = set(self.broker.watched_threads())
+        watched = set(touched)
+
+        for reply_id, thread_id, author in self._new_rows(
+            "reply", models.Reply.live, "thread_id", "author__username"
+        ):
+            events.append(reply_event(reply_id, thread_id, author))
+            touched.add(thread_id)
+        for thread in self._new_rows(
+            "thread", models.Thread.live, "title", "category__slug"
+        ):
+            events.append(thread_event(*thread))
+        touched.update(
+            thread_id
+            for _, thread_id in self._new_rows(
+                "thread_like", models.UpvoteThread.objects, "thread_id"
+            )
+        )
+
+        for thread_id, reply_count, upvote_count in (
+            models.Thread.objects.filter(id__in=touched)
+            .annotate(upvote_count=Count("upvotethread"))
+            .values_list("id", "reply_count", "upvote_count")
+        ):
+            events.extend(thread_counts_events(thread_id, reply_count, upvote_count))
+
+        # Unlikes delete rows, so reply likes are re-counted for the watched
+        # threads instead of followed by cursor
+        reply_likes = {}
+        if watched:
+            reply_likes = {
+                reply_id: (thread_id, count)
+                for reply_id, thread_id, count in models.UpvoteReply.objects.filter(
+                    reply__thread_id__in=watched
+                )
+                .values("reply_id", "reply__thread_id")
+                .annotate(count=Count("id"))
+                .values_list("reply_id", "reply__thread_id", "count")
+            }
+        for reply_id, (thread_id, _) in self._reply_likes.items():
+            if reply_id not in reply_likes and thread_id in watched:
+                reply_likes[reply_id] = (thread_id, 0)
+        for reply_id, (thread_id, count) in reply_likes.items():
+            events.append(reply_counts_event(reply_id, thread_id, count))
+        self._reply_likes = {
+            reply_id: value for reply_id, value in reply_likes.items() if value[1]
+        }
+        return events
+
+
+class RedisTransport:
+    channel = "forum:live"
+
+    def __init__(self, broker):
+        import redis
+
+        self.broker = broker
+        self._client = redis.Redis.from_url(settings.LIVE_REDIS_URL)
+
+    def wants(self, channel):
+        return True
+
+    def publish(self, channel, name, key, data):
+        import redis
+
+        # Called after the change committed; a Redis outage only costs the
+        # live update, never the request
+        try:
+            self._client.publish(
+                self.channel,
+                json.dumps([channel, name, key, data], cls=DjangoJSONEncoder),
+            )
+        except redis.RedisError:
+            logger.exception("Publishing a live event to Redis failed")
+
+    async def run(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(settings.LIVE_REDIS_URL)
+        while True:
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.broker.deliver(*json.loads(message["data"]))
+            except redis.RedisError:
+                logger.exception("Lost the live events Redis subscription")
+                await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+
+
+def reply_event(reply_id, thread_id, author):
+    data = {"id": reply_id, "thread": thread_id, "author": author}
+    return thread_channel(thread_id), "reply", f"reply:{reply_id}", data
+
+
+def thread_event(thread_id, title, category_slug):
+    data = {
+        "id": thread_id,
+        "title": title,
+        "url": reverse("thread-view", args=[category_slug, thread_id]),
+    }
+    return HOME, "thread", f"thread:{thread_id}", data
+
+
+def thread_counts_events(thread_id, reply_count, upvote_count):
+    data = {
+        "thread": thread_id,
+        "reply_count": reply_count,
+        "upvote_count": upvote_count,
+    }
+    key = f"counts:{thread_id}"
+    return [
+        (thread_channel(thread_id), "counts", key, data),
+        (HOME, "counts", key, data),
+    ]
+
+
+def reply_counts_event(reply_id, thread_id, upvote_count):
+    data = {"reply": reply_id, "upvote_count": upvote_count}
+    return thread_channel(thread_id), "reply-counts", f"reply:{reply_id}:counts", data
+
+
+def publish(*events):
+    transport = broker.transport
+    for event in events:
+        if transport.wants(event[0]):
+            transport.publish(*event)
+
+
+def publish_thread_counts(thread_id):
+    transport = broker.transport
+    if not (transport.wants(thread_channel(thread_id)) or transport.wants(HOME)):
+        return
+    counts = (
+        models.Thread.objects.filter(id=thread_id)
+        .annotate(upvote_count=Count("upvotethread"))
+        .values_list("reply_count", "upvote_count")
+        .first()
+    )
+    if counts is not None:
+        publish(*thread_counts_events(thread_id, *counts))
+
+
+async def stream(channel):
+    queue = broker.subscribe(channel)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), settings.LIVE_KEEPALIVE)
+            except TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(channel, queue)
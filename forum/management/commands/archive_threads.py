@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forum import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move soft-deleted threads and long-inactive locked threads, with their "
+        "replies, out of the live tables into the archive tables in batches. "
+        "Archived threads stay readable at /archive/thread/<id>/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--deleted-days",
+            type=int,
+            default=30,
+            help="Archive soft-deleted threads inactive this long (default: 30).",
+        )
+        parser.add_argument(
+            "--locked-days",
+            type=int,
+            default=365,
+            help="Archive locked threads inactive this long (default: 365).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Threads moved per transaction (default: 100).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the threads that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        threads = archive.candidates(
+            now - timedelta(days=options["deleted_days"]),
+            now - timedelta(days=options["locked_days"]),
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"{threads.count()} threads would be archived.")
+            return
+
+        archived = 0
+        last_id = 0
+        while True:
+            batch = list(
+                threads.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            archived += archive.archive_threads(batch)
+            self.stdout.write(f"Archived {archived} threads (up to id {last_id})")
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} threads."))
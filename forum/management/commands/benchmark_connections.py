@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+MODES = ["none", "persistent", "pool"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests/sec for a view with a new database connection per "
+        "request, persistent connections (CONN_MAX_AGE) and a psycopg pool. "
+        "Run it against the real database server; pooling needs PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Requests per mode (default: 500).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Threads issuing requests, like gunicorn threads (default: 4).",
+        )
+        parser.add_argument(
+            "--url",
+            default=reverse("api-category-list"),
+            help="Path to request (default: the categories API).",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username to log in as (default: the first superuser).",
+        )
+        parser.add_argument(
+            "--mode",
+            action="append",
+            choices=MODES,
+            help="Only run these modes (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["user"]:
+            user = User.objects.get(username=options["user"])
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("No user to log in as, pass --user.")
+
+        settings_dict = connections["default"].settings_dict
+        original = {
+            "CONN_MAX_AGE": settings_dict["CONN_MAX_AGE"],
+            "CONN_HEALTH_CHECKS": settings_dict["CONN_HEALTH_CHECKS"],
+            "OPTIONS": dict(settings_dict["OPTIONS"]),
+        }
+        modes = options["mode"] or MODES
+        if "pool" in modes and connections["default"].vendor != "postgresql":
+            self.stderr.write("Skipping pool: only supported on PostgreSQL.")
+            modes = [mode for mode in modes if mode != "pool"]
+
+        try:
+            for mode in modes:
+                self.configure(settings_dict, original, mode)
+                rate = self.run(user, options)
+                self.stdout.write(f"{mode:>10}: {rate:8.1f} req/s")
+        finally:
+            self.configure(settings_dict, original, None)
+
+    def configure(self, settings_dict, original, mode):
+        connections.close_all()
+        if hasattr(connections["default"], "close_pool"):
+            connections["default"].close_pool()
+        settings_dict.update(original)
+        settings_dict["OPTIONS"] = dict(original["OPTIONS"])
+        settings_dict["OPTIONS"].pop("pool", None)
+        if mode == "none":
+            settings_dict["CONN_MAX_AGE"] = 0
+        elif mode == "persistent":
+            settings_dict["CONN_MAX_AGE"] = 60
+            settings_dict["CONN_HEALTH_CHECKS"] = True
+        elif mode == "pool":
+            settings_dict["CONN_MAX_AGE"] = 0
+            settings_dict["OPTIONS"]["pool"] = original["OPTIONS"].get(
+                "pool", {"min_size": 2, "max_size": 10, "timeout": 10}
+            )
+
+    def run(self, user, options):
+        total = options["requests"]
+        concurrency = options["concurrency"]
+
+        def worker(count):
+            client = Client()
+            client.force_login(user)
+            for _ in range(count):
+                # The test client skips the connection handling the WSGI
+                # handler does around each request, so do it here
+                close_old_connections()
+                response = client.get(options["url"], HTTP_HOST="localhost")
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                close_old_connections()
+            # Each thread has its own connection
+            connections.close_all()
+
+        shares = [
+            total // concurrency + (i < total % concurrency) for i in range(concurrency)
+        ]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, shares))
+        return total / (time.perf_counter() - started)
@@ -0,0 +1,372 @@
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from forum import models, reference, stats
+from forum.forms import CreateThreadForm
+from forum.templatetags.markdown_extras import markdownify
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmark_baseline.json"
+
+
+def machine():
+    # Ops/sec only compare between runs on the same host and interpreter
+    return " ".join(
+        [
+            platform.node(),
+            platform.machine(),
+            platform.python_implementation(),
+            platform.python_version(),
+        ]
+    )
+
+
+MARKDOWN_BODIES = {
+    "short": "Does anyone have the **lab 3** solutions? I'm stuck on part _b_.",
+    "code": (
+        "My loop never ends:\n\n```python\nwhile i < n:\n    total += i\n```\n\n"
+        "What am I missing?"
+    ),
+    "table": "| Week | Topic | Reading |\n|---|---|---|\n"
+    + "".join(f"| {week} | Topic {week} | Chapter {week} |\n" for week in range(20)),
+    "long": "\n\n".join(
+        f"## Part {part}\n\n- point one with a [link](https://example.com/{part})\n"
+        f"- point two with `code`\n\n> quoted answer {part}\n\n" + "lorem ipsum " * 60
+        for part in range(12)
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the forum hot paths (markdown rendering, the home and thread "
+        "pages, CreateThreadForm, like toggles and the reports page) against a "
+        "freshly seeded SQLite test database. Reports ops/sec, peak allocations "
+        "per op and queries per op, and compares the queries and allocations "
+        "with a baseline JSON. Ops/sec depend on the machine, so they are only "
+        "compared with --compare-speed, against a baseline recorded on the same "
+        "machine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--items",
+            type=int,
+            default=200,
+            help="Threads, replies on the benchmarked thread and open reports "
+            "to seed (default: 200).",
+        )
+        parser.add_argument(
+            "--min-time",
+            type=float,
+            default=1,
+            help="Seconds to run each benchmark for (default: 1).",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            metavar="NAME",
+            help="Run only benchmarks whose name starts with one of these.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=DEFAULT_BASELINE,
+            type=Path,
+            help=f"Baseline JSON file (default: {DEFAULT_BASELINE.name}).",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write this run's results to the baseline file instead of "
+            "comparing against it.",
+        )
+        parser.add_argument(
+            "--compare-speed",
+            action="store_true",
+            help="Also compare ops/sec. The baseline must have been saved with "
+            "--compare-speed on this machine; keep it out of the repository.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.15,
+            help="Allowed relative slowdown or allocation growth before a "
+            "benchmark counts as a regression (default: 0.15).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+            raise CommandError("The benchmarks run against SQLite only.")
+        baseline = Path(options["baseline"])
+        if not options["save_baseline"] and not baseline.exists():
+            raise CommandError(
+                f"No baseline at {baseline}; create one with --save-baseline."
+            )
+        if (
+            options["compare_speed"]
+            and not options["save_baseline"]
+            and json.loads(baseline.read_text())["machine"] != machine()
+        ):
+            raise CommandError(
+                f"{baseline} was not recorded on this machine; record one here "
+                "with --save-baseline --compare-speed --baseline FILE."
+            )
+
+        setup_test_environment()
+        # A private cache and database sessions keep the run away from any
+        # shared Redis, the slow query log stays out of the timings and
+        # {% static %} works without a collectstatic manifest
+        with override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            },
+            SESSION_ENGINE="django.contrib.sessions.backends.db",
+            SLOW_QUERY_MS=0,
+            STORAGES={
+                **settings.STORAGES,
+                "staticfiles": {
+                    "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+                },
+            },
+        ):
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases={"default"}
+            )
+            try:
+                results = self.run_all(options)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        if options["save_baseline"]:
+            self.save(baseline, results, options["compare_speed"])
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline}"))
+        else:
+            self.compare(
+                results,
+                json.loads(baseline.read_text())["benchmarks"],
+                options["threshold"],
+                options["compare_speed"],
+            )
+
+    def save(self, baseline, results, with_speed):
+        if not with_speed:
+            results = {
+                name: {
+                    key: value for key, value in result.items() if key != "ops_per_sec"
+                }
+                for name, result in results.items()
+            }
+        baseline.write_text(
+            json.dumps(
+                {
+                    "machine": machine() if with_speed else None,
+                    "benchmarks": results,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+
+    def seed(self, items):
+        now = timezone.now()
+        admin = models.User.objects.create_superuser(
+            "bench-admin", "bench@example.com", "bench"
+        )
+        users = models.User.objects.bulk_create(
+            models.User(username=f"bench-user-{index}") for index in range(20)
+        )
+        category = models.Category.objects.create(name="General", slug="general")
+        course = models.Course.objects.create(
+            code="CS F111", title="Computer Programming", department="CS"
+        )
+        tags = models.Tag.objects.bulk_create(
+            models.Tag(name=f"Tag {index}", slug=f"tag-{index}") for index in range(10)
+        )
+        bodies = list(MARKDOWN_BODIES.values())
+        threads = models.Thread.objects.bulk_create(
+            models.Thread(
+                title=f"Benchmark thread {index}",
+                content=bodies[index % len(bodies)],
+                author=users[index % len(users)],
+                category=category,
+                course=course,
+                created_timestamp=now - timedelta(minutes=index),
+                last_activity_timestamp=now - timedelta(minutes=index),
+            )
+            for index in range(items)
+        )
+        models.ThreadTag.objects.bulk_create(
+            models.ThreadTag(thread=thread, tag=tags[(index + offset) % len(tags)])
+            for index, thread in enumerate(threads)
+            for offset in range(2)
+        )
+        thread = threads[0]
+        replies = models.Reply.objects.bulk_create(
+            models.Reply(
+                thread=thread,
+                author=users[index % len(users)],
+                content=bodies[index % len(bodies)],
+                created_timestamp=now - timedelta(seconds=items - index),
+            )
+            for index in range(items)
+        )
+        models.Thread.objects.filter(pk=thread.pk).update(reply_count=items)
+        models.UpvoteThread.objects.bulk_create(
+            models.UpvoteThread(thread=thread, user=user) for user in users
+        )
+        models.Report.objects.bulk_create(
+            models.Report(
+                author=users[index % len(users)],
+                thread=thread if index % 2 else threads[index],
+                reply=replies[index] if index % 2 else None,
+                reason="Benchmark report",
+            )
+            for index in range(items)
+        )
+        stats.reconcile()
+        reference.invalidate()
+        return admin, thread, replies[0]
+
+    def benchmarks(self, client, thread, reply):
+        thread_url = reverse("thread-view", args=[thread.category.slug, thread.pk])
+        thread_like_url = reverse("toggle-thread-like", args=[thread.pk])
+        reply_like_url = reverse("toggle-reply-like", args=[reply.pk])
+        home_url = reverse("home")
+        reports_url = reverse("reports-list")
+
+        def get(url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+
+        def post(url):
+            response = client.post(url)
+            if response.status_code != 200:
+                raise CommandError(f"POST {url} returned {response.status_code}")
+
+        benchmarks = {
+            f"markdownify.{name}": (lambda body=body: markdownify(body))
+            for name, body in MARKDOWN_BODIES.items()
+        }
+        benchmarks.update(
+            {
+                "home": lambda: get(home_url),
+                "home.popular": lambda: get(f"{home_url}?sort=popular"),
+                "thread_view": lambda: get(thread_url),
+                "create_thread_form": CreateThreadForm,
+                "toggle_thread_like": lambda: post(thread_like_url),
+                "toggle_reply_like": lambda: post(reply_like_url),
+                "reports_view": lambda: get(reports_url),
+            }
+        )
+        return benchmarks
+
+    def run_all(self, options):
+        admin, thread, reply = self.seed(options["items"])
+        client = Client()
+        client.force_login(admin)
+        results = {}
+        for name, func in self.benchmarks(client, thread, reply).items():
+            if options["only"] and not name.startswith(tuple(options["only"])):
+                continue
+            results[name] = self.measure(func, options["min_time"])
+            self.stdout.write(
+                f"{name:<24} {results[name]['ops_per_sec']:>10.1f} ops/s "
+                f"{results[name]['peak_kib']:>10.1f} KiB peak "
+                f"{results[name]['queries']:>5} queries"
+            )
+        return results
+
+    def measure(self, func, min_time):
+        # The first call fills caches and imports lazily loaded modules
+        func()
+
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        # The next request_started clears the log the context reads from
+        query_count = len(queries)
+
+        # The lowest of a few peaks, so a collection or cache refill landing
+        # in one call doesn't read as growth
+        peaks = []
+        tracemalloc.start()
+        try:
+            func()
+            for _ in range(3):
+                gc.collect()
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                func()
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+        finally:
+            tracemalloc.stop()
+
+        # The fastest of three rounds, like timeit: slower rounds measure
+        # whatever else the machine was doing
+        rates = []
+        for _ in range(3):
+            calls = 0
+            started = time.perf_counter()
+            deadline = started + min_time / 3
+            while calls < 5 or time.perf_counter() < deadline:
+                func()
+                calls += 1
+            rates.append(calls / (time.perf_counter() - started))
+
+        return {
+            "ops_per_sec": round(max(rates), 1),
+            "peak_kib": round(min(peaks) / 1024, 1),
+            "queries": query_count,
+        }
+
+    def compare(self, results, baseline, threshold, compare_speed=False):
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                self.stderr.write(f"{name}: not in the baseline, skipped.")
+                continue
+            if compare_speed and result["ops_per_sec"] < base["ops_per_sec"] * (
+                1 - threshold
+            ):
+                regressions.append(
+                    f"{name}: {result['ops_per_sec']} ops/s, "
+                    f"baseline {base['ops_per_sec']}"
+                )
+            if result["peak_kib"] > base["peak_kib"] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {result['peak_kib']} KiB peak, "
+                    f"baseline {base['peak_kib']}"
+                )
+            # Query counts are deterministic, so any increase counts
+            if result["queries"] > base["queries"]:
+                regressions.append(
+                    f"{name}: {result['queries']} queries, "
+                    f"baseline {base['queries']}"
+                )
+        if regressions:
+            raise CommandError(
+                "Regressions against the baseline:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,149 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from forum import models
+
+ALIAS = "sqlite_benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers (the home listing) and writers (like toggles) "
+        "against copies of the SQLite database, once with SQLite's defaults "
+        "and once with the OPTIONS from settings, and compare throughput, "
+        "read latency and 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=5,
+            help="Duration of each run (default: 5).",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=4,
+            help="Reader threads (default: 4).",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=2,
+            help="Writer threads (default: 2).",
+        )
+
+    def handle(self, *args, **options):
+        default = connections["default"]
+        if default.vendor != "sqlite":
+            raise CommandError("The default database isn't SQLite.")
+        thread_ids = list(models.Thread.live.values_list("id", flat=True)[:500])
+        user_ids = list(models.User.objects.values_list("id", flat=True)[:50])
+        if not thread_ids or not user_ids:
+            raise CommandError("Needs at least one thread and one user.")
+
+        # name -> (journal mode of the copy, connection OPTIONS)
+        profiles = {
+            "sqlite defaults": ("DELETE", {}),
+            "settings": ("WAL", default.settings_dict["OPTIONS"]),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, (journal_mode, db_options) in profiles.items():
+                path = os.path.join(tmp, f"{len(os.listdir(tmp))}.sqlite3")
+                # The backup API gives a consistent copy even while the live
+                # database is in use
+                source = sqlite3.connect(default.settings_dict["NAME"])
+                target = sqlite3.connect(path)
+                source.backup(target)
+                target.execute(f"PRAGMA journal_mode={journal_mode}")
+                source.close()
+                target.close()
+
+                connections.settings[ALIAS] = {
+                    **default.settings_dict,
+                    "NAME": path,
+                    "OPTIONS": dict(db_options),
+                }
+                try:
+                    result = self.run(thread_ids, user_ids, options)
+                finally:
+                    connections.close_all()
+                    del connections.settings[ALIAS]
+                self.report(name, result, options["seconds"])
+
+    def run(self, thread_ids, user_ids, options):
+        deadline = time.monotonic() + options["seconds"]
+        lock = threading.Lock()
+        result = {"reads": [], "writes": 0, "locked": 0}
+
+        def reader():
+            latencies = []
+            locked = 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    list(
+                        models.Thread.live.using(ALIAS)
+                        .select_related("category")
+                        .order_by("-created_timestamp")[:10]
+                    )
+                    models.Thread.live.using(ALIAS).count()
+                except OperationalError:
+                    locked += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            connections[ALIAS].close()
+            with lock:
+                result["reads"].extend(latencies)
+                result["locked"] += locked
+
+        def writer():
+            writes = locked = 0
+            upvotes = models.UpvoteThread.objects.using(ALIAS)
+            while time.monotonic() < deadline:
+                thread_id = random.choice(thread_ids)
+                user_id = random.choice(user_ids)
+                try:
+                    # Read then write in one transaction, like toggle_thread_like
+                    with transaction.atomic(using=ALIAS):
+                        existing = upvotes.filter(
+                            thread_id=thread_id, user_id=user_id
+                        ).first()
+                        if existing:
+                            existing.delete(using=ALIAS)
+                        else:
+                            upvotes.create(thread_id=thread_id, user_id=user_id)
+                    writes += 1
+                except OperationalError:
+                    locked += 1
+            connections[ALIAS].close()
+            with lock:
+                result["writes"] += writes
+                result["locked"] += locked
+
+        workers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        workers += [threading.Thread(target=writer) for _ in range(options["writers"])]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return result
+
+    def report(self, name, result, seconds):
+        reads = sorted(result["reads"])
+        p99 = reads[int(len(reads) * 0.99) - 1] if reads else 0
+        self.stdout.write(
+            f"{name}: {len(reads) / seconds:.0f} reads/s "
+            f"(median {statistics.median(reads or [0]) * 1000:.1f} ms, "
+            f"p99 {p99 * 1000:.1f} ms), {result['writes'] / seconds:.0f} writes/s, "
+            f"{result['locked']} 'database is locked' errors"
+        )
@@ -0,0 +1,90 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from forum import events
+
+
+class Command(BaseCommand):
+    help = (
+        "Feed the forum event log to the consumers in FORUM_EVENT_CONSUMERS, "
+        "in batches from each consumer's stored offset, until they have "
+        "caught up (or forever with --follow)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer",
+            action="append",
+            dest="names",
+            metavar="NAME",
+            help="Only run this consumer (repeatable).",
+        )
+        parser.add_argument(
+            "--rewind",
+            type=int,
+            metavar="EVENT_ID",
+            help="Replay the log from after this sequence number; 0 resets "
+            "the consumers' data and replays everything.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Events per batch (default: each consumer's batch_size).",
+        )
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Keep polling for new events instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2,
+            help="Seconds between polls with --follow (default: 2).",
+        )
+
+    def handle(self, *args, **options):
+        consumers = events.consumers()
+        if options["names"]:
+            known = {consumer.name for consumer in consumers}
+            unknown = set(options["names"]) - known
+            if unknown:
+                raise CommandError(f"Unknown consumers: {', '.join(sorted(unknown))}")
+            consumers = [c for c in consumers if c.name in options["names"]]
+        if not consumers:
+            raise CommandError("No consumers configured in FORUM_EVENT_CONSUMERS.")
+
+        for consumer in consumers:
+            if options["batch_size"]:
+                consumer.batch_size = options["batch_size"]
+            if options["rewind"] is not None:
+                try:
+                    events.rewind(consumer, options["rewind"])
+                except ValueError as e:
+                    raise CommandError(e)
+                self.stdout.write(
+                    f"{consumer.name}: rewound to event {options['rewind']}"
+                )
+
+        totals = dict.fromkeys((consumer.name for consumer in consumers), 0)
+        while True:
+            processed = 0
+            for consumer in consumers:
+                count = events.process_batch(consumer)
+                if count:
+                    totals[consumer.name] += count
+                    self.stdout.write(
+                        f"{consumer.name}: {totals[consumer.name]} events processed"
+                    )
+                processed += count
+            if processed:
+                continue
+            if not options["follow"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+        for name, total in totals.items():
+            self.stdout.write(self.style.SUCCESS(f"{name}: caught up, {total} events"))
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forum import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream forum content (categories, tags, courses, resources, threads, "
+        "replies, upvotes and reports) to a JSONL file without loading whole "
+        "tables into memory. Paths ending in .gz are compressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output",
+            nargs="?",
+            default="-",
+            help="File to write, or - for stdout (default).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database cursor at a time (default: 2000).",
+        )
+
+    def handle(self, *args, **options):
+        out = transfer.open_file(options["output"], "w")
+        try:
+            for model in transfer.MODELS:
+                started = time.monotonic()
+                count = self.export(model, out, options["chunk_size"])
+                self.stderr.write(
+                    f"{model._meta.label}: {count} rows "
+                    f"in {time.monotonic() - started:.1f}s"
+                )
+        finally:
+            if options["output"] != "-":
+                out.close()
+
+    def export(self, model, out, chunk_size):
+        fields = transfer.exported_fields(model)
+        names = [field.name for field in fields]
+        # Users aren't part of the dump, so they travel as usernames
+        columns = [
+            (
+                f"{field.name}__{transfer.User.USERNAME_FIELD}"
+                if transfer.is_user_field(field)
+                else field.attname
+            )
+            for field in fields
+        ]
+        rows = (
+            model._default_manager.order_by("pk")
+            .values_list("pk", *columns)
+            .iterator(chunk_size=chunk_size)
+        )
+        count = 0
+        for pk, *values in rows:
+            out.write(transfer.encode(model, pk, dict(zip(names, values))))
+            out.write("\n")
+            count += 1
+        return count
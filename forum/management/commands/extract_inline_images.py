@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+
+from forum import models
+from forum.inline_images import DATA_URI_RE, extract_inline_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Move base64 data-URI images out of existing thread and reply bodies "
+        "into content-addressed files under MEDIA_ROOT, in keyset-paginated "
+        "batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Rows to load and update per batch (default: 200).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many rows would change without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        for model in (models.Thread, models.Reply):
+            self.convert(model, options["batch_size"], options["dry_run"])
+
+    def convert(self, model, batch_size, dry_run):
+        # NOTE: bulk_update skips the save signals, so stats, indexes and the
+        # pre_save extraction hook aren't re-run for rows that only lose bytes
+        candidates = model.objects.filter(content__contains="data:image/").only(
+            "id", "content"
+        )
+        last_id = 0
+        scanned = changed = saved_bytes = 0
+        while True:
+            batch = list(candidates.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+
+            updated = []
+            for obj in batch:
+                if dry_run:
+                    matches = [m.group(0) for m in DATA_URI_RE.finditer(obj.content)]
+                    changed += bool(matches)
+                    saved_bytes += sum(len(match) for match in matches)
+                    continue
+                content = extract_inline_images(obj.content)
+                if content != obj.content:
+                    saved_bytes += len(obj.content) - len(content)
+                    obj.content = content
+                    updated.append(obj)
+            changed += len(updated)
+            if updated:
+                model.objects.bulk_update(updated, ["content"])
+            self.stdout.write(
+                f"{model.__name__}: scanned {scanned}, rewrote {changed} "
+                f"(up to id {last_id})"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{model.__name__}: {changed} rows rewritten, "
+                f"{saved_bytes / 1024 / 1024:.1f} MiB removed from the table"
+                + (" (dry run)" if dry_run else "")
+            )
+        )
@@ -0,0 +1,260 @@
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import URLValidator
+from django.db import transaction
+
+from forum import models, reference
+
+RESOURCE_TYPES = {value for value, _ in models.Resource._meta.get_field("type").choices}
+
+
+def check_url(url, timeout):
+    try:
+        URLValidator()(url)
+        response = requests.head(url, timeout=timeout, allow_redirects=True)
+        # Some hosts refuse HEAD outright
+        if response.status_code in (403, 405, 501):
+            response = requests.get(url, timeout=timeout, stream=True)
+            response.close()
+        return response.status_code < 400
+    except (ValidationError, requests.RequestException):
+        return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert courses (by code) and their resources from a CSV or JSONL "
+        "catalog. CSV rows have code, title, department and optionally "
+        "resource_title, resource_type and resource_link columns; JSONL lines "
+        "are courses with a list of resources. New and changed resource links "
+        "are checked concurrently before anything is written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("catalog", help="Path to a .csv or .jsonl file.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Catalog format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per bulk write (default: 500).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=16,
+            help="Concurrent link checks (default: 16).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5.0,
+            help="Seconds to wait for each link (default: 5).",
+        )
+        parser.add_argument(
+            "--skip-url-check",
+            action="store_true",
+            help="Don't request resource links before importing them.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the diff without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        self.timings = {}
+        path = options["catalog"]
+        fmt = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if fmt not in ("csv", "jsonl"):
+            raise CommandError("Pass --format for files not ending in .csv/.jsonl.")
+
+        with self.stage("parse"):
+            catalog = self.parse(path, fmt)
+        with self.stage("diff"):
+            courses, resources = self.diff(catalog)
+        if not options["skip_url_check"]:
+            with self.stage("check links"):
+                resources = self.check_links(
+                    resources, options["workers"], options["timeout"]
+                )
+        if not options["dry_run"]:
+            with self.stage("write"):
+                self.write(catalog, courses, resources, options["batch_size"])
+            reference.invalidate()
+
+        for name, seconds in self.timings.items():
+            self.stdout.write(f"{name:>12}: {seconds:.2f}s")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Courses: {len(courses['new'])} new, {len(courses['changed'])} "
+                f"changed, {courses['unchanged']} unchanged. Resources: "
+                f"{len(resources['new'])} new, {len(resources['changed'])} "
+                f"changed, {resources['unchanged']} unchanged, "
+                f"{len(resources['broken'])} broken links skipped."
+                + (" (dry run)" if options["dry_run"] else "")
+            )
+        )
+
+    @contextmanager
+    def stage(self, name):
+        started = time.monotonic()
+        yield
+        self.timings[name] = time.monotonic() - started
+
+    def parse(self, path, fmt):
+        # code -> {"title", "department", "resources": {link: (title, type)}}
+        catalog = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                rows = (
+                    {
+                        **row,
+                        "resources": (
+                            [
+                                {
+                                    "title": row.get("resource_title"),
+                                    "type": row.get("resource_type"),
+                                    "link": row["resource_link"],
+                                }
+                            ]
+                            if row.get("resource_link")
+                            else []
+                        ),
+                    }
+                    for row in csv.DictReader(f)
+                )
+            else:
+                rows = (json.loads(line) for line in f if line.strip())
+            for number, row in enumerate(rows, 1):
+                code = (row.get("code") or "").strip()
+                if not code:
+                    self.stderr.write(f"Row {number}: missing course code, skipped")
+                    continue
+                course = catalog.setdefault(
+                    code,
+                    {
+                        "title": row["title"].strip(),
+                        "department": row["department"].strip(),
+                        "resources": {},
+                    },
+                )
+                for resource in row.get("resources", ()):
+                    resource_type = (resource.get("type") or "link").lower()
+                    if resource_type not in RESOURCE_TYPES:
+                        self.stderr.write(
+                            f"Row {number}: unknown resource type "
+                            f"{resource_type!r}, skipped"
+                        )
+                        continue
+                    link = resource["link"].strip()
+                    course["resources"][link] = (
+                        (resource.get("title") or link).strip(),
+                        resource_type,
+                    )
+        return catalog
+
+    def diff(self, catalog):
+        existing = {
+            code: (title, department)
+            for code, title, department in models.Course.objects.values_list(
+                "code", "title", "department"
+            )
+        }
+        courses = {"new": [], "changed": [], "unchanged": 0}
+        for code, course in catalog.items():
+            values = (course["title"], course["department"])
+            if code not in existing:
+                courses["new"].append(code)
+            elif existing[code] != values:
+                courses["changed"].append(code)
+            else:
+                courses["unchanged"] += 1
+
+        # (course code, link) -> (id, title, type)
+        existing_resources = {
+            (code, link): (pk, title, resource_type)
+            for pk, code, link, title, resource_type in models.Resource.objects.filter(
+                course__code__in=[code for code in catalog if code in existing]
+            ).values_list("id", "course__code", "link", "title", "type")
+        }
+        resources = {"new": [], "changed": [], "unchanged": 0, "broken": []}
+        for code, course in catalog.items():
+            for link, (title, resource_type) in course["resources"].items():
+                current = existing_resources.get((code, link))
+                if current is None:
+                    resources["new"].append((code, link, title, resource_type))
+                elif current[1:] != (title, resource_type):
+                    resources["changed"].append(
+                        (current[0], link, title, resource_type)
+                    )
+                else:
+                    resources["unchanged"] += 1
+        return courses, resources
+
+    def check_links(self, resources, workers, timeout):
+        links = {row[1] for row in resources["new"] + resources["changed"]}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            ok = dict(zip(links, pool.map(lambda url: check_url(url, timeout), links)))
+        broken = {link for link, passed in ok.items() if not passed}
+        for link in sorted(broken):
+            self.stderr.write(f"Broken link skipped: {link}")
+        return {
+            **resources,
+            "new": [row for row in resources["new"] if row[1] not in broken],
+            "changed": [row for row in resources["changed"] if row[1] not in broken],
+            "broken": sorted(broken),
+        }
+
+    @transaction.atomic
+    def write(self, catalog, courses, resources, batch_size):
+        models.Course.objects.bulk_create(
+            [
+                models.Course(
+                    code=code,
+                    title=catalog[code]["title"],
+                    department=catalog[code]["department"],
+                )
+                for code in courses["new"] + courses["changed"]
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["code"],
+            update_fields=["title", "department"],
+        )
+        course_ids = dict(
+            models.Course.objects.filter(
+                code__in={code for code, *_ in resources["new"]}
+            ).values_list("code", "id")
+        )
+        models.Resource.objects.bulk_create(
+            [
+                models.Resource(
+                    course_id=course_ids[code],
+                    link=link,
+                    title=title,
+                    type=resource_type,
+                )
+                for code, link, title, resource_type in resources["new"]
+            ],
+            batch_size=batch_size,
+        )
+        models.Resource.objects.bulk_update(
+            [
+                models.Resource(id=pk, link=link, title=title, type=resource_type)
+                for pk, link, title, resource_type in resources["changed"]
+            ],
+            ["title", "type"],
+            batch_size=batch_size,
+        )
@@ -0,0 +1,223 @@
+import json
+import os
+import time
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from forum import models, reference, rollups, stats, transfer
+from studydeck.db_router import use_primary
+
+# Only rows other rows point at need their new primary keys remembered
+REFERENCED = {
+    field.related_model
+    for model in transfer.MODELS
+    for field in transfer.exported_fields(model)
+    if field.is_relation and field.related_model in transfer.MODELS
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a JSONL file written by export_forum in batches, remapping "
+        "foreign keys to the new primary keys. Every batch is checkpointed in "
+        "its own transaction so an interrupted import can be resumed by "
+        "running the same command again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="File written by export_forum.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per bulk_create and per checkpoint (default: 1000).",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint name (default: the input's absolute path).",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the first line.",
+        )
+
+    def handle(self, *args, **options):
+        if options["input"] == "-":
+            raise CommandError("Imports must read from a file so they can resume.")
+        name = options["checkpoint"] or os.path.abspath(options["input"])
+        checkpoints = models.ImportCheckpoint.objects.filter(name=name)
+        if options["restart"]:
+            checkpoints.delete()
+
+        # label -> {exported pk: new pk}
+        self.pks = {model._meta.label_lower: {} for model in REFERENCED}
+        self.skipped = 0
+        done = self.resume(checkpoints)
+        if done:
+            self.stderr.write(f"Resuming after line {done}")
+
+        started = time.monotonic()
+        imported = 0
+        with transfer.open_file(options["input"], "r") as source:
+            lines = (
+                (number, line)
+                for number, line in enumerate(source, 1)
+                if number > done and line.strip()
+            )
+            for batch in self.batches(lines, options["batch_size"]):
+                label = batch[0][1]["model"]
+                # The checkpoint commits with the rows, so a resumed import
+                # never loads a batch twice
+                with transaction.atomic():
+                    created, first_day = self.load(transfer.BY_LABEL[label], batch)
+                    models.ImportCheckpoint.objects.create(
+                        name=name,
+                        line=batch[-1][0],
+                        model=label,
+                        pks=created,
+                        first_day=first_day,
+                    )
+                imported += len(batch)
+                self.stderr.write(f"{label}: through line {batch[-1][0]}")
+
+        self.reconcile(checkpoints.aggregate(first_day=Min("first_day"))["first_day"])
+        checkpoints.delete()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} rows ({self.skipped} skipped) in "
+                f"{time.monotonic() - started:.1f}s."
+            )
+        )
+
+    def resume(self, checkpoints):
+        done = 0
+        with use_primary():
+            for line, label, pks in checkpoints.order_by("line").values_list(
+                "line", "model", "pks"
+            ):
+                done = line
+                if label in self.pks:
+                    self.pks[label].update(pks)
+        return done
+
+    def reconcile(self, first_day):
+        # Everything derived from the imported rows: denormalized counters,
+        # cached choices, and the daily rollups of days already rolled up.
+        # Each worker's in-memory indexes pick the new rows up on catch-up.
+        threads = stats.reconcile_threads()
+        categories = stats.reconcile()
+        reference.invalidate()
+        self.stderr.write(f"Reconciled {threads} threads and {categories} categories")
+        last_day = rollups.last_rolled_up()
+        if first_day and last_day and first_day <= last_day:
+            for chunk in rollups.chunks(first_day, last_day, 7):
+                rollups.roll_up(*chunk)
+            self.stderr.write(f"Rolled up {first_day} to {last_day} again")
+
+    def batches(self, lines, batch_size):
+        records = ((number, json.loads(line)) for number, line in lines)
+        for _, group in groupby(records, key=lambda item: item[1]["model"]):
+            batch = []
+            for item in group:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def load(self, model, batch):
+        fields = transfer.exported_fields(model)
+        label = model._meta.label_lower
+        records = [record for _, record in batch]
+        usernames = {
+            record["fields"][field.name]
+            for record in records
+            for field in fields
+            if transfer.is_user_field(field) and record["fields"].get(field.name)
+        }
+        users = dict(
+            transfer.User.objects.filter(
+                **{f"{transfer.User.USERNAME_FIELD}__in": usernames}
+            ).values_list(transfer.User.USERNAME_FIELD, "id")
+        )
+
+        existing = {}
+        natural_key = transfer.NATURAL_KEYS.get(model)
+        if natural_key:
+            existing = dict(
+                model._default_manager.filter(
+                    **{
+                        f"{natural_key}__in": [
+                            record["fields"][natural_key] for record in records
+                        ]
+                    }
+                ).values_list(natural_key, "pk")
+            )
+
+        created = {}
+        objs = []
+        old_pks = []
+        deferred = []
+        for record in records:
+            values = record["fields"]
+            if natural_key and values[natural_key] in existing:
+                created[str(record["pk"])] = existing[values[natural_key]]
+                continue
+            kwargs = {}
+            for field in fields:
+                value = values.get(field.name)
+                if value is not None and transfer.is_user_field(field):
+                    value = users.get(value)
+                elif value is not None and field.is_relation:
+                    target = field.related_model._meta.label_lower
+                    if field.related_model is model and str(value) not in (
+                        self.pks[target]
+                    ):
+                        # Points at a row in this same batch, fixed up below
+                        deferred.append((len(objs), field, str(value)))
+                        value = None
+                    else:
+                        value = self.pks[target].get(str(value))
+                else:
+                    value = field.to_python(value) if value is not None else None
+                if value is None and not field.null:
+                    if field.is_relation:
+                        break
+                    continue
+                kwargs[field.attname] = value
+            else:
+                objs.append(model(**kwargs))
+                old_pks.append(str(record["pk"]))
+                continue
+            # A required user or parent row is missing
+            self.skipped += 1
+
+        timestamps = [
+            obj.created_timestamp
+            for obj in objs
+            if getattr(obj, "created_timestamp", None) is not None
+        ]
+        first_day = timezone.localdate(min(timestamps)) if timestamps else None
+
+        if model in REFERENCED:
+            model._default_manager.bulk_create(objs)
+            created.update(zip(old_pks, (obj.pk for obj in objs)))
+            self.pks[label].update(created)
+            if deferred:
+                for index, field, old in deferred:
+                    setattr(objs[index], field.attname, self.pks[label].get(old))
+                model._default_manager.bulk_update(
+                    [objs[index] for index, _, _ in deferred],
+                    list({field.name for _, field, _ in deferred}),
+                )
+        else:
+            # Upvotes and tag links may already exist when merging into a
+            # populated database
+            model._default_manager.bulk_create(objs, ignore_conflicts=True)
+        return created, first_day
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forum import events
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete events older than the retention period that every consumer in "
+        "FORUM_EVENT_CONSUMERS has processed. Consumers can't be rewound into "
+        "the pruned part of the log afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.FORUM_EVENT_RETENTION_DAYS,
+            help="Keep this many days of events (default: "
+            "FORUM_EVENT_RETENTION_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        deleted = events.prune(timezone.now() - timedelta(days=options["days"]))
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} events."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from forum import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount per-thread and per-category reply totals and last activity "
+        "from the Thread and Reply tables, correcting any drift in the "
+        "denormalized counters."
+    )
+
+    def handle(self, *args, **options):
+        threads = stats.reconcile_threads()
+        categories = stats.reconcile()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled {threads} threads and {categories} categories."
+            )
+        )
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from forum import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll up threads, replies and upvotes per category, course and tag per "
+        "day. By default only the complete days after the last rolled-up day "
+        "are processed; --rebuild recounts a range of history in parallel "
+        "chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recount every day between --since and --until.",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="First day to rebuild, YYYY-MM-DD (default: the first thread).",
+        )
+        parser.add_argument(
+            "--until",
+            type=date.fromisoformat,
+            help="Last day to rebuild, YYYY-MM-DD (default: yesterday).",
+        )
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=7,
+            help="Days counted per chunk (default: 7).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Chunks rebuilt at once with --rebuild (default: 4).",
+        )
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        if options["rebuild"]:
+            until = options["until"] or yesterday
+            # The watermark may move to --until, and a day that isn't over
+            # would then never be counted again
+            if until > yesterday:
+                raise CommandError(f"--until must be {yesterday} or earlier.")
+            self.rebuild(
+                options["since"] or rollups.first_activity_day(), until, options
+            )
+            return
+        if options["since"] or options["until"]:
+            raise CommandError("--since and --until only apply to --rebuild.")
+
+        last_day = rollups.last_rolled_up()
+        first_day = (
+            last_day + timedelta(days=1) if last_day else rollups.first_activity_day()
+        )
+        if first_day is None or first_day > yesterday:
+            self.stdout.write("Nothing to roll up.")
+            return
+        # In order, moving the watermark with each chunk, so an interrupted
+        # run resumes after the last chunk it finished
+        for chunk_start, chunk_end in rollups.chunks(
+            first_day, yesterday, options["chunk_days"]
+        ):
+            rows = rollups.roll_up(chunk_start, chunk_end, advance_watermark=True)
+            self.stdout.write(f"{chunk_start} to {chunk_end}: {rows} rows")
+        self.stdout.write(self.style.SUCCESS(f"Rolled up through {yesterday}"))
+
+    def rebuild(self, since, until, options):
+        if since is None:
+            self.stdout.write("Nothing to roll up.")
+            return
+        if since > until:
+            raise CommandError("--since is after --until.")
+
+        def run(chunk):
+            try:
+                return chunk, rollups.roll_up(*chunk)
+            finally:
+                # Each worker thread opened its own connection
+                connection.close()
+
+        chunks = list(rollups.chunks(since, until, options["chunk_days"]))
+        with ThreadPoolExecutor(options["workers"]) as executor:
+            for (chunk_start, chunk_end), rows in executor.map(run, chunks):
+                self.stdout.write(f"{chunk_start} to {chunk_end}: {rows} rows")
+
+        last_day = rollups.last_rolled_up()
+        # Only a rebuild that connects to the rolled-up history moves the
+        # watermark, otherwise the days in between would be skipped
+        if last_day is None or since <= last_day + timedelta(days=1) <= until:
+            rollups.set_watermark(until)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(chunks)} chunks, {since} to {until}")
+        )
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+BOOT_SCRIPT = "import studydeck.wsgi"
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the WSGI application in a fresh interpreter with -X importtime "
+        "and print the slowest modules and top-level packages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=25,
+            help="Number of modules and packages to show (default: 25).",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Also run the gunicorn preload warm-up and report its imports.",
+        )
+
+    def handle(self, *args, **options):
+        script = BOOT_SCRIPT
+        if options["warm"]:
+            script += "; from studydeck.warmup import warm; warm()"
+
+        env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Application failed to boot:\n{result.stderr}")
+
+        modules = []
+        packages = defaultdict(int)
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:") :].split("|")
+            name = name.strip()
+            modules.append((int(cumulative_us), int(self_us), name))
+            packages[name.split(".")[0]] += int(self_us)
+
+        limit = options["limit"]
+        total_us = sum(packages.values())
+        self.stdout.write(
+            f"Imported {len(modules)} modules in {total_us / 1000:.1f} ms\n"
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest modules (cumulative)"))
+        for cumulative_us, self_us, name in sorted(modules, reverse=True)[:limit]:
+            self.stdout.write(
+                f"{cumulative_us / 1000:9.1f} ms {self_us / 1000:9.1f} ms  {name}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nPackages (self time)"))
+        ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        for package, self_us in ranked[:limit]:
+            share = self_us / total_us * 100 if total_us else 0
+            self.stdout.write(f"{self_us / 1000:9.1f} ms {share:5.1f}%  {package}")
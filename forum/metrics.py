@@ -0,0 +1,34 @@
+"""
+Per-process counters and timers, read by the staff-only ``/metrics/`` view.
+
+Each gunicorn worker keeps its own numbers; the view reports the pid of the
+worker that answered so scrapes can be told apart.
+"""
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timers = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name, duration_ms):
+    with _lock:
+        timer = _timers[name]
+        timer["count"] += 1
+        timer["total_ms"] += duration_ms
+        timer["max_ms"] = max(timer["max_ms"], duration_ms)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "timers": {name: dict(timer) for name, timer in _timers.items()},
+        }
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-19 02:10
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0007_remove_reply_upvotes_remove_thread_upvotes_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reply",
+            name="created_timestamp",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AlterField(
+            model_name="thread",
+            name="created_timestamp",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reply",
+            index=models.Index(
+                fields=["is_deleted", "created_timestamp"],
+                name="forum_reply_deleted_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                fields=["resolved", "created_timestamp"],
+                name="forum_report_resolved_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="thread",
+            index=models.Index(
+                fields=["is_deleted", "created_timestamp"],
+                name="forum_thread_deleted_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="thread",
+            index=models.Index(
+                fields=["is_locked", "created_timestamp"],
+                name="forum_thread_locked_ts_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 6.0 on 2026-10-19 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def backfill_category_stats(apps, schema_editor):
+    Category = apps.get_model("forum", "Category")
+    CategoryStats = apps.get_model("forum", "CategoryStats")
+    Thread = apps.get_model("forum", "Thread")
+    Reply = apps.get_model("forum", "Reply")
+    threads = {
+        row["category_id"]: row
+        for row in Thread.objects.filter(is_deleted=False)
+        .values("category_id")
+        .annotate(count=Count("id"), last=Max("created_timestamp"))
+        .order_by()
+    }
+    replies = {
+        row["thread__category_id"]: row
+        for row in Reply.objects.filter(is_deleted=False, thread__is_deleted=False)
+        .values("thread__category_id")
+        .annotate(count=Count("id"), last=Max("created_timestamp"))
+        .order_by()
+    }
+
+    stats = []
+    for category_id in Category.objects.values_list("id", flat=True):
+        thread_row = threads.get(category_id, {})
+        reply_row = replies.get(category_id, {})
+        candidates = [
+            ts for ts in (thread_row.get("last"), reply_row.get("last")) if ts
+        ]
+        last_activity = max(candidates) if candidates else None
+        last_thread = None
+        if last_activity:
+            live = Thread.objects.filter(category_id=category_id, is_deleted=False)
+            last_thread = (
+                live.filter(created_timestamp=last_activity).first()
+                or live.filter(
+                    reply__created_timestamp=last_activity, reply__is_deleted=False
+                ).first()
+            )
+        stats.append(
+            CategoryStats(
+                category_id=category_id,
+                thread_count=thread_row.get("count", 0),
+                reply_count=reply_row.get("count", 0),
+                last_activity_timestamp=last_activity,
+                last_thread=last_thread,
+                last_thread_title=last_thread.title if last_thread else "",
+            )
+        )
+    CategoryStats.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0008_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryStats",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="forum.category",
+                    ),
+                ),
+                ("thread_count", models.PositiveIntegerField(default=0)),
+                ("reply_count", models.PositiveIntegerField(default=0)),
+                (
+                    "last_activity_timestamp",
+                    models.DateTimeField(blank=True, null=True),
+                ),
+                ("last_thread_title", models.CharField(blank=True, max_length=200)),
+                (
+                    "last_thread",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="forum.thread",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-19 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0009_categorystats"),
+    ]
+
+    operations = [
+        # The table already exists as Thread.tags' auto-created through
+        # table, so only the migration state changes here
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="ThreadTag",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "tag",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="forum.tag",
+                            ),
+                        ),
+                        (
+                            "thread",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="forum.thread",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "forum_thread_tags",
+                        "unique_together": {("thread", "tag")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="thread",
+                    name="tags",
+                    field=models.ManyToManyField(
+                        blank=True, through="forum.ThreadTag", to="forum.tag"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="threadtag",
+            index=models.Index(
+                fields=["tag", "thread"], name="forum_threadtag_tag_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 6.0 on 2026-10-19 02:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_thread_activity(apps, schema_editor):
+    Thread = apps.get_model("forum", "Thread")
+    Reply = apps.get_model("forum", "Reply")
+    live_replies = Reply.objects.filter(thread=OuterRef("pk"), is_deleted=False)
+    Thread.objects.update(
+        reply_count=Coalesce(
+            Subquery(
+                live_replies.order_by()
+                .values("thread")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        ),
+        last_activity_timestamp=Coalesce(
+            Subquery(
+                live_replies.order_by()
+                .values("thread")
+                .annotate(last=Max("created_timestamp"))
+                .values("last")
+            ),
+            F("created_timestamp"),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0010_threadtag"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThreadReadMarker",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_read_timestamp", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="thread",
+            name="last_activity_timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="thread",
+            name="reply_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="reply",
+            index=models.Index(
+                fields=["thread", "created_timestamp"], name="forum_reply_thread_ts_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="threadreadmarker",
+            name="thread",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="read_markers",
+                to="forum.thread",
+            ),
+        ),
+        migrations.AddField(
+            model_name="threadreadmarker",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="threadreadmarker",
+            constraint=models.UniqueConstraint(
+                fields=("user", "thread"), name="unique_thread_read_marker"
+            ),
+        ),
+        migrations.RunPython(backfill_thread_activity, migrations.RunPython.noop),
+    ]
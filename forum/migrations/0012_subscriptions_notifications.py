@@ -0,0 +1,146 @@
+# Generated by Django 6.0 on 2026-10-19 02:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def subscribe_participants(apps, schema_editor):
+    # Thread authors and everyone who already replied follow the thread
+    Thread = apps.get_model("forum", "Thread")
+    Reply = apps.get_model("forum", "Reply")
+    ThreadSubscription = apps.get_model("forum", "ThreadSubscription")
+    authored = Thread.objects.filter(author__isnull=False).values_list(
+        "id", "author_id"
+    )
+    replied = (
+        Reply.objects.filter(author__isnull=False)
+        .values_list("thread_id", "author_id")
+        .distinct()
+        .order_by()
+    )
+    for participants in (authored, replied):
+        batch = []
+        for thread_id, author_id in participants.iterator(chunk_size=2000):
+            batch.append(ThreadSubscription(thread_id=thread_id, user_id=author_id))
+            if len(batch) >= 2000:
+                ThreadSubscription.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        ThreadSubscription.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0011_thread_activity_read_markers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Notification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_timestamp",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("is_read", models.BooleanField(default=False)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notifications",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "reply",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="forum.reply",
+                    ),
+                ),
+                (
+                    "thread",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="forum.thread"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["recipient", "-id"], name="forum_notif_inbox_idx"
+                    ),
+                    models.Index(
+                        condition=models.Q(("is_read", False)),
+                        fields=["recipient"],
+                        name="forum_notif_unread_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ThreadSubscription",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_timestamp",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "thread",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="subscriptions",
+                        to="forum.thread",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("thread", "user"), name="unique_thread_subscription"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(subscribe_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0012_subscriptions_notifications"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(db_index=True, max_length=255)),
+                ("line", models.PositiveIntegerField()),
+                ("model", models.CharField(max_length=100)),
+                ("pks", models.JSONField(blank=True, default=dict)),
+                ("first_day", models.DateField(blank=True, null=True)),
+            ],
+        ),
+    ]
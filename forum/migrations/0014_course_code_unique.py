@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 02:24
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_courses(apps, schema_editor):
+    Course = apps.get_model("forum", "Course")
+    Resource = apps.get_model("forum", "Resource")
+    Thread = apps.get_model("forum", "Thread")
+    duplicated = (
+        Course.objects.values("code")
+        .annotate(copies=Count("id"), keep=Min("id"))
+        .filter(copies__gt=1)
+    )
+    for row in duplicated:
+        others = Course.objects.filter(code=row["code"]).exclude(id=row["keep"])
+        Resource.objects.filter(course__in=others).update(course_id=row["keep"])
+        Thread.objects.filter(course__in=others).update(course_id=row["keep"])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+    # The merge commits before the constraint is added: PostgreSQL refuses
+    # to ALTER a table with deferred FK checks pending from the updates
+    # ("pending trigger events") in the same transaction
+    atomic = False
+
+    dependencies = [
+        ("forum", "0013_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_courses, migrations.RunPython.noop, atomic=True
+        ),
+        migrations.AddConstraint(
+            model_name="course",
+            constraint=models.UniqueConstraint(
+                fields=("code",), name="unique_course_code"
+            ),
+        ),
+    ]
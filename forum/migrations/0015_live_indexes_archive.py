@@ -0,0 +1,162 @@
+# Generated by Django 6.0.1 on 2026-10-19 02:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0014_course_code_unique"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedReply",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("parent_id", models.BigIntegerField(blank=True, null=True)),
+                ("content", models.TextField()),
+                ("created_timestamp", models.DateTimeField()),
+                ("is_deleted", models.BooleanField(default=False)),
+                ("upvote_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedThread",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=200)),
+                ("content", models.TextField()),
+                ("created_timestamp", models.DateTimeField()),
+                ("is_locked", models.BooleanField(default=False)),
+                ("is_deleted", models.BooleanField(default=False)),
+                ("tags", models.JSONField(default=list)),
+                ("reply_count", models.PositiveIntegerField(default=0)),
+                ("upvote_count", models.PositiveIntegerField(default=0)),
+                ("last_activity_timestamp", models.DateTimeField()),
+                (
+                    "archived_timestamp",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="reply",
+            name="forum_reply_thread_ts_idx",
+        ),
+        migrations.AddIndex(
+            model_name="reply",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["thread", "created_timestamp"],
+                name="forum_reply_live_thread_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="thread",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["category", "created_timestamp"],
+                name="forum_thread_live_cat_ts_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedreply",
+            name="author",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedthread",
+            name="author",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedthread",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="forum.category",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedthread",
+            name="course",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="forum.course",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedthread",
+            name="resource",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="forum.resource",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedreply",
+            name="thread",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="forum.archivedthread",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedreply",
+            index=models.Index(
+                fields=["thread", "created_timestamp"],
+                name="forum_archreply_thread_ts_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedReport",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("reply_id", models.BigIntegerField(blank=True, null=True)),
+                ("reason", models.TextField()),
+                ("created_timestamp", models.DateTimeField()),
+                ("resolved", models.BooleanField(default=True)),
+                (
+                    "author",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "thread",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reports",
+                        to="forum.archivedthread",
+                    ),
+                ),
+            ],
+        ),
+    ]
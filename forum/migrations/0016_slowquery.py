@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-19 03:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0015_live_indexes_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlowQuery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fingerprint", models.CharField(max_length=40, unique=True)),
+                ("sql", models.TextField()),
+                ("params", models.TextField(blank=True)),
+                ("view", models.CharField(blank=True, max_length=200)),
+                ("frame", models.CharField(blank=True, max_length=300)),
+                ("explain", models.TextField(blank=True)),
+                ("count", models.PositiveIntegerField(default=1)),
+                ("total_ms", models.FloatField(default=0)),
+                ("max_ms", models.FloatField(default=0)),
+                ("first_seen", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_seen", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name_plural": "slow queries",
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 6.0.1 on 2026-10-19 03:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0016_slowquery"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventConsumer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("position", models.BigIntegerField(default=0)),
+                (
+                    "updated_timestamp",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ForumEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("type", models.CharField(max_length=40)),
+                ("actor_id", models.BigIntegerField(blank=True, null=True)),
+                ("thread_id", models.BigIntegerField(blank=True, null=True)),
+                ("reply_id", models.BigIntegerField(blank=True, null=True)),
+                ("data", models.JSONField(blank=True, default=dict)),
+                (
+                    "created_timestamp",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "sequence",
+                    models.BigIntegerField(blank=True, null=True, unique=True),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UserActivity",
+            fields=[
+                ("user_id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("threads", models.PositiveIntegerField(default=0)),
+                ("replies", models.PositiveIntegerField(default=0)),
+                ("likes", models.IntegerField(default=0)),
+                ("reports", models.PositiveIntegerField(default=0)),
+                ("last_active", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name_plural": "user activity",
+            },
+        ),
+    ]
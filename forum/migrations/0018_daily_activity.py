@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0017_event_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("last_day", models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("category", "Category"),
+                            ("course", "Course"),
+                            ("tag", "Tag"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("key", models.BigIntegerField()),
+                ("day", models.DateField()),
+                ("threads", models.PositiveIntegerField(default=0)),
+                ("replies", models.PositiveIntegerField(default=0)),
+                ("upvotes", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "daily activity",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("dimension", "day", "key"), name="unique_daily_activity"
+                    )
+                ],
+            },
+        ),
+    ]
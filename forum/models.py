@@ -10,6 +10,11 @@ class Course(models.Model):
     title = models.CharField(max_length=200)
     department = models.CharField(max_length=100)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["code"], name="unique_course_code"),
+        ]
+
     def __str__(self):
         return f"{self.code}: {self.title}"
 
@@ -47,6 +52,35 @@ class Category(models.Model):
         return self.name
 
 
+class CategoryStats(models.Model):
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    thread_count = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    last_activity_timestamp = models.DateTimeField(null=True, blank=True)
+    last_thread = models.ForeignKey(
+        "Thread",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    last_thread_title = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        return (
+            f"{self.category}: {self.thread_count} threads, {self.reply_count} replies"
+        )
+
+
+class LiveManager(models.Manager):
+    """Rows that haven't been soft-deleted."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Thread(models.Model):
     title = models.CharField(max_length=200)
     course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
@@ -55,13 +89,35 @@ class Thread(models.Model):
     )
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     content = models.TextField()
-    created_timestamp = models.DateTimeField(default=timezone.now)
+    created_timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     is_locked = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
-    tags = models.ManyToManyField(Tag, blank=True)
+    tags = models.ManyToManyField(Tag, blank=True, through="ThreadTag")
+    # Denormalized from Reply, maintained by forum.stats
+    reply_count = models.PositiveIntegerField(default=0)
+    last_activity_timestamp = models.DateTimeField(default=timezone.now)
+
+    objects = models.Manager()
+    live = LiveManager()
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["is_deleted", "created_timestamp"],
+                name="forum_thread_deleted_ts_idx",
+            ),
+            models.Index(
+                fields=["is_locked", "created_timestamp"],
+                name="forum_thread_locked_ts_idx",
+            ),
+            # Soft-deleted rows stay out of the indexes the listings use
+            models.Index(
+                fields=["category", "created_timestamp"],
+                condition=models.Q(is_deleted=False),
+                name="forum_thread_live_cat_ts_idx",
+            ),
+        ]
         permissions = [
             ("lock_thread", "Can lock threads"),
             ("delete_any_thread", "Can delete any thread"),
@@ -71,15 +127,43 @@ class Thread(models.Model):
         return f"{self.author}: {self.title}"
 
 
+class ThreadTag(models.Model):
+    # Explicit through model for Thread.tags, kept on the original
+    # auto-created table so it can carry a (tag, thread) index
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "forum_thread_tags"
+        unique_together = [("thread", "tag")]
+        indexes = [
+            models.Index(fields=["tag", "thread"], name="forum_threadtag_tag_idx"),
+        ]
+
+
 class Reply(models.Model):
     thread = models.ForeignKey(Thread, on_delete=models.CASCADE)
     parent = models.ForeignKey("self", on_delete=models.SET_NULL, null=True, blank=True)
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     content = models.TextField()
-    created_timestamp = models.DateTimeField(default=timezone.now)
+    created_timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     is_deleted = models.BooleanField(default=False)
 
+    objects = models.Manager()
+    live = LiveManager()
+
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["is_deleted", "created_timestamp"],
+                name="forum_reply_deleted_ts_idx",
+            ),
+            models.Index(
+                fields=["thread", "created_timestamp"],
+                condition=models.Q(is_deleted=False),
+                name="forum_reply_live_thread_ts_idx",
+            ),
+        ]
         permissions = [
             ("delete_any_reply", "Can delete any reply"),
         ]
@@ -88,6 +172,252 @@ class Reply(models.Model):
         return f"{self.author}: {self.content[:100]}"
 
 
+class ThreadReadMarker(models.Model):
+    # Everything in the thread up to last_read_timestamp has been seen
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    thread = models.ForeignKey(
+        Thread, on_delete=models.CASCADE, related_name="read_markers"
+    )
+    last_read_timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "thread"],
+                name="unique_thread_read_marker",
+            )
+        ]
+
+
+class ThreadSubscription(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    thread = models.ForeignKey(
+        Thread, on_delete=models.CASCADE, related_name="subscriptions"
+    )
+    created_timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread", "user"],
+                name="unique_thread_subscription",
+            )
+        ]
+
+
+class Notification(models.Model):
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="notifications"
+    )
+    actor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE)
+    reply = models.ForeignKey(Reply, on_delete=models.CASCADE, null=True, blank=True)
+    created_timestamp = models.DateTimeField(default=timezone.now)
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Inbox pages are keyset-paginated on id per recipient
+            models.Index(fields=["recipient", "-id"], name="forum_notif_inbox_idx"),
+            # Keeps the navbar unread count an index-only lookup
+            models.Index(
+                fields=["recipient"],
+                condition=models.Q(is_read=False),
+                name="forum_notif_unread_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.thread_id}"
+
+
+class ArchivedThread(models.Model):
+    # Keeps the id the thread had while it was live
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
+    resource = models.ForeignKey(
+        Resource, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    content = models.TextField()
+    created_timestamp = models.DateTimeField()
+    is_locked = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name="+")
+    tags = models.JSONField(default=list)
+    reply_count = models.PositiveIntegerField(default=0)
+    upvote_count = models.PositiveIntegerField(default=0)
+    last_activity_timestamp = models.DateTimeField()
+    archived_timestamp = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.author}: {self.title}"
+
+
+class ArchivedReply(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    thread = models.ForeignKey(
+        ArchivedThread, on_delete=models.CASCADE, related_name="replies"
+    )
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    author = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    content = models.TextField()
+    created_timestamp = models.DateTimeField()
+    is_deleted = models.BooleanField(default=False)
+    upvote_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["thread", "created_timestamp"],
+                name="forum_archreply_thread_ts_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.author}: {self.content[:100]}"
+
+
+class ArchivedReport(models.Model):
+    # Resolved reports move with their thread so the moderation history stays
+    id = models.BigIntegerField(primary_key=True)
+    thread = models.ForeignKey(
+        ArchivedThread, on_delete=models.CASCADE, related_name="reports"
+    )
+    reply_id = models.BigIntegerField(null=True, blank=True)
+    author = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    reason = models.TextField()
+    created_timestamp = models.DateTimeField()
+    resolved = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.author}: {self.reason}"
+
+
+class ImportCheckpoint(models.Model):
+    # Written by import_forum in the same transaction as the batch it records
+    name = models.CharField(max_length=255, db_index=True)
+    line = models.PositiveIntegerField()
+    model = models.CharField(max_length=100)
+    # Exported pk -> new pk of the batch's rows
+    pks = models.JSONField(default=dict, blank=True)
+    # Day of the batch's oldest row, for rebuilding the daily rollups
+    first_day = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.line}"
+
+
+class SlowQuery(models.Model):
+    # Written by forum.slow_queries, one row per distinct statement shape
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    view = models.CharField(max_length=200, blank=True)
+    frame = models.CharField(max_length=300, blank=True)
+    explain = models.TextField(blank=True)
+    count = models.PositiveIntegerField(default=1)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return self.sql[:100]
+
+
+class ForumEvent(models.Model):
+    # Append-only change feed written by forum.views, see forum.events. Ids
+    # are plain integers so events outlive the rows they describe.
+    type = models.CharField(max_length=40)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    thread_id = models.BigIntegerField(null=True, blank=True)
+    reply_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    created_timestamp = models.DateTimeField(default=timezone.now)
+    # Commit order, assigned after commit by forum.events.assign_sequence
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    def __str__(self):
+        return f"{self.id} {self.type}"
+
+
+class EventConsumer(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    # Sequence number of the last ForumEvent the consumer has processed
+    position = models.BigIntegerField(default=0)
+    updated_timestamp = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class UserActivity(models.Model):
+    # Derived from the event log by forum.consumers.UserActivityConsumer
+    user_id = models.BigIntegerField(primary_key=True)
+    threads = models.PositiveIntegerField(default=0)
+    replies = models.PositiveIntegerField(default=0)
+    # Likes given, less the ones taken back
+    likes = models.IntegerField(default=0)
+    reports = models.PositiveIntegerField(default=0)
+    last_active = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "user activity"
+
+    def __str__(self):
+        return f"User {self.user_id}"
+
+
+class DailyActivity(models.Model):
+    # Written by forum.rollups, one row per category, course or tag per day
+    CATEGORY = "category"
+    COURSE = "course"
+    TAG = "tag"
+    DIMENSIONS = [(CATEGORY, "Category"), (COURSE, "Course"), (TAG, "Tag")]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSIONS)
+    # Id of the category, course or tag
+    key = models.BigIntegerField()
+    day = models.DateField()
+    threads = models.PositiveIntegerField(default=0)
+    replies = models.PositiveIntegerField(default=0)
+    upvotes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "daily activity"
+        constraints = [
+            # Also serves the dashboard's (dimension, day range) lookups
+            models.UniqueConstraint(
+                fields=["dimension", "day", "key"], name="unique_daily_activity"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key} on {self.day}"
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    # Last day fully rolled up
+    last_day = models.DateField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_day}"
+
+
 class UpvoteThread(models.Model):
     thread = models.ForeignKey(Thread, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -125,6 +455,12 @@ class Report(models.Model):
     resolved = models.BooleanField(default=False)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["resolved", "created_timestamp"],
+                name="forum_report_resolved_ts_idx",
+            ),
+        ]
         permissions = [
             ("view_report_page", "Can view a page with all the reports"),
         ]
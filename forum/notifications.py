@@ -0,0 +1,41 @@
+from . import models
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def subscribe(user, thread):
+    models.ThreadSubscription.objects.bulk_create(
+        [models.ThreadSubscription(user=user, thread=thread)], ignore_conflicts=True
+    )
+
+
+def unsubscribe(user, thread):
+    models.ThreadSubscription.objects.filter(user=user, thread=thread).delete()
+
+
+def fan_out_reply(reply):
+    recipients = set(
+        models.ThreadSubscription.objects.filter(thread_id=reply.thread_id)
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=FAN_OUT_BATCH_SIZE)
+    )
+    if reply.parent_id and reply.parent.author_id:
+        recipients.add(reply.parent.author_id)
+    recipients.discard(reply.author_id)
+    models.Notification.objects.bulk_create(
+        [
+            models.Notification(
+                recipient_id=user_id,
+                actor_id=reply.author_id,
+                thread_id=reply.thread_id,
+                reply=reply,
+            )
+            for user_id in recipients
+        ],
+        batch_size=FAN_OUT_BATCH_SIZE,
+    )
+    return len(recipients)
+
+
+def unread_count(user):
+    return models.Notification.objects.filter(recipient=user, is_read=False).count()
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+
+from studydeck import caching
+
+from . import models
+
+# Courses, categories, tags and resources change a few times a semester but
+# are rendered on every thread form, so their dropdown choices are cached.
+REFERENCE_TIMEOUT = 60 * 60
+# Without a shared cache invalidate() only reaches the process it runs in,
+# so the other workers' copies must expire quickly instead
+LOCAL_REFERENCE_TIMEOUT = 10
+GENERATION_KEY = "forum:reference:generation"
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def _key(name):
+    return f"forum:reference:{_generation()}:{name}"
+
+
+def _timeout():
+    return REFERENCE_TIMEOUT if caching.is_shared() else LOCAL_REFERENCE_TIMEOUT
+
+
+def course_choices():
+    return cache.get_or_set(
+        _key("courses"),
+        lambda: [(course.id, str(course)) for course in models.Course.objects.all()],
+        _timeout(),
+    )
+
+
+def category_choices():
+    return cache.get_or_set(
+        _key("categories"),
+        lambda: list(models.Category.objects.values_list("id", "name")),
+        _timeout(),
+    )
+
+
+def tag_choices():
+    return cache.get_or_set(
+        _key("tags"),
+        lambda: list(models.Tag.objects.values_list("id", "name")),
+        _timeout(),
+    )
+
+
+def course_resources(course_id):
+    return cache.get_or_set(
+        _key(f"resources:{course_id}"),
+        lambda: list(
+            models.Resource.objects.filter(course_id=course_id).values("id", "title")
+        ),
+        _timeout(),
+    )
+
+
+def invalidate():
+    # Bumping the generation orphans every cached entry at once; they
+    # expire on their own after _timeout()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def warm():
+    course_ids = [course_id for course_id, _ in course_choices()]
+    category_choices()
+    tag_choices()
+    for course_id in course_ids:
+        course_resources(course_id)
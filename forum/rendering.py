@@ -0,0 +1,125 @@
+"""
+Markdown rendering for posts.
+
+Markdown and bleach instances are built once per thread and reused. Posts
+longer than ``MARKDOWN_INLINE_MAX_CHARS`` are rendered in a small persistent
+process pool with a time budget, so one pathological post can't hold a
+request worker for seconds; when the budget runs out the pool is replaced
+and the post is shown as escaped preformatted text instead.
+"""
+
+import atexit
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.utils.html import escape
+
+from . import metrics
+
+EXTENSIONS = ["fenced_code", "tables", "nl2br", "sane_lists", "extra"]
+
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _instances():
+    if not hasattr(_local, "markdown"):
+        # markdown and bleach are imported on first render rather than when
+        # the template engine loads the filter library
+        import bleach
+        import markdown
+
+        _local.markdown = markdown.Markdown(extensions=EXTENSIONS)
+        _local.cleaner = bleach.sanitizer.Cleaner(
+            tags=list(bleach.sanitizer.ALLOWED_TAGS)
+            + [
+                "p",
+                "pre",
+                "code",
+                "h1",
+                "h2",
+                "h3",
+                "h4",
+                "h5",
+                "h6",
+                "strong",
+                "em",
+                "ul",
+                "ol",
+                "li",
+                "blockquote",
+                "br",
+                "img",
+                "a",
+            ],
+            attributes={
+                **bleach.sanitizer.ALLOWED_ATTRIBUTES,
+                "img": ["src", "alt", "title"],
+                "a": ["href", "title", "rel"],
+            },
+            protocols=["http", "https", "data"],
+        )
+    return _local.markdown, _local.cleaner
+
+
+def render(text):
+    converter, cleaner = _instances()
+    return cleaner.clean(converter.reset().convert(text))
+
+
+def fallback(text):
+    return f"<pre>{escape(text)}</pre>"
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the workers only need this module, not
+            # a copy of the request worker with its open connections
+            _pool = multiprocessing.get_context("spawn").Pool(
+                settings.MARKDOWN_POOL_WORKERS
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # A render that blew its budget can't be cancelled, only killed
+    pool.terminate()
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None:
+        _discard_pool(_pool)
+
+
+def markdownify(text):
+    text = text or ""
+    started = time.perf_counter()
+    if len(text) <= settings.MARKDOWN_INLINE_MAX_CHARS:
+        html = render(text)
+        metrics.observe(
+            "markdown.render.inline", (time.perf_counter() - started) * 1000
+        )
+        return html
+
+    pool = _get_pool()
+    try:
+        html = pool.apply_async(render, (text,)).get(settings.MARKDOWN_RENDER_TIMEOUT)
+    except multiprocessing.TimeoutError:
+        _discard_pool(pool)
+        metrics.incr("markdown.render.timeout")
+        return fallback(text)
+    except Exception:
+        metrics.incr("markdown.render.error")
+        return fallback(text)
+    metrics.observe("markdown.render.pool", (time.perf_counter() - started) * 1000)
+    return html
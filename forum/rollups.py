@@ -0,0 +1,131 @@
+"""
+Daily activity rollups (threads, replies and upvotes per category, course
+and tag per day) for the staff activity dashboard.
+
+Days are rolled up in chunks. Each chunk is counted with a few grouped
+queries outside any transaction, so they can go to a read replica, and then
+replaces the chunk's rows in one transaction. Chunks are idempotent and
+disjoint, so the incremental job can resume anywhere and a rebuild can run
+many chunks at once. Counts include soft-deleted rows, but rows that were
+archived or hard-deleted before a rebuild can't be counted again.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import models
+
+WATERMARK = "daily_activity"
+
+# metric -> (model, path from the model to its thread)
+SOURCES = [
+    ("threads", models.Thread, ""),
+    ("replies", models.Reply, "thread__"),
+    ("upvotes", models.UpvoteThread, "thread__"),
+    ("upvotes", models.UpvoteReply, "reply__thread__"),
+]
+DIMENSIONS = {
+    models.DailyActivity.CATEGORY: "category_id",
+    models.DailyActivity.COURSE: "course_id",
+    models.DailyActivity.TAG: "threadtag__tag_id",
+}
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def count_days(first_day, last_day):
+    start, end = _start_of(first_day), _start_of(last_day + timedelta(days=1))
+    totals = defaultdict(lambda: {"threads": 0, "replies": 0, "upvotes": 0})
+    for metric, model, thread_path in SOURCES:
+        rows = model.objects.filter(
+            created_timestamp__gte=start, created_timestamp__lt=end
+        ).annotate(day=TruncDate("created_timestamp"))
+        for dimension, field in DIMENSIONS.items():
+            grouped = (
+                rows.filter(**{f"{thread_path}{field}__isnull": False})
+                .values_list("day", f"{thread_path}{field}")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for day, key, count in grouped:
+                totals[dimension, key, day][metric] += count
+    return totals
+
+
+def roll_up(first_day, last_day, advance_watermark=False):
+    totals = count_days(first_day, last_day)
+    with transaction.atomic():
+        if advance_watermark:
+            set_watermark(last_day)
+        models.DailyActivity.objects.filter(
+            day__gte=first_day, day__lte=last_day
+        ).delete()
+        models.DailyActivity.objects.bulk_create(
+            (
+                models.DailyActivity(dimension=dimension, key=key, day=day, **counts)
+                for (dimension, key, day), counts in totals.items()
+            ),
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def chunks(first_day, last_day, days):
+    while first_day <= last_day:
+        end = min(first_day + timedelta(days=days - 1), last_day)
+        yield first_day, end
+        first_day = end + timedelta(days=1)
+
+
+def last_rolled_up():
+    return (
+        models.RollupWatermark.objects.filter(name=WATERMARK)
+        .values_list("last_day", flat=True)
+        .first()
+    )
+
+
+def set_watermark(day):
+    models.RollupWatermark.objects.update_or_create(
+        name=WATERMARK, defaults={"last_day": day}
+    )
+
+
+def first_activity_day():
+    first = (
+        models.Thread.objects.order_by("created_timestamp")
+        .values_list("created_timestamp", flat=True)
+        .first()
+    )
+    return timezone.localtime(first).date() if first else None
+
+
+def activity(dimension, first_day, last_day):
+    """
+    Totals per key and per day for ``dimension`` over a range of days, read
+    from the rolled-up rows only.
+    """
+    rows = models.DailyActivity.objects.filter(
+        dimension=dimension, day__gte=first_day, day__lte=last_day
+    ).order_by()
+    sums = {
+        "thread_count": Sum("threads"),
+        "reply_count": Sum("replies"),
+        "upvote_count": Sum("upvotes"),
+    }
+    by_key = (
+        rows.values("key")
+        .annotate(**sums)
+        .order_by(
+            (F("thread_count") + F("reply_count") + F("upvote_count")).desc(), "key"
+        )
+    )
+    by_day = rows.values("day").annotate(**sums).order_by("day")
+    return list(by_key), list(by_day)
@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_migrate,
+    post_save,
+    pre_migrate,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import live, models, reference, similarity, slow_queries, stats, suggest
+from .inline_images import extract_inline_images
+
+
+@receiver(post_init, sender=models.Thread)
+@receiver(post_init, sender=models.Reply)
+def remember_deleted_state(sender, instance, **kwargs):
+    # Soft deletes are plain saves, so keep the loaded flag to detect them
+    instance._was_deleted = instance.__dict__.get("is_deleted", False)
+
+
+@receiver(pre_save, sender=models.Thread)
+@receiver(pre_save, sender=models.Reply)
+def extract_pasted_images(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.content = extract_inline_images(instance.content)
+
+
+@receiver(post_save, sender=models.Category)
+def create_category_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        models.CategoryStats.objects.get_or_create(category=instance)
+
+
+@receiver(post_save, sender=models.Thread)
+def update_stats_on_thread_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created and not instance.is_deleted:
+        stats.thread_created(instance)
+    elif not created and instance.is_deleted and not instance._was_deleted:
+        stats.thread_removed(instance)
+    elif not created and not instance.is_deleted and instance._was_deleted:
+        stats.thread_restored(instance)
+    instance._was_deleted = instance.is_deleted
+
+
+@receiver(post_delete, sender=models.Thread)
+def update_stats_on_thread_delete(sender, instance, **kwargs):
+    if not instance._was_deleted:
+        stats.thread_removed(instance)
+
+
+@receiver(post_save, sender=models.Reply)
+def update_stats_on_reply_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created and not instance.is_deleted:
+        stats.reply_created(instance)
+    elif not created and instance.is_deleted and not instance._was_deleted:
+        stats.reply_removed(instance)
+    elif not created and not instance.is_deleted and instance._was_deleted:
+        stats.reply_created(instance)
+    instance._was_deleted = instance.is_deleted
+
+
+@receiver(post_delete, sender=models.Reply)
+def update_stats_on_reply_delete(sender, instance, **kwargs):
+    if not instance._was_deleted:
+        stats.reply_removed(instance)
+
+
+@receiver(post_save, sender=models.Course)
+@receiver(post_delete, sender=models.Course)
+@receiver(post_save, sender=models.Resource)
+@receiver(post_delete, sender=models.Resource)
+@receiver(post_save, sender=models.Category)
+@receiver(post_delete, sender=models.Category)
+@receiver(post_save, sender=models.Tag)
+@receiver(post_delete, sender=models.Tag)
+def invalidate_reference_cache(sender, **kwargs):
+    reference.invalidate()
+
+
+@receiver(post_save, sender=models.Thread)
+def update_similarity_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.is_deleted:
+        similarity.index.remove(instance.id)
+    else:
+        similarity.index.add(instance)
+
+
+@receiver(post_delete, sender=models.Thread)
+def remove_from_similarity_index(sender, instance, **kwargs):
+    similarity.index.remove(instance.id)
+
+
+@receiver(post_save, sender=models.Thread)
+@receiver(post_save, sender=models.Tag)
+@receiver(post_save, sender=models.Category)
+@receiver(post_save, sender=models.Course)
+def update_suggestion_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggest.index.update(instance)
+
+
+@receiver(post_delete, sender=models.Thread)
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_delete, sender=models.Category)
+@receiver(post_delete, sender=models.Course)
+def remove_from_suggestion_index(sender, instance, **kwargs):
+    suggest.index.remove(instance)
+
+
+@receiver(connection_created)
+def install_slow_query_logger(sender, connection, **kwargs):
+    slow_queries.install(connection)
+
+
+@receiver(pre_migrate)
+def pause_slow_query_logger(sender, **kwargs):
+    slow_queries.pause()
+
+
+@receiver(post_migrate)
+def resume_slow_query_logger(sender, **kwargs):
+    slow_queries.resume()
+
+
+@receiver(post_save, sender=models.Reply)
+def publish_new_reply(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.is_deleted:
+        # Robust: the reply has committed, a failed live update must not turn
+        # the response into an error
+        transaction.on_commit(
+            lambda: live.publish(
+                live.reply_event(
+                    instance.id,
+                    instance.thread_id,
+                    instance.author.username if instance.author else None,
+                )
+            ),
+            robust=True,
+        )
+        transaction.on_commit(
+            lambda: live.publish_thread_counts(instance.thread_id), robust=True
+        )
+
+
+@receiver(post_save, sender=models.Thread)
+def publish_new_thread(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.is_deleted:
+        transaction.on_commit(
+            lambda: live.publish(
+                live.thread_event(instance.id, instance.title, instance.category.slug)
+            ),
+            robust=True,
+        )
@@ -0,0 +1,241 @@
+"""
+In-memory MinHash/LSH index used to suggest near-duplicate threads.
+
+Each worker keeps its own index, partitioned by course. It is built from the
+database on first use (or before forking, see ``studydeck.warmup``), kept up
+to date in-process by the Thread signals and periodically catches up on
+threads created by other workers. Only the catch-up advances the id
+watermark, and it also re-scans the last ``CATCH_UP_OVERLAP`` seconds of
+threads, since ids are allocated before a transaction commits. Edits made by
+other workers are not caught up; ``similar_threads`` re-signs the matches it
+returns from their current text instead.
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.db.models.functions import Left
+from django.utils import timezone
+
+from . import models
+
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+MAX_BODY_CHARS = 2000
+MIN_SIMILARITY = 0.3
+CATCH_UP_INTERVAL = 30
+CATCH_UP_OVERLAP = 5 * 60
+
+_MASK64 = (1 << 64) - 1
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_VALUE_MASK = (1 << (64 - _BIN_BITS)) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_EMPTY = _VALUE_MASK + 1
+# Fixed pseudo-random donor order per bin, shared by every signature
+_rng = random.Random(1729)
+_DONORS = [
+    [_rng.randrange(NUM_PERM) for _ in range(4 * NUM_PERM)] for _ in range(NUM_PERM)
+]
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it me my of on or "
+    "the this to what when where which who why with".split()
+)
+
+
+def shingles(text):
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in _STOP_WORDS]
+    grams = set(words)
+    grams.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return grams
+
+
+def signature(text):
+    # One-permutation MinHash: every shingle is hashed once and lands in one
+    # of NUM_PERM bins, keeping the minimum per bin. This costs O(shingles)
+    # instead of O(shingles * NUM_PERM), which keeps index builds fast.
+    grams = shingles(text)
+    if not grams:
+        return None
+    bins = [_EMPTY] * NUM_PERM
+    for gram in grams:
+        encoded = gram.encode()
+        hashed = (
+            (zlib.crc32(encoded) << 32 | zlib.adler32(encoded)) * _GOLDEN
+        ) & _MASK64
+        slot = hashed >> (64 - _BIN_BITS)
+        value = hashed & _VALUE_MASK
+        if value < bins[slot]:
+            bins[slot] = value
+    # Densify: each empty bin copies the first non-empty bin in its fixed
+    # donor order ("optimal densification"), so similar documents borrow the
+    # same values
+    densified = list(bins)
+    first_filled = next(value for value in bins if value != _EMPTY)
+    for slot, value in enumerate(bins):
+        if value == _EMPTY:
+            densified[slot] = next(
+                (bins[donor] for donor in _DONORS[slot] if bins[donor] != _EMPTY),
+                first_filled,
+            )
+    return array("Q", densified)
+
+
+def _document(title, content):
+    return f"{title} {title} {content[:MAX_BODY_CHARS]}"
+
+
+def _similarity(sig, other):
+    return sum(x == y for x, y in zip(sig, other)) / NUM_PERM
+
+
+class ThreadIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._last_id = 0
+        self._last_catch_up = 0.0
+        self._loaded_at = None
+        self._signatures = {}
+        self._partitions = {}
+        # partition -> band -> band hash -> thread ids
+        self._buckets = defaultdict(lambda: [defaultdict(set) for _ in range(BANDS)])
+
+    def _bands(self, sig):
+        for band in range(BANDS):
+            yield band, hash(tuple(sig[band * ROWS : (band + 1) * ROWS]))
+
+    def _add(self, thread_id, course_id, text):
+        sig = signature(text)
+        self._discard(thread_id)
+        if sig is None:
+            return None
+        self._signatures[thread_id] = sig
+        self._partitions[thread_id] = course_id
+        buckets = self._buckets[course_id]
+        for band, key in self._bands(sig):
+            buckets[band][key].add(thread_id)
+        return sig
+
+    def _discard(self, thread_id):
+        sig = self._signatures.pop(thread_id, None)
+        if sig is None:
+            return
+        buckets = self._buckets[self._partitions.pop(thread_id)]
+        for band, key in self._bands(sig):
+            bucket = buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(thread_id)
+                if not bucket:
+                    del buckets[band][key]
+
+    def _load(self, threads):
+        loaded_at = timezone.now()
+        rows = (
+            threads.filter(is_deleted=False)
+            .annotate(body=Left("content", MAX_BODY_CHARS))
+            .values_list("id", "course_id", "title", "body")
+            .order_by("id")
+        )
+        for thread_id, course_id, title, body in rows.iterator(chunk_size=2000):
+            self._last_id = max(self._last_id, thread_id)
+            # Threads this worker saved are already indexed by the signals
+            if thread_id not in self._signatures:
+                self._add(thread_id, course_id, _document(title, body))
+        self._loaded_at = loaded_at
+        self._last_catch_up = time.monotonic()
+
+    def build(self):
+        with self._lock:
+            if not self._built:
+                self._load(models.Thread.objects.all())
+                self._built = True
+
+    def _ensure_fresh(self):
+        if not self._built:
+            self.build()
+        elif time.monotonic() - self._last_catch_up > CATCH_UP_INTERVAL:
+            with self._lock:
+                recent = self._loaded_at - timedelta(seconds=CATCH_UP_OVERLAP)
+                self._load(
+                    models.Thread.objects.filter(
+                        Q(id__gt=self._last_id) | Q(created_timestamp__gte=recent)
+                    )
+                )
+
+    def add(self, thread):
+        if not self._built:
+            return
+        with self._lock:
+            self._add(
+                thread.id, thread.course_id, _document(thread.title, thread.content)
+            )
+
+    def resign(self, thread_id, course_id, text):
+        with self._lock:
+            return self._add(thread_id, course_id, text)
+
+    def remove(self, thread_id):
+        with self._lock:
+            self._discard(thread_id)
+
+    def similar(self, course_id, title, content, limit=5):
+        self._ensure_fresh()
+        sig = signature(_document(title, content))
+        if sig is None:
+            return []
+        with self._lock:
+            buckets = self._buckets.get(course_id)
+            if buckets is None:
+                return []
+            candidates = set()
+            for band, key in self._bands(sig):
+                candidates.update(buckets[band].get(key, ()))
+            scored = []
+            for thread_id in candidates:
+                score = _similarity(sig, self._signatures[thread_id])
+                if score >= MIN_SIMILARITY:
+                    scored.append((score, thread_id))
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+
+index = ThreadIndex()
+
+
+def similar_threads(course_id, title, content, limit=5):
+    scored = index.similar(course_id, title, content, limit)
+    if not scored:
+        return []
+    # Other workers may have deleted or edited some of these since they were
+    # indexed, so each match is re-signed from its current text and scored
+    # again
+    threads = (
+        models.Thread.objects.filter(
+            id__in=[thread_id for _, thread_id in scored], is_deleted=False
+        )
+        .select_related("category")
+        .annotate(body=Left("content", MAX_BODY_CHARS))
+        .only("id", "title", "course_id", "category__slug")
+    )
+    sig = signature(_document(title, content))
+    matches = []
+    for thread in threads:
+        current = index.resign(
+            thread.id, thread.course_id, _document(thread.title, thread.body)
+        )
+        if current is None or thread.course_id != course_id:
+            continue
+        score = _similarity(sig, current)
+        if score >= MIN_SIMILARITY:
+            matches.append((score, thread))
+    matches.sort(key=lambda match: (match[0], match[1].id), reverse=True)
+    return matches
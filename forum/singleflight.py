@@ -0,0 +1,58 @@
+"""
+Short-lived caching of expensive results with single-flight recomputation.
+
+Entries are stored with their own expiry and kept in the cache for
+``STALE_GRACE`` seconds past it. When an entry is missing or expired, one
+caller takes a lock key (``cache.add`` is atomic in every shared backend)
+and recomputes it; meanwhile the others serve the stale value, or, when
+there is none, wait for the new one for up to ``LOCK_WAIT`` seconds.
+"""
+
+import time
+
+from django.core.cache import cache
+
+from . import metrics
+
+STALE_GRACE = 60
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+POLL_INTERVAL = 0.05
+
+
+def _compute(key, compute, timeout, metric):
+    started = time.perf_counter()
+    value = compute()
+    metrics.observe(f"{metric}.compute", (time.perf_counter() - started) * 1000)
+    cache.set(key, (time.time() + timeout, value), timeout + STALE_GRACE)
+    return value
+
+
+def get_or_compute(key, compute, timeout, metric):
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        metrics.incr(f"{metric}.hit")
+        return entry[1]
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        metrics.incr(f"{metric}.miss" if entry is None else f"{metric}.refresh")
+        try:
+            return _compute(key, compute, timeout, metric)
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        metrics.incr(f"{metric}.stale")
+        return entry[1]
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            metrics.incr(f"{metric}.coalesced")
+            return entry[1]
+    # The worker holding the lock is too slow (or died), don't wait longer
+    metrics.incr(f"{metric}.lock_timeout")
+    return _compute(key, compute, timeout, metric)
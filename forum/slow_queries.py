@@ -0,0 +1,194 @@
+"""
+Record queries slower than ``SLOW_QUERY_MS`` in the SlowQuery table.
+
+Every database connection gets an execute wrapper when it is opened. Slow
+statements are grouped by a fingerprint of their SQL with literals and
+``IN`` lists collapsed. The first occurrence of each also stores its
+``EXPLAIN`` output (``EXPLAIN ANALYZE`` for SELECTs when
+``SLOW_QUERY_EXPLAIN_ANALYZE`` is on); later ones only bump the counters.
+Staff browse them in the admin.
+
+Nothing is written while the statement's connection is inside a
+transaction: slow statements are queued and recorded before the next
+statement that runs outside one, or when the request ends, so a failed
+``EXPLAIN`` can never take the caller's transaction down with it. Nothing is
+recorded while ``migrate`` runs.
+"""
+
+import hashlib
+import logging
+import re
+import time
+import traceback
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+_recording = ContextVar("recording_slow_query", default=False)
+_view = ContextVar("slow_query_view", default="")
+_paused = ContextVar("slow_queries_paused", default=False)
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST_RE = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize(sql):
+    sql = _IN_LIST_RE.sub("(...)", sql)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("N", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()
+
+
+def calling_frame():
+    # Innermost frame in the project's own code, outside this module
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if (
+            frame.filename.startswith(base)
+            and "site-packages" not in frame.filename
+            and not frame.filename.endswith("slow_queries.py")
+        ):
+            return f"{frame.filename[len(base) + 1 :]}:{frame.lineno} in {frame.name}"
+    return ""
+
+
+def explain(connection, sql, params):
+    # Plain EXPLAIN never runs the statement; ANALYZE does, so it is only
+    # used for reads
+    options = {}
+    if settings.SLOW_QUERY_EXPLAIN_ANALYZE and sql.split(None, 1)[0].upper() in (
+        "SELECT",
+        "WITH",
+    ):
+        options["analyze"] = True
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(
+            " ".join(str(column) for column in row) for row in cursor.fetchall()
+        )
+
+
+def record(connection, sql, params, duration_ms, view="", frame=""):
+    from . import models
+
+    token = _recording.set(True)
+    try:
+        key = fingerprint(sql)
+        # A savepoint, so a failure here can't break the caller's transaction
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            updated = models.SlowQuery.objects.using(DEFAULT_DB_ALIAS).filter(
+                fingerprint=key
+            )
+            if updated.update(
+                count=F("count") + 1,
+                total_ms=F("total_ms") + duration_ms,
+                max_ms=Greatest("max_ms", duration_ms),
+                last_seen=timezone.now(),
+            ):
+                return
+        plan = ""
+        try:
+            # In a savepoint of its own: on PostgreSQL a failed statement
+            # aborts the whole transaction
+            with transaction.atomic(using=connection.alias):
+                plan = explain(connection, sql, params)
+        except (DatabaseError, ValueError) as e:
+            plan = f"EXPLAIN failed: {e}"
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            models.SlowQuery.objects.using(DEFAULT_DB_ALIAS).create(
+                fingerprint=key,
+                sql=sql,
+                params=repr(params)[:1000],
+                view=view,
+                frame=frame,
+                explain=plan,
+                total_ms=duration_ms,
+                max_ms=duration_ms,
+            )
+    except DatabaseError:
+        logger.exception("Recording a slow query failed")
+    finally:
+        _recording.reset(token)
+
+
+class SlowQueryLogger:
+    def __init__(self, connection):
+        self.connection = connection
+        self.pending = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if _recording.get() or _paused.get() or settings.SLOW_QUERY_MS <= 0:
+            return execute(sql, params, many, context)
+        # Before the statement runs: once it has, its rows may still be
+        # waiting to be fetched from the cursor
+        self.flush()
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= settings.SLOW_QUERY_MS and not many:
+            self.pending.append(
+                (sql, params, duration_ms, _view.get(), calling_frame())
+            )
+        return result
+
+    def flush(self):
+        if not self.pending or self.connection.in_atomic_block:
+            return
+        pending, self.pending = self.pending, []
+        for args in pending:
+            record(self.connection, *args)
+
+
+def flush():
+    for connection in connections.all(initialized_only=True):
+        for wrapper in connection.execute_wrappers:
+            if isinstance(wrapper, SlowQueryLogger):
+                wrapper.flush()
+
+
+def pause():
+    # Migrations run DDL, and the SlowQuery table may not exist yet
+    _paused.set(True)
+
+
+def resume():
+    _paused.set(False)
+
+
+def install(connection):
+    if settings.SLOW_QUERY_MS <= 0:
+        return
+    if not any(isinstance(w, SlowQueryLogger) for w in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryLogger(connection))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # process_view names the view; the token keeps that name from
+        # leaking into whatever this thread runs after the request
+        token = _view.set("")
+        try:
+            response = self.get_response(request)
+            flush()
+        finally:
+            _view.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view.set(request.resolver_match.view_name)
@@ -0,0 +1,225 @@
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    CharField,
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from . import models
+
+
+def _update_stats(category_id, **updates):
+    stats = models.CategoryStats.objects.filter(category_id=category_id)
+    if not stats.update(**updates):
+        models.CategoryStats.objects.get_or_create(category_id=category_id)
+        stats.update(**updates)
+
+
+def _touch_last_activity(thread, timestamp):
+    # Every expression in an UPDATE sees the old row, so last_thread is only
+    # replaced when this activity is newer than what is stored
+    is_newer = Q(last_activity_timestamp__isnull=True) | Q(
+        last_activity_timestamp__lte=timestamp
+    )
+    return {
+        "last_activity_timestamp": Greatest(
+            Coalesce("last_activity_timestamp", Value(timestamp)), Value(timestamp)
+        ),
+        "last_thread_id": Case(
+            When(is_newer, then=Value(thread.id)),
+            default=F("last_thread_id"),
+            output_field=BigIntegerField(),
+        ),
+        "last_thread_title": Case(
+            When(is_newer, then=Value(thread.title)),
+            default=F("last_thread_title"),
+            output_field=CharField(),
+        ),
+    }
+
+
+def thread_created(thread):
+    _update_stats(
+        thread.category_id,
+        thread_count=F("thread_count") + 1,
+        **_touch_last_activity(thread, thread.created_timestamp),
+    )
+
+
+def thread_restored(thread):
+    # Undoes thread_removed: replies posted while the thread was deleted kept
+    # the thread's own counter current, so it is what goes back in
+    restored = (
+        models.Thread.objects.filter(pk=thread.pk)
+        .values_list("reply_count", "last_activity_timestamp")
+        .first()
+    )
+    if restored is None:
+        return
+    live_replies, last_activity = restored
+    _update_stats(
+        thread.category_id,
+        thread_count=F("thread_count") + 1,
+        reply_count=F("reply_count") + live_replies,
+        **_touch_last_activity(thread, last_activity),
+    )
+
+
+def thread_removed(thread):
+    # Re-read the counter: the instance may predate replies added since, and
+    # after a hard delete the row (and its replies) are already gone
+    live_replies = (
+        models.Thread.objects.filter(pk=thread.pk)
+        .values_list("reply_count", flat=True)
+        .first()
+        or 0
+    )
+    _update_stats(
+        thread.category_id,
+        thread_count=Greatest(F("thread_count") - 1, Value(0)),
+        reply_count=Greatest(F("reply_count") - live_replies, Value(0)),
+    )
+    stats = models.CategoryStats.objects.filter(category_id=thread.category_id)
+    if stats.filter(last_thread_id=thread.id).exists():
+        latest = (
+            models.Thread.objects.filter(
+                category_id=thread.category_id, is_deleted=False
+            )
+            .exclude(pk=thread.pk)
+            .order_by("-created_timestamp")
+            .only("id", "title", "created_timestamp")
+            .first()
+        )
+        stats.update(
+            last_thread_id=latest.id if latest else None,
+            last_thread_title=latest.title if latest else "",
+            last_activity_timestamp=latest.created_timestamp if latest else None,
+        )
+
+
+def reply_created(reply):
+    thread = reply.thread
+    models.Thread.objects.filter(pk=thread.pk).update(
+        reply_count=F("reply_count") + 1,
+        last_activity_timestamp=Greatest(
+            "last_activity_timestamp", Value(reply.created_timestamp)
+        ),
+    )
+    if thread.is_deleted:
+        return
+    _update_stats(
+        thread.category_id,
+        reply_count=F("reply_count") + 1,
+        **_touch_last_activity(thread, reply.created_timestamp),
+    )
+
+
+def reply_removed(reply):
+    thread = reply.thread
+    models.Thread.objects.filter(pk=thread.pk).update(
+        reply_count=Greatest(F("reply_count") - 1, Value(0))
+    )
+    if thread.is_deleted:
+        return
+    _update_stats(
+        thread.category_id,
+        reply_count=Greatest(F("reply_count") - 1, Value(0)),
+    )
+
+
+def reconcile_threads():
+    live_replies = models.Reply.objects.filter(
+        thread=OuterRef("pk"), is_deleted=False
+    ).order_by()
+    return models.Thread.objects.update(
+        reply_count=Coalesce(
+            Subquery(
+                live_replies.values("thread")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        ),
+        last_activity_timestamp=Coalesce(
+            Subquery(
+                live_replies.values("thread")
+                .annotate(last=Max("created_timestamp"))
+                .values("last")
+            ),
+            F("created_timestamp"),
+        ),
+    )
+
+
+def reconcile():
+    # Full recount from Thread and Reply; meant for the periodic
+    # reconcile_category_stats command, never for the request path
+    thread_counts = {
+        row["category_id"]: row
+        for row in models.Thread.objects.filter(is_deleted=False)
+        .values("category_id")
+        .annotate(count=Count("id"), last=Max("created_timestamp"))
+        .order_by()
+    }
+    reply_counts = {
+        row["thread__category_id"]: row
+        for row in models.Reply.objects.filter(
+            is_deleted=False, thread__is_deleted=False
+        )
+        .values("thread__category_id")
+        .annotate(count=Count("id"), last=Max("created_timestamp"))
+        .order_by()
+    }
+
+    updated = []
+    for category_id in models.Category.objects.values_list("id", flat=True):
+        threads = thread_counts.get(category_id, {})
+        replies = reply_counts.get(category_id, {})
+        candidates = [ts for ts in (threads.get("last"), replies.get("last")) if ts]
+        last_activity = max(candidates) if candidates else None
+        last_thread = None
+        if last_activity:
+            last_thread = (
+                models.Thread.objects.filter(category_id=category_id, is_deleted=False)
+                .filter(
+                    Q(created_timestamp=last_activity)
+                    | Q(
+                        reply__created_timestamp=last_activity,
+                        reply__is_deleted=False,
+                    )
+                )
+                .only("id", "title")
+                .first()
+            )
+        updated.append(
+            models.CategoryStats(
+                category_id=category_id,
+                thread_count=threads.get("count", 0),
+                reply_count=replies.get("count", 0),
+                last_activity_timestamp=last_activity,
+                last_thread=last_thread,
+                last_thread_title=last_thread.title if last_thread else "",
+            )
+        )
+
+    models.CategoryStats.objects.bulk_create(
+        updated,
+        update_conflicts=True,
+        unique_fields=["category"],
+        update_fields=[
+            "thread_count",
+            "reply_count",
+            "last_activity_timestamp",
+            "last_thread",
+            "last_thread_title",
+        ],
+    )
+    return len(updated)
@@ -0,0 +1,289 @@
+"""
+In-memory typeahead index for the navbar search box.
+
+Every word of every indexed label is expanded into its prefixes (up to
+``MAX_PREFIX`` characters) and each prefix keeps its own short list of the
+best completions, so answering a keystroke is a dict lookup. Queries of
+several words intersect the keys indexed under each word. The index lives
+in each worker, is built from the database on first use (or before forking,
+see ``studydeck.warmup``) and follows saves through the signals in
+``forum.signals``. Threads deleted or retitled by other workers are caught
+when they come up in a search, see ``SuggestionIndex._search_threads``.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.urls import reverse
+
+from . import models
+
+MAX_PREFIX = 12
+PER_PREFIX = 20
+CATCH_UP_INTERVAL = 30
+VERIFY_ROUNDS = 3
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def words(text):
+    return _WORD_RE.findall(text.lower())
+
+
+class PrefixIndex:
+    def __init__(self):
+        # prefix -> [(-weight, key, label, payload)] sorted best first
+        self._completions = defaultdict(list)
+        # Lists that were full when remove() took an entry out of them; they
+        # are refilled from the postings the next time they are read
+        self._stale = set()
+        # word (cut to MAX_PREFIX) -> keys, and those words in sorted order
+        self._postings = defaultdict(set)
+        self._words = []
+        self._entries = {}
+
+    def _terms(self, label):
+        return {word[:MAX_PREFIX] for word in words(label)}
+
+    def _prefixes(self, label):
+        return {
+            term[:length]
+            for term in self._terms(label)
+            for length in range(1, len(term) + 1)
+        }
+
+    def add(self, key, label, weight=0, payload=None):
+        self.remove(key)
+        item = (-weight, key, label, payload)
+        self._entries[key] = item
+        for term in self._terms(label):
+            if term not in self._postings:
+                bisect.insort(self._words, term)
+            self._postings[term].add(key)
+        for prefix in self._prefixes(label):
+            completions = self._completions[prefix]
+            if len(completions) >= PER_PREFIX and item >= completions[-1]:
+                continue
+            bisect.insort(completions, item)
+            del completions[PER_PREFIX:]
+
+    def remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for term in self._terms(item[2]):
+            keys = self._postings[term]
+            keys.discard(key)
+            if not keys:
+                del self._postings[term]
+                del self._words[bisect.bisect_left(self._words, term)]
+        for prefix in self._prefixes(item[2]):
+            completions = self._completions.get(prefix)
+            if completions and item in completions:
+                if len(completions) >= PER_PREFIX:
+                    self._stale.add(prefix)
+                completions.remove(item)
+
+    def _keys(self, prefix):
+        # Every key with a word starting with prefix
+        keys = set()
+        for position in range(
+            bisect.bisect_left(self._words, prefix), len(self._words)
+        ):
+            term = self._words[position]
+            if not term.startswith(prefix):
+                break
+            keys |= self._postings[term]
+        return keys
+
+    def _top(self, prefix):
+        if prefix in self._stale:
+            self._stale.discard(prefix)
+            self._completions[prefix] = heapq.nsmallest(
+                PER_PREFIX, (self._entries[key] for key in self._keys(prefix))
+            )
+        return self._completions.get(prefix, ())
+
+    def search(self, query, limit):
+        terms = words(query)
+        if not terms:
+            return []
+        if len(set(terms)) == 1 and len(terms[0]) <= MAX_PREFIX:
+            items = self._top(terms[0])[:limit]
+        else:
+            # Every term must prefix some word of the label, so intersect the
+            # terms' keys before ranking rather than filtering one short list
+            keys = None
+            for prefix in {term[:MAX_PREFIX] for term in terms}:
+                keys = self._keys(prefix) if keys is None else keys & self._keys(prefix)
+                if not keys:
+                    return []
+            items = [self._entries[key] for key in keys]
+            if any(len(term) > MAX_PREFIX for term in terms):
+                # Only MAX_PREFIX characters are indexed
+                items = [
+                    item
+                    for item in items
+                    if all(
+                        any(word.startswith(term) for word in words(item[2]))
+                        for term in terms
+                    )
+                ]
+            items = heapq.nsmallest(limit, items)
+        return [(key, label, payload) for _, key, label, payload in items]
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._last_thread_id = 0
+        self._last_catch_up = 0.0
+        self.threads = PrefixIndex()
+        self.tags = PrefixIndex()
+        self.categories = PrefixIndex()
+        self.courses = PrefixIndex()
+
+    def _add_threads(self, threads):
+        rows = threads.filter(is_deleted=False).values_list(
+            "id", "title", "category__slug"
+        )
+        for thread_id, title, category_slug in rows.order_by("id").iterator(
+            chunk_size=5000
+        ):
+            self.threads.add(thread_id, title, thread_id, category_slug)
+            self._last_thread_id = max(self._last_thread_id, thread_id)
+        self._last_catch_up = time.monotonic()
+
+    def _load_reference(self):
+        # Small tables, reloaded whole so changes made by other processes
+        # (the admin in another worker, import_forum) show up on catch-up
+        self.tags = PrefixIndex()
+        for tag_id, name, slug in models.Tag.objects.values_list("id", "name", "slug"):
+            self.tags.add(tag_id, name, payload=slug)
+        self.categories = PrefixIndex()
+        for category_id, name, slug in models.Category.objects.values_list(
+            "id", "name", "slug"
+        ):
+            self.categories.add(category_id, name, payload=slug)
+        self.courses = PrefixIndex()
+        for course in models.Course.objects.all():
+            self.courses.add(course.id, str(course))
+
+    def build(self):
+        with self._lock:
+            if self._built:
+                return
+            self._load_reference()
+            self._add_threads(models.Thread.objects.all())
+            self._built = True
+
+    def _ensure_fresh(self):
+        if not self._built:
+            self.build()
+        elif time.monotonic() - self._last_catch_up > CATCH_UP_INTERVAL:
+            with self._lock:
+                self._load_reference()
+                self._add_threads(
+                    models.Thread.objects.filter(id__gt=self._last_thread_id)
+                )
+
+    def update(self, instance):
+        if not self._built:
+            return
+        with self._lock:
+            if isinstance(instance, models.Thread):
+                if instance.is_deleted:
+                    self.threads.remove(instance.id)
+                else:
+                    self.threads.add(
+                        instance.id,
+                        instance.title,
+                        instance.id,
+                        instance.category.slug,
+                    )
+            elif isinstance(instance, models.Tag):
+                self.tags.add(instance.id, instance.name, payload=instance.slug)
+            elif isinstance(instance, models.Category):
+                self.categories.add(instance.id, instance.name, payload=instance.slug)
+            elif isinstance(instance, models.Course):
+                self.courses.add(instance.id, str(instance))
+
+    def remove(self, instance):
+        with self._lock:
+            {
+                models.Thread: self.threads,
+                models.Tag: self.tags,
+                models.Category: self.categories,
+                models.Course: self.courses,
+            }[type(instance)].remove(instance.id)
+
+    def _search_threads(self, query, limit):
+        # The catch-up only adds new ids, so check the matches against the
+        # database: drop threads that are gone, re-index retitled ones and
+        # search again to fill their places
+        verified = {}
+        for _ in range(VERIFY_ROUNDS):
+            with self._lock:
+                found = self.threads.search(query, limit)
+            unknown = [key for key, _, _ in found if key not in verified]
+            if not unknown:
+                break
+            current = {
+                thread_id: (title, category_slug)
+                for thread_id, title, category_slug in models.Thread.live.filter(
+                    id__in=unknown
+                ).values_list("id", "title", "category__slug")
+            }
+            verified.update(current)
+            stale = [
+                key
+                for key, title, category_slug in found
+                if key in unknown and current.get(key) != (title, category_slug)
+            ]
+            if not stale:
+                break
+            with self._lock:
+                for key in stale:
+                    if key in current:
+                        title, category_slug = current[key]
+                        self.threads.add(key, title, key, category_slug)
+                    else:
+                        self.threads.remove(key)
+        return [
+            (thread_id, title, category_slug)
+            for thread_id, title, category_slug in found
+            if verified.get(thread_id) == (title, category_slug)
+        ]
+
+    def suggest(self, query, limit=5):
+        self._ensure_fresh()
+        threads = self._search_threads(query, limit)
+        with self._lock:
+            return {
+                "threads": [
+                    {
+                        "title": title,
+                        "url": reverse("thread-view", args=[category_slug, thread_id]),
+                    }
+                    for thread_id, title, category_slug in threads
+                ],
+                "tags": [
+                    {"name": name, "url": f"{reverse('home')}?tag={slug}"}
+                    for _, name, slug in self.tags.search(query, limit)
+                ],
+                "categories": [
+                    {"name": name, "url": reverse("category-detail", args=[slug])}
+                    for _, name, slug in self.categories.search(query, limit)
+                ],
+                "courses": [
+                    {"name": label} for _, label, _ in self.courses.search(query, limit)
+                ],
+            }
+
+
+index = SuggestionIndex()
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import models
+
+FACET_LIMIT = 15
+FACET_TIMEOUT = 5 * 60
+
+
+def resolve_tags(slugs):
+    slugs = sorted(set(slugs))
+    return list(models.Tag.objects.filter(slug__in=slugs).order_by("slug"))
+
+
+def filter_by_tags(threads, tags, requested):
+    if not requested:
+        return threads
+    # Unknown slugs can never be matched by every tag at once
+    if len(tags) != len(set(requested)):
+        return threads.none()
+    # One grouped pass over the (tag, thread) index instead of a join per tag
+    matching = (
+        models.ThreadTag.objects.filter(tag__in=tags)
+        .values("thread_id")
+        .annotate(matched=Count("tag_id"))
+        .filter(matched=len(tags))
+        .values("thread_id")
+    )
+    return threads.filter(id__in=matching)
+
+
+def tag_facets(threads, category_slug, tags):
+    if threads.query.is_empty():
+        return []
+    selected = [tag.slug for tag in tags]
+    key = f"forum:tag-facets:{category_slug or '*'}:{','.join(selected)}"
+
+    def compute():
+        return list(
+            models.ThreadTag.objects.filter(thread__in=threads.values("id"))
+            .exclude(tag__in=tags)
+            .values("tag__slug", "tag__name")
+            .annotate(count=Count("thread_id"))
+            .order_by("-count", "tag__name")[:FACET_LIMIT]
+        )
+
+    return cache.get_or_set(key, compute, FACET_TIMEOUT)
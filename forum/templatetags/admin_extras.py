@@ -0,0 +1,101 @@
+import calendar
+import datetime
+
+from django import template
+from django.db.models import Max, Min
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _year_range(cl, field_name):
+    # Min/Max are answered from the index on the date field, unlike the
+    # DISTINCT date_trunc() scans the stock date_hierarchy tag runs
+    date_range = cl.queryset.aggregate(first=Min(field_name), last=Max(field_name))
+    if not (date_range["first"] and date_range["last"]):
+        return None
+    return tuple(
+        timezone.localtime(value) if timezone.is_aware(value) else value
+        for value in (date_range["first"], date_range["last"])
+    )
+
+
+@register.inclusion_tag("admin/date_hierarchy.html")
+def lightweight_date_hierarchy(cl):
+    field_name = cl.date_hierarchy
+    year_field = f"{field_name}__year"
+    month_field = f"{field_name}__month"
+    day_field = f"{field_name}__day"
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f"{field_name}__"])
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            "show": True,
+            "back": {
+                "link": link({year_field: year_lookup, month_field: month_lookup}),
+                "title": capfirst(formats.date_format(day, "YEAR_MONTH_FORMAT")),
+            },
+            "choices": [
+                {"title": capfirst(formats.date_format(day, "MONTH_DAY_FORMAT"))}
+            ],
+        }
+
+    if year_lookup and month_lookup:
+        year, month = int(year_lookup), int(month_lookup)
+        days = range(1, calendar.monthrange(year, month)[1] + 1)
+        return {
+            "show": True,
+            "back": {"link": link({year_field: year_lookup}), "title": year_lookup},
+            "choices": [
+                {
+                    "link": link(
+                        {year_field: year, month_field: month, day_field: day}
+                    ),
+                    "title": capfirst(
+                        formats.date_format(
+                            datetime.date(year, month, day), "MONTH_DAY_FORMAT"
+                        )
+                    ),
+                }
+                for day in days
+            ],
+        }
+
+    if year_lookup:
+        year = int(year_lookup)
+        return {
+            "show": True,
+            "back": {"link": link({}), "title": _("All dates")},
+            "choices": [
+                {
+                    "link": link({year_field: year, month_field: month}),
+                    "title": capfirst(
+                        formats.date_format(
+                            datetime.date(year, month, 1), "YEAR_MONTH_FORMAT"
+                        )
+                    ),
+                }
+                for month in range(1, 13)
+            ],
+        }
+
+    year_range = _year_range(cl, field_name)
+    if year_range is None:
+        return {"show": False}
+    first, last = year_range
+    return {
+        "show": True,
+        "back": None,
+        "choices": [
+            {"link": link({year_field: str(year)}), "title": str(year)}
+            for year in range(first.year, last.year + 1)
+        ],
+    }
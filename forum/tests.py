@@ -1,3 +1,1653 @@
-from django.test import TestCase
+import base64
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import brotli
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from studydeck import db_router
+
+from . import (
+    archive,
+    consumers,
+    events,
+    inline_images,
+    listing,
+    live,
+    metrics,
+    models,
+    notifications,
+    reference,
+    rendering,
+    rollups,
+    similarity,
+    singleflight,
+    slow_queries,
+    suggest,
+    tagging,
+    unread,
+)
+from .admin import EstimatedCountPaginator
+from .inline_images import extract_inline_images
+from .management.commands import benchmark_hot_paths, import_forum
+
+User = get_user_model()
+
+# The manifest storage needs collectstatic to have run
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES, SLOW_QUERY_MS=0)
+class ForumTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("alice", "alice@example.com", "pw")
+        cls.other = User.objects.create_user("bob", "bob@example.com", "pw")
+        cls.category = models.Category.objects.create(name="General", slug="general")
+
+    def setUp(self):
+        cache.clear()
+
+    def make_thread(self, **kwargs):
+        kwargs.setdefault("title", "A thread")
+        kwargs.setdefault("content", "Some content")
+        kwargs.setdefault("author", self.user)
+        kwargs.setdefault("category", self.category)
+        return models.Thread.objects.create(**kwargs)
+
+    def make_reply(self, thread, **kwargs):
+        kwargs.setdefault("content", "A reply")
+        kwargs.setdefault("author", self.other)
+        return models.Reply.objects.create(thread=thread, **kwargs)
+
+
+class AdminChangelistTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(self.admin)
+
+    def test_date_hierarchy_lists_years_from_min_and_max(self):
+        self.make_thread(
+            created_timestamp=timezone.make_aware(datetime.datetime(2023, 3, 1))
+        )
+        self.make_thread(
+            created_timestamp=timezone.make_aware(datetime.datetime(2025, 6, 1))
+        )
+        response = self.client.get(reverse("admin:forum_thread_changelist"))
+        self.assertEqual(response.status_code, 200)
+        for year in ("2023", "2024", "2025"):
+            self.assertContains(response, f"created_timestamp__year={year}")
+
+    def test_date_hierarchy_drills_down_to_days(self):
+        self.make_thread(
+            created_timestamp=timezone.make_aware(datetime.datetime(2024, 2, 10))
+        )
+        response = self.client.get(
+            reverse("admin:forum_thread_changelist"),
+            {"created_timestamp__year": 2024, "created_timestamp__month": 2},
+        )
+        self.assertEqual(response.status_code, 200)
+        # 2024 is a leap year
+        self.assertContains(response, "created_timestamp__day=29")
+        self.assertNotContains(response, "created_timestamp__day=30")
+
+    def test_reply_changelist_shows_a_preview_of_the_content(self):
+        thread = self.make_thread()
+        self.make_reply(thread, content="x" * 100 + "TAIL")
+        response = self.client.get(reverse("admin:forum_reply_changelist"))
+        self.assertContains(response, "x" * 100)
+        self.assertNotContains(response, "TAIL")
+
+    def test_estimated_paginator_counts_exactly_without_postgresql(self):
+        self.make_thread()
+        self.make_thread(is_deleted=True)
+        paginator = EstimatedCountPaginator(
+            models.Thread.objects.filter(is_deleted=False).order_by("id"), 10
+        )
+        self.assertEqual(paginator.count, 1)
+
+
+class CategoryStatsTests(ForumTestCase):
+    def stats(self):
+        return models.CategoryStats.objects.get(category=self.category)
+
+    def test_counts_follow_creates_and_soft_deletes(self):
+        thread = self.make_thread()
+        reply = self.make_reply(thread)
+        self.make_reply(thread)
+        stats = self.stats()
+        self.assertEqual((stats.thread_count, stats.reply_count), (1, 2))
+        self.assertEqual(stats.last_thread_id, thread.id)
+
+        reply.is_deleted = True
+        reply.save()
+        self.assertEqual(self.stats().reply_count, 1)
+        thread.refresh_from_db()
+        self.assertEqual(thread.reply_count, 1)
+
+        thread.is_deleted = True
+        thread.save()
+        stats = self.stats()
+        self.assertEqual((stats.thread_count, stats.reply_count), (0, 0))
+        self.assertIsNone(stats.last_thread_id)
+
+    def test_restoring_a_thread_brings_back_its_replies(self):
+        thread = self.make_thread()
+        for _ in range(3):
+            self.make_reply(thread)
+        thread.refresh_from_db()
+        thread.is_deleted = True
+        thread.save()
+        self.assertEqual(self.stats().reply_count, 0)
+
+        thread = models.Thread.objects.get(pk=thread.pk)
+        thread.is_deleted = False
+        thread.save()
+        stats = self.stats()
+        self.assertEqual((stats.thread_count, stats.reply_count), (1, 3))
+        self.assertEqual(stats.last_thread_id, thread.id)
+
+    def test_hard_delete_removes_the_thread_and_its_replies(self):
+        thread = self.make_thread()
+        self.make_reply(thread)
+        thread.delete()
+        stats = self.stats()
+        self.assertEqual((stats.thread_count, stats.reply_count), (0, 0))
+
+    def test_reconcile_repairs_drift(self):
+        thread = self.make_thread()
+        self.make_reply(thread)
+        models.CategoryStats.objects.update(thread_count=7, reply_count=9)
+        models.Thread.objects.update(reply_count=5)
+        call_command("reconcile_category_stats", stdout=StringIO())
+        stats = self.stats()
+        self.assertEqual((stats.thread_count, stats.reply_count), (1, 1))
+        thread.refresh_from_db()
+        self.assertEqual(thread.reply_count, 1)
+
+    def test_category_list_reads_the_stats(self):
+        self.make_thread(title="Latest question")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("category-list"))
+        self.assertContains(response, "Latest question")
+
+
+class ReferenceCacheTests(ForumTestCase):
+    def test_saving_a_course_invalidates_the_choices(self):
+        self.assertEqual(reference.course_choices(), [])
+        course = models.Course.objects.create(code="CS F111", title="Computing")
+        self.assertEqual(reference.course_choices(), [(course.id, str(course))])
+
+    def test_local_cache_entries_expire_quickly(self):
+        reference.category_choices()
+        # A change made by another worker never bumps this process's cache
+        models.Category.objects.bulk_create([models.Category(name="New", slug="new")])
+        self.assertNotIn("New", dict(reference.category_choices()).values())
+        later = time.time() + reference.LOCAL_REFERENCE_TIMEOUT + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time") as now:
+            now.return_value = later
+            self.assertIn("New", dict(reference.category_choices()).values())
+
+    def test_shared_cache_keeps_entries_for_the_full_timeout(self):
+        self.assertEqual(reference._timeout(), reference.LOCAL_REFERENCE_TIMEOUT)
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+        ):
+            self.assertEqual(reference._timeout(), reference.REFERENCE_TIMEOUT)
+
+    def test_startup_profile_reports_imports(self):
+        out = StringIO()
+        call_command("startup_profile", "--limit", "3", stdout=out)
+        self.assertIn("Imported", out.getvalue())
+        self.assertIn("Packages (self time)", out.getvalue())
+
+
+class TagFilterTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.python = models.Tag.objects.create(name="Python", slug="python")
+        self.exams = models.Tag.objects.create(name="Exams", slug="exams")
+        self.both = self.make_thread(title="Both tags")
+        self.both.tags.add(self.python, self.exams)
+        self.only_python = self.make_thread(title="Only python")
+        self.only_python.tags.add(self.python)
+        self.client.force_login(self.user)
+
+    def filtered(self, slugs):
+        tags = tagging.resolve_tags(slugs)
+        return set(
+            tagging.filter_by_tags(models.Thread.live.all(), tags, slugs).values_list(
+                "title", flat=True
+            )
+        )
+
+    def test_threads_must_carry_every_requested_tag(self):
+        self.assertEqual(self.filtered(["python"]), {"Both tags", "Only python"})
+        self.assertEqual(self.filtered(["python", "exams"]), {"Both tags"})
+
+    def test_unknown_tag_matches_nothing(self):
+        self.assertEqual(self.filtered(["python", "missing"]), set())
+
+    def test_facets_count_the_other_tags_of_the_matches(self):
+        threads = models.Thread.live.all()
+        tags = tagging.resolve_tags(["python"])
+        facets = tagging.tag_facets(
+            tagging.filter_by_tags(threads, tags, ["python"]), None, tags
+        )
+        self.assertEqual(
+            facets, [{"tag__slug": "exams", "tag__name": "Exams", "count": 1}]
+        )
+
+    def test_home_filters_by_tags(self):
+        response = self.client.get(
+            reverse("home"), {"tag": ["python", "exams"]}, follow=True
+        )
+        self.assertContains(response, "Both tags")
+        self.assertNotContains(response, "Only python")
+
+
+class SimilarThreadsTests(ForumTestCase):
+    TITLE = "How do I prepare for the data structures midsem exam"
+    CONTENT = "Looking for past papers and tips on trees, heaps and graphs."
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(similarity, "index", similarity.ThreadIndex())
+        self.index = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index.build()
+
+    def similar_ids(self):
+        return [
+            thread.id
+            for _, thread in similarity.similar_threads(None, self.TITLE, self.CONTENT)
+        ]
+
+    def test_finds_near_duplicates_and_drops_deleted_threads(self):
+        thread = self.make_thread(title=self.TITLE, content=self.CONTENT)
+        self.make_thread(title="Hostel mess timings", content="When is dinner?")
+        self.assertEqual(self.similar_ids(), [thread.id])
+        thread.is_deleted = True
+        thread.save()
+        self.assertEqual(self.similar_ids(), [])
+
+    def test_threads_edited_by_other_workers_are_scored_on_their_new_text(self):
+        thread = self.make_thread(title=self.TITLE, content=self.CONTENT)
+        self.assertEqual(self.similar_ids(), [thread.id])
+        # An edit saved by another worker never reaches this index's signals
+        models.Thread.objects.filter(pk=thread.pk).update(
+            title="Hostel mess timings", content="When is dinner served?"
+        )
+        self.assertEqual(self.similar_ids(), [])
+        self.assertEqual(list(self.index.similar(None, self.TITLE, self.CONTENT)), [])
+
+    def test_catch_up_indexes_threads_from_other_workers(self):
+        # Another worker's insert (no signal here) gets the lower id, then
+        # this worker indexes its own thread in-process
+        models.Thread.objects.bulk_create(
+            [
+                models.Thread(
+                    title=self.TITLE,
+                    content=self.CONTENT,
+                    author=self.user,
+                    category=self.category,
+                )
+            ]
+        )
+        other = models.Thread.objects.get()
+        local = self.make_thread(title="Hostel mess timings", content="Dinner?")
+        self.assertGreater(local.id, other.id)
+        self.index._last_catch_up = 0
+        self.assertEqual(self.similar_ids(), [other.id])
+
+    def test_catch_up_rescans_recent_threads_below_the_watermark(self):
+        models.Thread.objects.bulk_create(
+            [
+                models.Thread(
+                    title=self.TITLE,
+                    content=self.CONTENT,
+                    author=self.user,
+                    category=self.category,
+                )
+            ]
+        )
+        # An id below the watermark that committed after the last catch-up
+        self.index._last_id = models.Thread.objects.get().id
+        self.index._last_catch_up = 0
+        self.assertEqual(len(self.similar_ids()), 1)
+
+    def test_similar_threads_endpoint(self):
+        thread = self.make_thread(title=self.TITLE, content=self.CONTENT)
+        self.client.force_login(self.other)
+        response = self.client.post(
+            reverse("ajax_similar_threads"),
+            {"title": self.TITLE, "content": self.CONTENT, "course": ""},
+        )
+        self.assertEqual([match["id"] for match in response.json()], [thread.id])
+
+
+def data_uri(image_type, data):
+    return f"data:image/{image_type};base64,{base64.b64encode(data).decode()}"
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+class InlineImageTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_pasted_image_is_stored_once_by_content(self):
+        content = f"![a]({data_uri('png', PNG)}) and again ![b]({data_uri('png', PNG)})"
+        thread = self.make_thread(content=content)
+        digest = hashlib.sha256(PNG).hexdigest()
+        url = f"/media/forum/inline/{digest[:2]}/{digest}.png"
+        self.assertEqual(thread.content, f"![a]({url}) and again ![b]({url})")
+        self.assertTrue(default_storage.exists(url.removeprefix("/media/")))
+
+    def test_payload_that_is_not_the_declared_image_type_is_left_alone(self):
+        for image_type, data in (
+            ("png", b"<html><script>alert(1)</script></html>"),
+            ("jpeg", PNG),
+            ("gif", b"GIF00a"),
+        ):
+            content = f"![x]({data_uri(image_type, data)})"
+            self.assertEqual(extract_inline_images(content), content)
+
+    def test_oversized_payload_is_left_alone(self):
+        data = PNG + b"\x00" * inline_images.MAX_IMAGE_BYTES
+        content = f"![x]({data_uri('png', data)})"
+        self.assertEqual(extract_inline_images(content), content)
+        self.assertFalse(default_storage.exists(inline_images.UPLOAD_DIR))
+
+    def test_extract_command_rewrites_existing_rows(self):
+        models.Thread.objects.bulk_create(
+            [
+                models.Thread(
+                    title="Old",
+                    content=f"![x]({data_uri('png', PNG)})",
+                    author=self.user,
+                    category=self.category,
+                )
+            ]
+        )
+        call_command("extract_inline_images", stdout=StringIO())
+        self.assertIn("/media/forum/inline/", models.Thread.objects.get().content)
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = suggest.PrefixIndex()
+        # Higher ids weigh more, so they rank first
+        for key in range(1, 31):
+            self.index.add(key, f"Midsem exam {key}", weight=key)
+
+    def keys(self, query, limit=50):
+        return [key for key, _, _ in self.index.search(query, limit)]
+
+    def test_ranks_by_weight(self):
+        self.assertEqual(self.keys("mid", 3), [30, 29, 28])
+
+    def test_removals_are_backfilled(self):
+        for key in range(30, 15, -1):
+            self.index.remove(key)
+        self.assertEqual(self.keys("exa"), list(range(15, 0, -1)))
+
+    def test_every_term_is_matched_before_truncating(self):
+        self.index.add(99, "Graphs exam notes", weight=0)
+        self.assertEqual(self.keys("graphs exam"), [99])
+        self.assertEqual(self.keys("exam gra"), [99])
+        self.assertEqual(self.keys("exam history"), [])
+
+    def test_long_terms_match_beyond_the_indexed_prefix(self):
+        self.index.add(99, "Internationalization basics")
+        self.index.add(98, "Internationally recognised courses")
+        self.assertEqual(self.keys("internationalization"), [99])
+
+
+class SuggestViewTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(suggest, "index", suggest.SuggestionIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def test_suggests_threads_and_categories(self):
+        thread = self.make_thread(title="Generating functions homework")
+        response = self.client.get(reverse("ajax_suggest"), {"q": "gen"})
+        data = response.json()
+        self.assertEqual(
+            data["threads"],
+            [
+                {
+                    "title": thread.title,
+                    "url": reverse("thread-view", args=["general", thread.id]),
+                }
+            ],
+        )
+        self.assertEqual([c["name"] for c in data["categories"]], ["General"])
+
+    def test_deleted_threads_drop_out(self):
+        thread = self.make_thread(title="Generating functions homework")
+        self.client.get(reverse("ajax_suggest"), {"q": "gen"})
+        thread.is_deleted = True
+        thread.save()
+        response = self.client.get(reverse("ajax_suggest"), {"q": "gen"})
+        self.assertEqual(response.json()["threads"], [])
+
+    def test_changes_made_by_other_workers_are_not_suggested(self):
+        deleted = self.make_thread(title="Generating functions homework")
+        retitled = self.make_thread(title="Genetics lab report")
+        kept = self.make_thread(title="General relativity notes")
+        self.client.get(reverse("ajax_suggest"), {"q": "gen"})
+        # Saved elsewhere, so this worker's signals never see them
+        models.Thread.objects.filter(pk=deleted.pk).update(is_deleted=True)
+        models.Thread.objects.filter(pk=retitled.pk).update(title="Lab report")
+        response = self.client.get(reverse("ajax_suggest"), {"q": "gen"})
+        self.assertEqual(
+            [thread["title"] for thread in response.json()["threads"]],
+            [kept.title],
+        )
+        response = self.client.get(reverse("ajax_suggest"), {"q": "lab"})
+        self.assertEqual(
+            [thread["title"] for thread in response.json()["threads"]],
+            ["Lab report"],
+        )
+
+
+class UnreadTests(ForumTestCase):
+    SECOND = datetime.timedelta(seconds=1)
+
+    def unread_count(self, thread):
+        return (
+            unread.annotate_unread(
+                models.Thread.objects.filter(pk=thread.pk), self.user
+            )
+            .get()
+            .unread_count
+        )
+
+    def test_unread_counts_follow_the_read_watermark(self):
+        thread = self.make_thread()
+        self.make_reply(thread)
+        self.make_reply(thread)
+        # Never opened: every reply is unread
+        self.assertEqual(self.unread_count(thread), 2)
+
+        thread.refresh_from_db()
+        unread.mark_read(self.user, thread)
+        self.assertEqual(self.unread_count(thread), 0)
+
+        self.make_reply(thread, created_timestamp=timezone.now() + self.SECOND)
+        self.assertEqual(self.unread_count(thread), 1)
+
+    def test_opening_a_thread_marks_it_read(self):
+        thread = self.make_thread()
+        reply = self.make_reply(thread)
+        thread.refresh_from_db()
+        unread.mark_read(self.user, thread)
+        newer = self.make_reply(
+            thread, created_timestamp=reply.created_timestamp + self.SECOND
+        )
+        self.client.force_login(self.user)
+        url = reverse("thread-view", args=[self.category.slug, thread.id])
+        response = self.client.get(url)
+        self.assertEqual(response.context["first_unread"], newer.id)
+        self.assertEqual(self.unread_count(thread), 0)
+        self.assertIsNone(self.client.get(url).context["first_unread"])
+
+
+class NotificationTests(ForumTestCase):
+    def reply_as(self, user, thread, **data):
+        self.client.force_login(user)
+        return self.client.post(
+            reverse("reply-thread", args=[self.category.slug, thread.id]),
+            {"content": "Me too", **data},
+        )
+
+    def test_replies_notify_subscribers_but_not_the_replier(self):
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("create-thread"),
+            {"title": "Question", "content": "Body", "category": self.category.id},
+        )
+        thread = models.Thread.objects.get()
+        self.reply_as(self.other, thread)
+        notification = models.Notification.objects.get()
+        self.assertEqual(
+            (notification.recipient, notification.actor), (self.user, self.other)
+        )
+        # The replier is now subscribed, so the author's answer reaches them
+        self.reply_as(self.user, thread)
+        self.assertEqual(
+            models.Notification.objects.filter(recipient=self.other).count(), 1
+        )
+
+    def test_unfollowed_threads_stop_notifying(self):
+        thread = self.make_thread()
+        notifications.subscribe(self.user, thread)
+        self.client.force_login(self.user)
+        self.client.post(reverse("toggle-thread-follow", args=[thread.id]))
+        self.reply_as(self.other, thread)
+        self.assertFalse(models.Notification.objects.exists())
+
+    def test_inbox_is_keyset_paginated_and_marked_read(self):
+        thread = self.make_thread()
+        models.Notification.objects.bulk_create(
+            [models.Notification(recipient=self.user, thread=thread) for _ in range(12)]
+        )
+        self.client.force_login(self.user)
+        first = self.client.get(reverse("notification-list"))
+        self.assertEqual(len(first.context["notifications"]), 10)
+        second = self.client.get(
+            reverse("notification-list"), {"before": first.context["next_cursor"]}
+        )
+        self.assertEqual(len(second.context["notifications"]), 2)
+        self.assertEqual(notifications.unread_count(self.user), 12)
+        self.client.post(reverse("mark-notifications-read"))
+        self.assertEqual(notifications.unread_count(self.user), 0)
+
+
+class MigrationTestCase(TransactionTestCase):
+    migrate_from = None
+    migrate_to = None
+
+    def migrate(self, name):
+        executor = MigrationExecutor(connection)
+        executor.migrate([("forum", name)])
+        return executor.loader.project_state([("forum", name)]).apps
+
+    def setUp(self):
+        self.apps = self.migrate(self.migrate_from)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class CategoryStatsMigrationTests(MigrationTestCase):
+    migrate_from = "0008_admin_indexes"
+    migrate_to = "0009_categorystats"
+
+    def test_counters_are_filled_from_live_posts(self):
+        Category = self.apps.get_model("forum", "Category")
+        Thread = self.apps.get_model("forum", "Thread")
+        Reply = self.apps.get_model("forum", "Reply")
+        category = Category.objects.create(name="Old", slug="old")
+        Category.objects.create(name="Empty", slug="empty")
+        thread = Thread.objects.create(title="Live", content="Body", category=category)
+        gone = Thread.objects.create(
+            title="Gone", content="Body", category=category, is_deleted=True
+        )
+        Reply.objects.create(thread=thread, content="First")
+        Reply.objects.create(thread=thread, content="Removed", is_deleted=True)
+        Reply.objects.create(thread=gone, content="Hidden")
+
+        apps = self.migrate(self.migrate_to)
+        CategoryStats = apps.get_model("forum", "CategoryStats")
+        stats = CategoryStats.objects.get(category_id=category.id)
+        self.assertEqual((stats.thread_count, stats.reply_count), (1, 1))
+        self.assertEqual(stats.last_thread_id, thread.id)
+        self.assertEqual(stats.last_thread_title, "Live")
+        empty = CategoryStats.objects.exclude(category_id=category.id).get()
+        self.assertEqual((empty.thread_count, empty.reply_count), (0, 0))
+
+
+class SubscribeParticipantsMigrationTests(MigrationTestCase):
+    migrate_from = "0011_thread_activity_read_markers"
+    migrate_to = "0012_subscriptions_notifications"
+
+    def test_authors_and_repliers_are_subscribed_once(self):
+        User = self.apps.get_model("auth", "User")
+        Category = self.apps.get_model("forum", "Category")
+        Thread = self.apps.get_model("forum", "Thread")
+        Reply = self.apps.get_model("forum", "Reply")
+        author = User.objects.create(username="author")
+        replier = User.objects.create(username="replier")
+        thread = Thread.objects.create(
+            title="Old thread",
+            content="Body",
+            author=author,
+            category=Category.objects.create(name="Old", slug="old"),
+        )
+        Reply.objects.create(thread=thread, author=replier, content="First")
+        Reply.objects.create(thread=thread, author=replier, content="Second")
+        Reply.objects.create(thread=thread, author=author, content="Thanks")
+        Reply.objects.create(thread=thread, author=None, content="Anonymous")
+
+        apps = self.migrate(self.migrate_to)
+        ThreadSubscription = apps.get_model("forum", "ThreadSubscription")
+        self.assertEqual(
+            sorted(ThreadSubscription.objects.values_list("thread_id", "user_id")),
+            [(thread.id, author.id), (thread.id, replier.id)],
+        )
+
+
+class ApiTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        start = timezone.now() - datetime.timedelta(days=1)
+        self.threads = [
+            self.make_thread(
+                title=f"Thread {i}",
+                created_timestamp=start + datetime.timedelta(minutes=i),
+            )
+            for i in range(5)
+        ]
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        return response.status_code, json.loads(response.getvalue())
+
+    def test_threads_are_paged_with_cursors(self):
+        url = reverse("api-thread-list")
+        status, page = self.get(url, limit=2)
+        titles = [thread["title"] for thread in page["results"]]
+        while page["next"]:
+            status, page = self.get(url, limit=2, cursor=page["next"])
+            titles += [thread["title"] for thread in page["results"]]
+        self.assertEqual(titles, [f"Thread {i}" for i in range(4, -1, -1)])
+
+    def test_popular_cursor_pages_by_upvotes(self):
+        for thread in self.threads[:2]:
+            models.UpvoteThread.objects.create(thread=thread, user=self.other)
+        url = reverse("api-thread-list")
+        _, page = self.get(url, sort="popular", limit=3)
+        _, rest = self.get(url, sort="popular", limit=3, cursor=page["next"])
+        ids = [t["id"] for t in page["results"] + rest["results"]]
+        self.assertEqual(sorted(ids), sorted(t.id for t in self.threads))
+        self.assertEqual(set(ids[:2]), {t.id for t in self.threads[:2]})
+
+    def test_cursor_from_another_sort_is_rejected(self):
+        url = reverse("api-thread-list")
+        _, latest = self.get(url, limit=2)
+        _, popular = self.get(url, sort="popular", limit=2)
+        for params in (
+            {"sort": "popular", "cursor": latest["next"]},
+            {"cursor": popular["next"]},
+            {"order": "asc", "cursor": latest["next"]},
+            {"cursor": "not-a-cursor"},
+        ):
+            status, body = self.get(url, **params)
+            self.assertEqual((status, body), (400, {"error": "Invalid cursor."}))
+
+    def test_thread_detail_pages_replies(self):
+        thread = self.threads[0]
+        for i in range(3):
+            self.make_reply(
+                thread,
+                content=f"Reply {i}",
+                created_timestamp=timezone.now() + datetime.timedelta(seconds=i),
+            )
+        url = reverse("api-thread-detail", args=[thread.id])
+        _, page = self.get(url, limit=2)
+        self.assertEqual(page["thread"]["title"], "Thread 0")
+        _, rest = self.get(url, limit=2, cursor=page["replies"]["next"])
+        self.assertEqual(
+            [
+                r["content"]
+                for r in page["replies"]["results"] + rest["replies"]["results"]
+            ],
+            ["Reply 0", "Reply 1", "Reply 2"],
+        )
+
+    def test_requires_authentication_and_known_fields(self):
+        self.assertEqual(self.get(reverse("api-thread-list"), fields="secret")[0], 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api-thread-list")).status_code, 401)
+
+
+class TransferTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "forum.jsonl")
+        days_ago = timezone.now() - datetime.timedelta(days=3)
+        self.thread = self.make_thread(created_timestamp=days_ago)
+        self.make_reply(self.thread, created_timestamp=days_ago)
+        self.make_reply(self.thread, created_timestamp=days_ago)
+        call_command("export_forum", self.path, stderr=StringIO())
+
+    def import_forum(self, *args):
+        call_command(
+            "import_forum", self.path, *args, stdout=StringIO(), stderr=StringIO()
+        )
+
+    def imported_thread(self):
+        return models.Thread.objects.exclude(pk=self.thread.pk).get()
+
+    def test_import_remaps_keys_and_reconciles_counters(self):
+        self.import_forum()
+        thread = self.imported_thread()
+        self.assertEqual(thread.author, self.user)
+        self.assertEqual(thread.category, self.category)
+        self.assertEqual(thread.reply_set.count(), 2)
+        self.assertEqual(thread.reply_count, 2)
+        stats = models.CategoryStats.objects.get(category=self.category)
+        self.assertEqual((stats.thread_count, stats.reply_count), (2, 4))
+        self.assertFalse(models.ImportCheckpoint.objects.exists())
+
+    def test_import_reuses_courses_that_already_exist(self):
+        course = models.Course.objects.create(code="CS F211", title="DSA")
+        models.Thread.objects.filter(pk=self.thread.pk).update(course=course)
+        call_command("export_forum", self.path, stderr=StringIO())
+        self.import_forum()
+        self.assertEqual(models.Course.objects.get(), course)
+        self.assertEqual(self.imported_thread().course, course)
+
+    def test_resume_after_a_crash_loads_every_batch_once(self):
+        load = import_forum.Command.load
+        calls = []
+
+        def crash_in_second_batch(command, model, batch):
+            result = load(command, model, batch)
+            calls.append(model)
+            if len(calls) == 2:
+                raise RuntimeError("worker killed")
+            return result
+
+        with mock.patch.object(import_forum.Command, "load", crash_in_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.import_forum("--batch-size", "1")
+        self.assertTrue(models.ImportCheckpoint.objects.exists())
+        self.import_forum("--batch-size", "1")
+        self.assertEqual(models.Thread.objects.count(), 2)
+        self.assertEqual(self.imported_thread().reply_set.count(), 2)
+        self.assertEqual(models.Reply.objects.count(), 4)
+
+    def test_import_rebuilds_rolled_up_days(self):
+        rollups.set_watermark(timezone.localdate() - datetime.timedelta(days=1))
+        self.import_forum()
+        day = timezone.localdate(self.thread.created_timestamp)
+        activity = models.DailyActivity.objects.get(
+            dimension=models.DailyActivity.CATEGORY, key=self.category.id, day=day
+        )
+        self.assertEqual((activity.threads, activity.replies), (2, 4))
+
+
+class StubLinkHandler(BaseHTTPRequestHandler):
+    # /ok answers, /missing is a 404 and /get-only refuses HEAD like some
+    # hosts do
+    def do_HEAD(self):
+        if self.path == "/get-only":
+            self.send_response(405)
+        else:
+            self.send_response(200 if self.path == "/ok" else 404)
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ImportCatalogTests(ForumTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubLinkHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_catalog(self, rows):
+        path = os.path.join(self.directory, "catalog.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+        return path
+
+    def import_catalog(self, path, *args):
+        out = StringIO()
+        call_command("import_catalog", path, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def catalog(self, title="Data Structures"):
+        return [
+            {
+                "code": "CS F211",
+                "title": title,
+                "department": "CS",
+                "resources": [
+                    {"title": "Notes", "type": "pdf", "link": f"{self.base_url}/ok"},
+                    {"title": "Slides", "link": f"{self.base_url}/get-only"},
+                    {"title": "Gone", "link": f"{self.base_url}/missing"},
+                ],
+            }
+        ]
+
+    def test_imports_checked_links_and_skips_broken_ones(self):
+        output = self.import_catalog(self.write_catalog(self.catalog()))
+        course = models.Course.objects.get(code="CS F211")
+        self.assertEqual(
+            sorted(course.resource_set.values_list("title", "type")),
+            [("Notes", "pdf"), ("Slides", "link")],
+        )
+        self.assertIn("1 broken links skipped", output)
+        for stage in ("parse", "diff", "check links", "write"):
+            self.assertIn(f"{stage}:", output)
+
+    def test_rerun_updates_only_what_changed(self):
+        self.import_catalog(self.write_catalog(self.catalog()))
+        output = self.import_catalog(
+            self.write_catalog(self.catalog(title="Data Structures and Algorithms"))
+        )
+        self.assertIn("Courses: 0 new, 1 changed", output)
+        self.assertIn("0 new, 0 changed, 2 unchanged", output)
+        self.assertEqual(
+            models.Course.objects.get().title, "Data Structures and Algorithms"
+        )
+        self.assertEqual(models.Resource.objects.count(), 2)
+
+    def test_dry_run_writes_nothing(self):
+        self.import_catalog(self.write_catalog(self.catalog()), "--dry-run")
+        self.assertFalse(models.Course.objects.exists())
+
+    def test_csv_import_refreshes_the_course_choices(self):
+        reference.course_choices()
+        path = os.path.join(self.directory, "catalog.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("code,title,department,resource_title,resource_link\n")
+            f.write(f"MATH F111,Calculus,Maths,Book,{self.base_url}/ok\n")
+        self.import_catalog(path)
+        course = models.Course.objects.get(code="MATH F111")
+        self.assertEqual(reference.course_choices(), [(course.id, str(course))])
+
+
+class MergeDuplicateCoursesMigrationTests(MigrationTestCase):
+    migrate_from = "0013_importcheckpoint"
+    migrate_to = "0014_course_code_unique"
+
+    def test_duplicates_are_merged_into_the_lowest_id(self):
+        Course = self.apps.get_model("forum", "Course")
+        Resource = self.apps.get_model("forum", "Resource")
+        Thread = self.apps.get_model("forum", "Thread")
+        Category = self.apps.get_model("forum", "Category")
+        keep = Course.objects.create(code="CS F111", title="Computing")
+        duplicate = Course.objects.create(code="CS F111", title="Computing (old)")
+        other = Course.objects.create(code="CS F211", title="Data Structures")
+        Resource.objects.create(
+            course=duplicate, title="Notes", type="pdf", link="https://x.test/"
+        )
+        thread = Thread.objects.create(
+            title="Question",
+            content="Body",
+            course=duplicate,
+            category=Category.objects.create(name="General", slug="general"),
+        )
+
+        apps = self.migrate(self.migrate_to)
+        Course = apps.get_model("forum", "Course")
+        self.assertEqual(
+            sorted(Course.objects.values_list("id", flat=True)), [keep.id, other.id]
+        )
+        self.assertEqual(
+            apps.get_model("forum", "Resource").objects.get().course_id, keep.id
+        )
+        self.assertEqual(
+            apps.get_model("forum", "Thread").objects.get(pk=thread.pk).course_id,
+            keep.id,
+        )
+
+
+class ArchiveTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        old = timezone.now() - datetime.timedelta(days=400)
+        course = models.Course.objects.create(code="CS F211", title="DSA")
+        self.resource = models.Resource.objects.create(
+            course=course,
+            title="Midsem paper",
+            type="pdf",
+            link="https://example.com/midsem.pdf",
+        )
+        self.thread = self.make_thread(
+            is_locked=True, course=course, resource=self.resource
+        )
+        self.reply = self.make_reply(self.thread)
+        # Creating a reply bumps the activity timestamp
+        models.Thread.objects.filter(pk=self.thread.pk).update(
+            last_activity_timestamp=old
+        )
+
+    def archive(self):
+        call_command("archive_threads", stdout=StringIO())
+
+    def test_archived_thread_redirects_to_the_archive(self):
+        self.archive()
+        self.assertFalse(models.Thread.objects.filter(pk=self.thread.pk).exists())
+        archived = models.ArchivedThread.objects.get(pk=self.thread.pk)
+        self.assertEqual(
+            list(archived.replies.values_list("id", flat=True)), [self.reply.pk]
+        )
+        self.assertEqual(archived.resource, self.resource)
+        response = self.client.get(
+            reverse("thread-view", args=[self.category.slug, self.thread.pk])
+        )
+        self.assertRedirects(
+            response, reverse("archived-thread-view", args=[self.thread.pk])
+        )
+        response = self.client.get(response.url)
+        self.assertContains(response, "Midsem paper")
+
+    def test_thread_with_an_open_report_is_kept(self):
+        report = models.Report.objects.create(
+            author=self.other, thread=self.thread, reason="spam"
+        )
+        self.archive()
+        self.assertTrue(models.Thread.objects.filter(pk=self.thread.pk).exists())
+        self.assertTrue(models.Report.objects.filter(pk=report.pk).exists())
+
+    def test_report_filed_after_the_candidates_query_keeps_the_thread(self):
+        report = models.Report.objects.create(
+            author=self.other, thread=self.thread, reason="spam"
+        )
+        self.assertEqual(archive.archive_threads([self.thread.pk]), 0)
+        self.assertTrue(models.Report.objects.filter(pk=report.pk).exists())
+
+    def test_resolved_reports_are_archived_with_the_thread(self):
+        report = models.Report.objects.create(
+            author=self.other,
+            thread=self.thread,
+            reply=self.reply,
+            reason="rude",
+            resolved=True,
+        )
+        self.archive()
+        archived = models.ArchivedReport.objects.get(pk=report.pk)
+        self.assertEqual(archived.thread_id, self.thread.pk)
+        self.assertEqual(archived.reply_id, self.reply.pk)
+        self.assertEqual(archived.author, self.other)
+        self.assertEqual(archived.reason, "rude")
+        self.assertTrue(archived.resolved)
+
+
+@mock.patch("studydeck.db_router.replicas", return_value=["replica1"])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        for var in (db_router._use_primary, db_router._wrote):
+            self.addCleanup(var.reset, var.set(False))
+
+    def test_reads_go_to_a_replica(self, replicas):
+        self.assertEqual(self.router.db_for_read(models.Thread), "replica1")
+
+    def test_reads_after_a_write_go_to_the_primary(self, replicas):
+        self.assertEqual(self.router.db_for_write(models.Thread), "default")
+        self.assertEqual(self.router.db_for_read(models.Thread), "default")
+
+    def test_use_primary_pins_reads(self, replicas):
+        with db_router.use_primary():
+            self.assertEqual(self.router.db_for_read(models.Thread), "default")
+        self.assertEqual(self.router.db_for_read(models.Thread), "replica1")
+
+    def test_reads_in_a_transaction_go_to_the_primary(self, replicas):
+        with mock.patch.object(connections["default"], "in_atomic_block", True):
+            self.assertEqual(self.router.db_for_read(models.Thread), "default")
+
+    def test_sessions_are_read_from_the_primary(self, replicas):
+        self.assertEqual(self.router.db_for_read(Session), "default")
+
+    def test_migrations_only_run_on_the_primary(self, replicas):
+        self.assertTrue(self.router.allow_migrate("default", "forum"))
+        self.assertFalse(self.router.allow_migrate("replica1", "forum"))
+
+    def respond(self, method, view, session):
+        request = getattr(RequestFactory(), method)("/")
+        request.session = session
+        return db_router.ReplicaStickinessMiddleware(view)(request)
+
+    def test_post_that_writes_pins_the_next_reads(self, replicas):
+        def write(request):
+            self.router.db_for_write(models.Thread)
+            return HttpResponse()
+
+        def read(request):
+            return HttpResponse(self.router.db_for_read(models.Thread))
+
+        session = {}
+        self.respond("post", write, session)
+        self.assertGreater(session[db_router.SESSION_KEY], time.time())
+        self.assertEqual(self.respond("get", read, session).content, b"default")
+        session[db_router.SESSION_KEY] = time.time() - 1
+        self.assertEqual(self.respond("get", read, session).content, b"replica1")
+
+    def test_writes_while_viewing_do_not_pin(self, replicas):
+        def write(request):
+            self.router.db_for_write(models.Thread)
+            return HttpResponse()
+
+        session = {}
+        self.respond("get", write, session)
+        self.assertNotIn(db_router.SESSION_KEY, session)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class BenchmarkConnectionsTests(TransactionTestCase):
+    def test_measures_each_mode_and_restores_the_settings(self):
+        User.objects.create_superuser("root", "root@example.com", "pw")
+        models.Category.objects.create(name="General", slug="general")
+        settings_dict = connections["default"].settings_dict
+        before = {
+            key: settings_dict[key]
+            for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS", "OPTIONS")
+        }
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "benchmark_connections",
+            requests=4,
+            # The in-memory test database locks whole tables between threads
+            concurrency=1,
+            stdout=stdout,
+            stderr=stderr,
+        )
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(
+            [line.split(":")[0].strip() for line in lines], ["none", "persistent"]
+        )
+        self.assertIn("Skipping pool", stderr.getvalue())
+        for key, value in before.items():
+            self.assertEqual(settings_dict[key], value)
+
+    def test_needs_a_user_to_log_in_as(self):
+        with self.assertRaisesMessage(CommandError, "No user to log in as"):
+            call_command("benchmark_connections", requests=1, stdout=StringIO())
+
+
+class SqliteSettingsTests(TestCase):
+    def test_connections_use_wal_and_immediate_transactions(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # The test database lives in memory, which has no WAL
+        default = connections["default"]
+        file_connection = default.__class__(
+            {**default.settings_dict, "NAME": os.path.join(tmp.name, "db.sqlite3")},
+            alias="sqlite_file",
+        )
+        self.addCleanup(file_connection.close)
+        pragmas = {}
+        with file_connection.cursor() as cursor:
+            for name in ("journal_mode", "synchronous", "temp_store", "busy_timeout"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(
+            pragmas,
+            {
+                "journal_mode": "wal",
+                # NORMAL and MEMORY
+                "synchronous": 1,
+                "temp_store": 2,
+                "busy_timeout": 20000,
+            },
+        )
+        self.assertEqual(file_connection.transaction_mode, "IMMEDIATE")
+
+    def test_benchmark_needs_data(self):
+        with self.assertRaisesMessage(CommandError, "Needs at least one thread"):
+            call_command("benchmark_sqlite", seconds=0.1, stdout=StringIO())
+
+
+@override_settings(STORAGES=TEST_STORAGES, SLOW_QUERY_MS=0.000001)
+class SlowQueryTests(TransactionTestCase):
+    def failing_explain(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN SELECT * FROM no_such_table")
+
+    def test_writes_outside_a_transaction_are_kept(self):
+        category = models.Category.objects.create(name="General", slug="general")
+        slow_queries.flush()
+        self.assertTrue(models.Category.objects.filter(pk=category.pk).exists())
+        self.assertTrue(
+            models.SlowQuery.objects.filter(sql__startswith="INSERT").exists()
+        )
+
+    def test_statements_in_a_transaction_are_recorded_after_it(self):
+        inserts = models.SlowQuery.objects.filter(
+            sql__startswith='INSERT INTO "forum_category"'
+        )
+        with transaction.atomic():
+            models.Category.objects.create(name="General", slug="general")
+            self.assertFalse(inserts.exists())
+        slow_queries.flush()
+        self.assertTrue(inserts.exists())
+
+    def test_failing_explain_leaves_the_callers_transaction_alone(self):
+        with mock.patch.object(
+            slow_queries, "explain", side_effect=self.failing_explain
+        ), transaction.atomic():
+            category = models.Category.objects.create(name="General", slug="general")
+            slow_queries.record(connection, "SELECT 1", (), 5.0)
+        self.assertTrue(models.Category.objects.filter(pk=category.pk).exists())
+        recorded = models.SlowQuery.objects.get(sql="SELECT 1")
+        self.assertTrue(recorded.explain.startswith("EXPLAIN failed"))
+
+    def test_disabled_at_zero(self):
+        with override_settings(SLOW_QUERY_MS=0):
+            models.Category.objects.create(name="General", slug="general")
+            slow_queries.flush()
+        self.assertFalse(models.SlowQuery.objects.exists())
+
+    def test_request_records_its_slow_queries(self):
+        user = User.objects.create_user("alice", "alice@example.com", "pw")
+        self.client.force_login(user)
+        self.client.get(reverse("home"))
+        self.assertTrue(models.SlowQuery.objects.filter(view="home").exists())
+
+    def test_view_name_does_not_outlive_the_request(self):
+        user = User.objects.create_user("alice", "alice@example.com", "pw")
+        self.client.force_login(user)
+        self.client.get(reverse("home"))
+        models.Category.objects.create(name="General", slug="general")
+        slow_queries.flush()
+        recorded = models.SlowQuery.objects.get(
+            sql__startswith='INSERT INTO "forum_category"'
+        )
+        self.assertEqual(recorded.view, "")
+
+
+class RenderingTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(rendering._close_pool)
+
+    def test_renders_and_sanitizes(self):
+        html = rendering.markdownify("**bold** <script>alert(1)</script>")
+        self.assertIn("<strong>bold</strong>", html)
+        self.assertNotIn("<script>", html)
+
+    @override_settings(MARKDOWN_INLINE_MAX_CHARS=10, MARKDOWN_RENDER_TIMEOUT=30)
+    def test_long_posts_render_in_the_pool(self):
+        text = "# Title\n\n" + "word " * 20
+        before = metrics.snapshot()["timers"].get("markdown.render.pool", {})
+        self.assertEqual(rendering.markdownify(text), rendering.render(text))
+        after = metrics.snapshot()["timers"]["markdown.render.pool"]
+        self.assertEqual(after["count"], before.get("count", 0) + 1)
+
+    @override_settings(MARKDOWN_INLINE_MAX_CHARS=10, MARKDOWN_RENDER_TIMEOUT=0.001)
+    def test_timeout_falls_back_to_escaped_text(self):
+        text = "<b>" + "word " * 20
+        before = metrics.snapshot()["counters"].get("markdown.render.timeout", 0)
+        self.assertEqual(
+            rendering.markdownify(text), f"<pre>&lt;b&gt;{'word ' * 20}</pre>"
+        )
+        self.assertEqual(
+            metrics.snapshot()["counters"]["markdown.render.timeout"], before + 1
+        )
+        # The stuck pool is replaced on the next long post
+        self.assertIsNone(rendering._pool)
+
+
+class MetricsViewTests(ForumTestCase):
+    def test_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_reports_counters_and_timers(self):
+        staff = User.objects.create_user("carol", "carol@example.com", "pw")
+        staff.is_staff = True
+        staff.save()
+        metrics.incr("tests.counter", 2)
+        metrics.observe("tests.timer", 5.0)
+        self.client.force_login(staff)
+        data = self.client.get(reverse("metrics")).json()
+        self.assertEqual(data["pid"], os.getpid())
+        self.assertGreaterEqual(data["counters"]["tests.counter"], 2)
+        self.assertGreaterEqual(data["timers"]["tests.timer"]["max_ms"], 5.0)
+
+
+class BenchmarkBaselineTests(SimpleTestCase):
+    def test_missing_baseline_fails(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaisesMessage(CommandError, "No baseline at"):
+                call_command(
+                    "benchmark_hot_paths",
+                    baseline=os.path.join(tmp, "missing.json"),
+                    stdout=StringIO(),
+                )
+
+    def test_compare_flags_regressions(self):
+        command = benchmark_hot_paths.Command(stdout=StringIO(), stderr=StringIO())
+        baseline = {"home": {"ops_per_sec": 100, "peak_kib": 100, "queries": 10}}
+        command.compare(
+            {"home": {"ops_per_sec": 90, "peak_kib": 110, "queries": 10}},
+            baseline,
+            0.15,
+        )
+        with self.assertRaisesMessage(CommandError, "home: 11 queries"):
+            command.compare(
+                {"home": {"ops_per_sec": 100, "peak_kib": 100, "queries": 11}},
+                baseline,
+                0.15,
+            )
+        with self.assertRaisesMessage(CommandError, "home: 120 KiB peak"):
+            command.compare(
+                {"home": {"ops_per_sec": 100, "peak_kib": 120, "queries": 10}},
+                baseline,
+                0.15,
+            )
+
+    def test_speed_is_only_compared_when_asked(self):
+        command = benchmark_hot_paths.Command(stdout=StringIO(), stderr=StringIO())
+        baseline = {"home": {"ops_per_sec": 100, "peak_kib": 100, "queries": 10}}
+        slower = {"home": {"ops_per_sec": 80, "peak_kib": 100, "queries": 10}}
+        command.compare(slower, baseline, 0.15)
+        with self.assertRaisesMessage(CommandError, "home: 80 ops/s"):
+            command.compare(slower, baseline, 0.15, compare_speed=True)
+
+    def test_speed_baseline_must_come_from_this_machine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "speed.json")
+            with open(path, "w") as f:
+                json.dump({"machine": "elsewhere", "benchmarks": {}}, f)
+            with self.assertRaisesMessage(CommandError, "not recorded on this machine"):
+                call_command(
+                    "benchmark_hot_paths",
+                    baseline=path,
+                    compare_speed=True,
+                    stdout=StringIO(),
+                )
+
+    def test_committed_baseline_covers_every_benchmark(self):
+        baseline = json.loads(benchmark_hot_paths.DEFAULT_BASELINE.read_text())
+        # Ops/sec depend on the machine, so the shared baseline leaves them out
+        self.assertIsNone(baseline["machine"])
+        for result in baseline["benchmarks"].values():
+            self.assertNotIn("ops_per_sec", result)
+        thread = mock.Mock(pk=1, category=mock.Mock(slug="general"))
+        names = benchmark_hot_paths.Command().benchmarks(None, thread, mock.Mock(pk=1))
+        self.assertEqual(set(baseline["benchmarks"]), set(names))
+
+
+class CompressedStaticFilesTests(SimpleTestCase):
+    def test_collectstatic_writes_compressed_copies(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES={
+                **TEST_STORAGES,
+                "staticfiles": {
+                    "BACKEND": "studydeck.storage.CompressedManifestStaticFilesStorage"
+                },
+            },
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            manifest = json.loads(open(os.path.join(root, "staticfiles.json")).read())[
+                "paths"
+            ]
+            hashed = os.path.join(root, manifest["admin/css/base.css"])
+            with open(hashed, "rb") as f:
+                original = f.read()
+            with gzip.open(hashed + ".gz") as f:
+                self.assertEqual(f.read(), original)
+            with open(hashed + ".br", "rb") as f:
+                self.assertEqual(brotli.decompress(f.read()), original)
+            # Images are already compressed
+            self.assertFalse(
+                any(
+                    name.endswith((".png.gz", ".gif.gz"))
+                    for _, _, files in os.walk(root)
+                    for name in files
+                )
+            )
+
+
+# Nothing listens on port 1, so every command fails to connect
+@override_settings(LIVE_REDIS_URL="redis://127.0.0.1:1/0")
+class RedisTransportTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            live.broker, "_transport", live.RedisTransport(live.broker)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_publish_logs_redis_errors(self):
+        with self.assertLogs("forum.live", "ERROR"):
+            live.publish(live.thread_event(1, "Title", "general"))
+
+    def test_like_succeeds_while_redis_is_down(self):
+        thread = self.make_thread()
+        self.client.force_login(self.other)
+        with self.assertLogs("forum.live", "ERROR"):
+            response = self.client.post(reverse("toggle-thread-like", args=[thread.pk]))
+        self.assertEqual(response.json(), {"upvote_count": 1, "liked": True})
+
+    def test_reply_commits_while_redis_is_down(self):
+        thread = self.make_thread()
+        with self.assertLogs("forum.live", "ERROR"), self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            self.make_reply(thread)
+        self.assertEqual(models.Reply.objects.filter(thread=thread).count(), 1)
+
+
+class SingleflightTests(SimpleTestCase):
+    key = "tests:singleflight"
+
+    def setUp(self):
+        cache.clear()
+        self.compute = mock.Mock(return_value="fresh")
+
+    def get(self):
+        return singleflight.get_or_compute(self.key, self.compute, 10, "tests.flight")
+
+    def test_computes_once_then_hits(self):
+        self.assertEqual(self.get(), "fresh")
+        self.assertEqual(self.get(), "fresh")
+        self.compute.assert_called_once()
+
+    def test_serves_stale_while_another_caller_recomputes(self):
+        cache.set(self.key, (time.time() - 1, "stale"), 60)
+        cache.add(f"{self.key}:lock", 1)
+        self.assertEqual(self.get(), "stale")
+        self.compute.assert_not_called()
+
+    def test_refreshes_an_expired_entry(self):
+        cache.set(self.key, (time.time() - 1, "stale"), 60)
+        self.assertEqual(self.get(), "fresh")
+        self.assertIsNone(cache.get(f"{self.key}:lock"))
+
+    def test_waits_for_the_caller_holding_the_lock(self):
+        cache.add(f"{self.key}:lock", 1)
+
+        def other_caller_finishes(seconds):
+            cache.set(self.key, (time.time() + 10, "theirs"), 60)
+
+        with mock.patch.object(
+            singleflight.time, "sleep", side_effect=other_caller_finishes
+        ):
+            self.assertEqual(self.get(), "theirs")
+        self.compute.assert_not_called()
+
+    def test_computes_itself_when_the_lock_holder_is_too_slow(self):
+        cache.add(f"{self.key}:lock", 1)
+        with mock.patch.object(singleflight, "LOCK_WAIT", 0):
+            self.assertEqual(self.get(), "fresh")
+
+
+class ListingCacheTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_home_serves_cached_ids_without_deleted_threads(self):
+        first = self.make_thread(title="First thread")
+        second = self.make_thread(title="Second thread")
+        self.assertContains(self.client.get(reverse("home")), "Second thread")
+
+        self.make_thread(title="Third thread")
+        second.is_deleted = True
+        second.save()
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, first.title)
+        # Until the entry expires the page keeps its ids, minus deleted threads
+        self.assertNotContains(response, "Third thread")
+        self.assertNotContains(response, "Second thread")
+
+    @override_settings(LISTING_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_the_cache(self):
+        self.client.get(reverse("home"))
+        self.make_thread(title="Third thread")
+        self.assertContains(self.client.get(reverse("home")), "Third thread")
+
+    def test_equivalent_urls_share_a_key(self):
+        self.assertEqual(
+            listing.listing_key("", ["b", "a", "a"], "bogus", "up", "  Foo  Bar", 1),
+            listing.listing_key("", ["a", "b"], "latest", "asc", "foo bar", 1),
+        )
+        self.assertNotEqual(
+            listing.listing_key("", [], "latest", "asc", "", 1),
+            listing.listing_key("", [], "latest", "asc", "", 2),
+        )
+
+
+class EventLogTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.consumer = consumers.UserActivityConsumer()
+
+    def record(self, event_type, actor=None):
+        return events.record(event_type, actor or self.user, thread_id=1)
+
+    def activity(self):
+        return models.UserActivity.objects.get(user_id=self.user.id)
+
+    def position(self):
+        return models.EventConsumer.objects.get(name=self.consumer.name).position
+
+    def test_consumers_must_implement_handle(self):
+        class Incomplete(events.Consumer):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_batches_advance_the_offset(self):
+        self.record(events.THREAD_CREATED)
+        self.record(events.THREAD_LIKED)
+        self.record(events.REPLY_CREATED, self.other)
+        self.consumer.batch_size = 2
+        self.assertEqual(events.process_batch(self.consumer), 2)
+        self.assertEqual(events.process_batch(self.consumer), 1)
+        self.assertEqual(events.process_batch(self.consumer), 0)
+        self.assertEqual(
+            self.position(), models.ForumEvent.objects.latest("sequence").sequence
+        )
+        activity = self.activity()
+        self.assertEqual((activity.threads, activity.likes), (1, 1))
+        self.assertEqual(
+            models.UserActivity.objects.get(user_id=self.other.id).replies, 1
+        )
+
+    def test_event_committed_late_is_not_skipped(self):
+        # Reserve an id, as a transaction that is still open would
+        late = self.record(events.REPLY_CREATED)
+        late_id = late.id
+        late.delete()
+        self.record(events.THREAD_CREATED)
+        events.process_batch(self.consumer)
+
+        models.ForumEvent.objects.create(
+            id=late_id, type=events.REPLY_CREATED, actor_id=self.user.id
+        )
+        self.assertEqual(events.process_batch(self.consumer), 1)
+        self.assertEqual(self.activity().replies, 1)
+        self.assertGreater(
+            models.ForumEvent.objects.get(id=late_id).sequence,
+            models.ForumEvent.objects.get(type=events.THREAD_CREATED).sequence,
+        )
+
+    def test_rewind_replays_from_a_position(self):
+        first = self.record(events.THREAD_CREATED)
+        self.record(events.THREAD_CREATED)
+        events.process_batch(self.consumer)
+        first.refresh_from_db()
+        events.rewind(self.consumer, first.sequence)
+        self.assertEqual(events.process_batch(self.consumer), 1)
+        # Replaying without a reset counts the replayed events again
+        self.assertEqual(self.activity().threads, 3)
+
+    def test_rewind_to_zero_rebuilds_from_scratch(self):
+        self.record(events.THREAD_CREATED)
+        self.record(events.THREAD_LIKED)
+        self.record(events.THREAD_UNLIKED)
+        events.process_batch(self.consumer)
+        before = models.UserActivity.objects.values().get(user_id=self.user.id)
+        events.rewind(self.consumer, 0)
+        self.assertFalse(models.UserActivity.objects.exists())
+        self.assertEqual(self.position(), 0)
+        events.process_batch(self.consumer)
+        self.assertEqual(
+            models.UserActivity.objects.values().get(user_id=self.user.id), before
+        )
+
+    def test_prune_keeps_unprocessed_events(self):
+        self.record(events.THREAD_CREATED)
+        events.process_batch(self.consumer)
+        self.record(events.THREAD_CREATED)
+        events.assign_sequence()
+        later = timezone.now() + datetime.timedelta(days=1)
+        self.assertEqual(events.prune(later), 1)
+        self.assertEqual(models.ForumEvent.objects.count(), 1)
+        with self.assertRaises(ValueError):
+            events.rewind(self.consumer, 0)
+        with self.assertRaisesMessage(CommandError, "have been pruned"):
+            call_command("consume_events", rewind=0, stdout=StringIO())
+
+    def test_prune_keeps_recent_events(self):
+        self.record(events.THREAD_CREATED)
+        events.process_batch(self.consumer)
+        call_command("prune_events", days=1, stdout=StringIO())
+        self.assertEqual(models.ForumEvent.objects.count(), 1)
+
+    def test_command_runs_the_configured_consumers(self):
+        self.client.force_login(self.user)
+        thread = self.make_thread()
+        self.client.post(reverse("toggle-thread-like", args=[thread.pk]))
+        out = StringIO()
+        call_command("consume_events", stdout=out)
+        self.assertIn("user-activity: caught up, 1 events", out.getvalue())
+        self.assertEqual(self.activity().likes, 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RollupActivityTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", "alice@example.com", "pw")
+        self.category = models.Category.objects.create(name="General", slug="general")
+        self.yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        self.first_day = self.yesterday - datetime.timedelta(days=9)
+        # One thread a day for the last ten days
+        for offset in range(10):
+            self.post(self.first_day + datetime.timedelta(days=offset))
+
+    def post(self, day):
+        return models.Thread.objects.create(
+            title="A thread",
+            content="Content",
+            author=self.user,
+            category=self.category,
+            created_timestamp=timezone.make_aware(
+                datetime.datetime.combine(day, datetime.time(12))
+            ),
+        )
+
+    def rollup(self, **options):
+        call_command("rollup_activity", chunk_days=3, stdout=StringIO(), **options)
+
+    def rows(self):
+        return models.DailyActivity.objects.filter(
+            dimension=models.DailyActivity.CATEGORY
+        )
+
+    def test_incremental_run_resumes_after_the_watermark(self):
+        self.rollup()
+        self.assertEqual(rollups.last_rolled_up(), self.yesterday)
+        self.assertEqual(self.rows().count(), 10)
+
+        # As if a run was interrupted after its first chunk
+        resume_after = self.first_day + datetime.timedelta(days=2)
+        rollups.set_watermark(resume_after)
+        self.rows().filter(day__gt=resume_after).delete()
+        self.rows().filter(day=self.first_day).update(threads=99)
+        self.rollup()
+        self.assertEqual(rollups.last_rolled_up(), self.yesterday)
+        self.assertEqual(self.rows().count(), 10)
+        # Days before the watermark aren't counted again
+        self.assertEqual(self.rows().get(day=self.first_day).threads, 99)
+
+    def test_nothing_to_do_when_up_to_date(self):
+        self.rollup()
+        out = StringIO()
+        call_command("rollup_activity", stdout=out)
+        self.assertIn("Nothing to roll up", out.getvalue())
+
+    def test_rebuild_moves_the_watermark_only_when_it_connects(self):
+        middle = self.first_day + datetime.timedelta(days=4)
+        rollups.set_watermark(middle)
+
+        # Inside the rolled-up history
+        self.rollup(rebuild=True, workers=1, since=self.first_day, until=middle)
+        self.assertEqual(rollups.last_rolled_up(), middle)
+
+        # After a gap: the days between would be skipped
+        gap_start = middle + datetime.timedelta(days=3)
+        self.rollup(rebuild=True, workers=1, since=gap_start, until=self.yesterday)
+        self.assertEqual(rollups.last_rolled_up(), middle)
+
+        # Continuing the history
+        self.rollup(rebuild=True, workers=1, since=middle, until=self.yesterday)
+        self.assertEqual(rollups.last_rolled_up(), self.yesterday)
+        self.assertEqual(self.rows().count(), 10)
+
+    def test_rebuild_rejects_days_that_are_not_over(self):
+        with self.assertRaisesMessage(CommandError, "--until must be"):
+            self.rollup(rebuild=True, until=timezone.localdate())
+        self.assertIsNone(rollups.last_rolled_up())
+
+    def test_dashboard_shows_rolled_up_counts(self):
+        self.rollup()
+        staff = User.objects.create_user("carol", "carol@example.com", "pw")
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        response = self.client.get(reverse("activity-dashboard"), {"days": 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "General")
+        self.assertEqual(response.context["by_key"][0]["thread_count"], 7)
+        self.assertEqual(len(response.context["by_day"]), 7)
@@ -0,0 +1,73 @@
+"""
+Shared pieces of the ``export_forum``/``import_forum`` JSONL format.
+
+Each line is one row, ``{"model": "forum.thread", "pk": 1, "fields": {...}}``
+as in ``dumpdata``. Foreign keys hold the exported primary key of the target
+row, except for users which aren't exported and are referenced by username.
+Models are written parents first so an import can remap keys in one pass.
+"""
+
+import datetime
+import gzip
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+
+from . import models
+
+User = get_user_model()
+
+MODELS = [
+    models.Category,
+    models.Tag,
+    models.Course,
+    models.Resource,
+    models.Thread,
+    models.ThreadTag,
+    models.Reply,
+    models.UpvoteThread,
+    models.UpvoteReply,
+    models.Report,
+]
+BY_LABEL = {model._meta.label_lower: model for model in MODELS}
+# Rows matched to an existing row by this field instead of being duplicated
+NATURAL_KEYS = {
+    models.Category: "slug",
+    models.Tag: "slug",
+    models.Course: "code",
+}
+
+
+def open_file(path, mode):
+    if path == "-":
+        return sys.stdout if "w" in mode else sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def exported_fields(model):
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name != "id"
+    ]
+
+
+def is_user_field(field):
+    return field.is_relation and field.related_model is User
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(model, pk, fields):
+    return json.dumps(
+        {"model": model._meta.label_lower, "pk": pk, "fields": fields},
+        default=_default,
+        ensure_ascii=False,
+    )
@@ -0,0 +1,53 @@
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from . import models
+
+
+def annotate_unread(threads, user):
+    # Evaluated per row of the current page: threads whose last activity is
+    # not newer than the user's watermark never touch the reply table
+    watermark = models.ThreadReadMarker.objects.filter(
+        user=user, thread=OuterRef("pk")
+    ).values("last_read_timestamp")[:1]
+    unread_replies = (
+        models.Reply.live.filter(
+            thread=OuterRef("pk"),
+            created_timestamp__gt=OuterRef("read_watermark"),
+        )
+        .order_by()
+        .values("thread")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return threads.annotate(read_watermark=Subquery(watermark)).annotate(
+        unread_count=Case(
+            When(read_watermark__isnull=True, then=F("reply_count")),
+            When(last_activity_timestamp__lte=F("read_watermark"), then=Value(0)),
+            default=Coalesce(Subquery(unread_replies), Value(0)),
+        )
+    )
+
+
+def last_read(user, thread):
+    return (
+        models.ThreadReadMarker.objects.filter(user=user, thread=thread)
+        .values_list("last_read_timestamp", flat=True)
+        .first()
+    )
+
+
+def mark_read(user, thread):
+    # Single INSERT ... ON CONFLICT DO UPDATE instead of get-then-save
+    models.ThreadReadMarker.objects.bulk_create(
+        [
+            models.ThreadReadMarker(
+                user=user,
+                thread=thread,
+                last_read_timestamp=thread.last_activity_timestamp,
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "thread"],
+        update_fields=["last_read_timestamp"],
+    )
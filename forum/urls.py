@@ -1,12 +1,17 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.home, name="home"),
     path(
         "thread/<slug:category_slug>/<int:pk>/", views.thread_view, name="thread-view"
     ),
+    path(
+        "archive/thread/<int:pk>/",
+        views.archived_thread_view,
+        name="archived-thread-view",
+    ),
     path("create_thread/", views.create_thread, name="create-thread"),
     path(
         "thread/<slug:category_slug>/<int:pk>/reply/",
@@ -18,6 +23,18 @@ urlpatterns = [
         views.create_reply,
         name="reply-reply",
     ),
+    path(
+        "thread/<int:pk>/follow/",
+        views.toggle_thread_follow,
+        name="toggle-thread-follow",
+    ),
+    path("notifications/", views.notification_list, name="notification-list"),
+    path("notifications/<int:pk>/", views.open_notification, name="open-notification"),
+    path(
+        "notifications/read/",
+        views.mark_notifications_read,
+        name="mark-notifications-read",
+    ),
     path("delete/thread/<int:pk>/", views.delete_thread, name="delete-thread"),
     path("delete/reply/<int:pk>/", views.delete_reply, name="delete-reply"),
     path("categories/", views.category_list, name="category-list"),
@@ -32,6 +49,16 @@ urlpatterns = [
     path("reports/", views.reports_view, name="reports-list"),
     path("reports/<int:pk>/resolve/", views.resolve_report, name="resolve-report"),
     path("ajax/resources/", views.load_resources_for_course, name="ajax_resources"),
+    path("ajax/similar-threads/", views.similar_threads, name="ajax_similar_threads"),
+    path("ajax/suggest/", views.suggest_view, name="ajax_suggest"),
+    path("metrics/", views.metrics_view, name="metrics"),
+    path("activity/", views.activity_dashboard, name="activity-dashboard"),
+    path("events/home/", views.home_events, name="home-events"),
+    path("events/thread/<int:pk>/", views.thread_events, name="thread-events"),
+    path("api/v1/threads/", api.thread_list, name="api-thread-list"),
+    path("api/v1/threads/<int:pk>/", api.thread_detail, name="api-thread-detail"),
+    path("api/v1/categories/", api.category_list, name="api-category-list"),
+    path("api/v1/courses/", api.course_list, name="api-course-list"),
     path("thread/<int:pk>/like/", views.toggle_thread_like, name="toggle-thread-like"),
     path("reply/<int:pk>/like/", views.toggle_reply_like, name="toggle-reply-like"),
 ]
@@ -1,17 +1,41 @@
+import os
 import threading
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required, permission_required
-from django.contrib.postgres.search import TrigramSimilarity
-from django.core.mail import send_mail
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Count
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-
-from . import models
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from . import (
+    events,
+    listing,
+    live,
+    metrics,
+    models,
+    notifications,
+    reference,
+    rollups,
+    similarity,
+    suggest,
+    tagging,
+    unread,
+)
 from .forms import CreateReplyForm, CreateReportForm, CreateThreadForm
 
 PER_PAGE = 10
@@ -19,49 +43,65 @@ PER_PAGE = 10
 
 @login_required
 def home(request, category_slug=None):
-    threads = models.Thread.objects.filter(is_deleted=False)
-    if category_slug:
-        threads = threads.filter(category__slug=category_slug)
+    requested_tags = request.GET.getlist("tag")
+    tags = tagging.resolve_tags(requested_tags) if requested_tags else []
+    threads = listing.filter_threads(category_slug, tags, requested_tags)
+    selected_slugs = [tag.slug for tag in tags]
+    tag_facets = [
+        {
+            **facet,
+            "query": urlencode({"tag": selected_slugs + [facet["tag__slug"]]}, True),
+        }
+        for facet in tagging.tag_facets(threads, category_slug, tags)
+    ]
+    selected_tags = [
+        {
+            "tag": tag,
+            "query": urlencode(
+                {"tag": [slug for slug in selected_slugs if slug != tag.slug]}, True
+            ),
+        }
+        for tag in tags
+    ]
 
     sort = request.GET.get("sort", "latest")
     order = request.GET.get("order", "desc")
-
-    if sort == "latest":
-        order_field = "created_timestamp"
-    elif sort == "popular":
-        threads = threads.annotate(upvote_count=Count("upvotethread"))
-        order_field = "upvote_count"
-
-    if order == "desc":
-        threads = threads.order_by(f"-{order_field}")
-    else:
-        threads = threads.order_by(order_field)
-
     search_query = request.GET.get("search")
-    if search_query:
-        # NOTE: The database should be PostgreSQL
-        threads = (
-            threads.annotate(similarity=TrigramSimilarity("title", search_query))
-            .filter(similarity__gt=0.3)
-            .order_by("-similarity")
-        )
-
-    paginator = Paginator(threads, PER_PAGE)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    threads, _ = listing.order_threads(threads, sort, order, search_query)
+
+    page_obj = listing.cached_page(
+        threads,
+        request.GET.get("page", 1),
+        PER_PAGE,
+        (category_slug, requested_tags, sort, order, search_query),
+        lambda page_threads: unread.annotate_unread(page_threads, request.user),
+    )
     return render(
         request,
         "forum/home.html",
-        context={"page_obj": page_obj, "sort": sort, "order": order},
+        context={
+            "page_obj": page_obj,
+            "sort": sort,
+            "order": order,
+            "selected_tags": selected_tags,
+            "tag_facets": tag_facets,
+            "tag_query": urlencode({"tag": selected_slugs}, True),
+        },
     )
 
 
 @login_required
 def thread_view(request, category_slug, pk):
-    thread = get_object_or_404(models.Thread, pk=pk, category__slug=category_slug)
+    try:
+        thread = get_object_or_404(models.Thread, pk=pk, category__slug=category_slug)
+    except Http404:
+        # Old threads are moved out of the live tables by archive_threads
+        if models.ArchivedThread.objects.filter(pk=pk, is_deleted=False).exists():
+            return redirect("archived-thread-view", pk=pk)
+        raise
     if thread.is_deleted:
         return HttpResponseForbidden()
-    replies = models.Reply.objects.filter(thread__id=pk, is_deleted=False)
+    replies = models.Reply.live.filter(thread__id=pk)
 
     sort = request.GET.get("sort", "latest")
     order = request.GET.get("order", "desc")
@@ -84,6 +124,20 @@ def thread_view(request, category_slug, pk):
     for index, reply in enumerate(replies):
         reply_page_map[reply.id] = (index // PER_PAGE) + 1
 
+    last_read = unread.last_read(request.user, thread)
+    first_unread = None
+    if last_read is not None and thread.last_activity_timestamp > last_read:
+        first_unread = (
+            models.Reply.live.filter(thread=thread, created_timestamp__gt=last_read)
+            .order_by("created_timestamp")
+            .values_list("id", flat=True)
+            .first()
+        )
+    unread.mark_read(request.user, thread)
+    is_following = models.ThreadSubscription.objects.filter(
+        user=request.user, thread=thread
+    ).exists()
+
     reply_form = CreateReplyForm()
     return render(
         request,
@@ -93,12 +147,38 @@ def thread_view(request, category_slug, pk):
             "page_obj": page_obj,
             "reply_form": reply_form,
             "reply_page_map": reply_page_map,
+            "first_unread": first_unread,
+            "is_following": is_following,
             "sort": sort,
             "order": order,
         },
     )
 
 
+@login_required
+def archived_thread_view(request, pk):
+    thread = get_object_or_404(
+        models.ArchivedThread.objects.select_related(
+            "author", "category", "course", "resource"
+        ),
+        pk=pk,
+    )
+    if thread.is_deleted:
+        return HttpResponseForbidden()
+    replies = (
+        thread.replies.filter(is_deleted=False)
+        .select_related("author")
+        .order_by("created_timestamp")
+    )
+    paginator = Paginator(replies, PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get("page", 1))
+    return render(
+        request,
+        "forum/archived_thread_view.html",
+        {"thread": thread, "page_obj": page_obj},
+    )
+
+
 @login_required
 def create_thread(request):
     if request.method == "POST":
@@ -109,8 +189,18 @@ def create_thread(request):
                 messages.warning(request, "The resource should be of the same course!")
             else:
                 thread.author = request.user
-                thread.save()
-                form.save_m2m()
+                with transaction.atomic():
+                    thread.save()
+                    form.save_m2m()
+                    events.record(
+                        events.THREAD_CREATED,
+                        request.user,
+                        thread.id,
+                        category_id=thread.category_id,
+                        course_id=thread.course_id,
+                        tag_ids=[tag.id for tag in form.cleaned_data["tags"]],
+                    )
+                notifications.subscribe(request.user, thread)
                 messages.success(request, "Your thread has been created!")
                 return redirect(
                     "thread-view", category_slug=thread.category.slug, pk=thread.id
@@ -122,6 +212,9 @@ def create_thread(request):
 
 def send_email_async(subject, message, to_email):
     def task():
+        # Imported here so workers don't load the mail stack until needed
+        from django.core.mail import send_mail
+
         send_mail(
             subject,
             message,
@@ -148,7 +241,17 @@ def create_reply(request, category_slug, pk, parent_id=None):
             reply.thread = thread
             reply.parent = parent
             reply.author = request.user
-            reply.save()
+            with transaction.atomic():
+                reply.save()
+                events.record(
+                    events.REPLY_CREATED,
+                    request.user,
+                    thread.id,
+                    reply.id,
+                    parent_id=reply.parent_id,
+                )
+            notifications.fan_out_reply(reply)
+            notifications.subscribe(request.user, thread)
             if parent and parent.author != reply.author:
                 subject = f"New reply on the thread: {thread.title}"
                 thread_url = request.build_absolute_uri(
@@ -172,6 +275,72 @@ def create_reply(request, category_slug, pk, parent_id=None):
     return redirect("thread-view", category_slug=thread.category.slug, pk=thread.pk)
 
 
+@login_required
+def toggle_thread_follow(request, pk):
+    if request.method == "POST":
+        thread = get_object_or_404(models.Thread, pk=pk, is_deleted=False)
+        with transaction.atomic():
+            if models.ThreadSubscription.objects.filter(
+                user=request.user, thread=thread
+            ).exists():
+                notifications.unsubscribe(request.user, thread)
+                events.record(events.THREAD_UNFOLLOWED, request.user, thread.id)
+            else:
+                notifications.subscribe(request.user, thread)
+                events.record(events.THREAD_FOLLOWED, request.user, thread.id)
+        return redirect("thread-view", category_slug=thread.category.slug, pk=thread.pk)
+    return HttpResponseForbidden()
+
+
+@login_required
+def notification_list(request):
+    inbox = (
+        models.Notification.objects.filter(recipient=request.user)
+        .select_related("actor", "thread", "thread__category")
+        .defer("thread__content")
+        .order_by("-id")
+    )
+    # Keyset ("cursor") pagination: no OFFSET and no COUNT over the inbox
+    before = request.GET.get("before")
+    if before and before.isdigit():
+        inbox = inbox.filter(id__lt=int(before))
+    items = list(inbox[: PER_PAGE + 1])
+    next_cursor = items[PER_PAGE - 1].id if len(items) > PER_PAGE else None
+    return render(
+        request,
+        "forum/notifications.html",
+        {"notifications": items[:PER_PAGE], "next_cursor": next_cursor},
+    )
+
+
+@login_required
+def open_notification(request, pk):
+    notification = get_object_or_404(
+        models.Notification.objects.select_related("thread__category"),
+        pk=pk,
+        recipient=request.user,
+    )
+    if not notification.is_read:
+        models.Notification.objects.filter(pk=pk).update(is_read=True)
+    url = reverse(
+        "thread-view",
+        args=[notification.thread.category.slug, notification.thread_id],
+    )
+    if notification.reply_id:
+        url += f"#reply-{notification.reply_id}"
+    return redirect(url)
+
+
+@login_required
+def mark_notifications_read(request):
+    if request.method == "POST":
+        models.Notification.objects.filter(
+            recipient=request.user, is_read=False
+        ).update(is_read=True)
+        return redirect("notification-list")
+    return HttpResponseForbidden()
+
+
 @login_required
 def delete_thread(request, pk):
     if request.method == "POST":
@@ -181,7 +350,9 @@ def delete_thread(request, pk):
         ):
             return HttpResponseForbidden()
         thread.is_deleted = True
-        thread.save()
+        with transaction.atomic():
+            thread.save(update_fields=["is_deleted"])
+            events.record(events.THREAD_DELETED, request.user, thread.id)
         messages.success(request, "Thread has been deleted!")
         return redirect("home")
     return HttpResponseForbidden()
@@ -196,7 +367,9 @@ def delete_reply(request, pk):
         ):
             return HttpResponseForbidden()
         reply.is_deleted = True
-        reply.save()
+        with transaction.atomic():
+            reply.save()
+            events.record(events.REPLY_DELETED, request.user, reply.thread_id, reply.id)
         messages.success(request, "Reply has been deleted!")
         return redirect(
             "thread-view", category_slug=reply.thread.category.slug, pk=reply.thread.pk
@@ -209,7 +382,7 @@ def category_list(request):
     return render(
         request,
         "forum/category_list.html",
-        context={"categories": models.Category.objects.all()},
+        context={"categories": models.Category.objects.select_related("stats")},
     )
 
 
@@ -219,7 +392,13 @@ def toggle_thread_lock(request, pk):
     if request.method == "POST":
         thread = get_object_or_404(models.Thread, pk=pk)
         thread.is_locked = not thread.is_locked
-        thread.save()
+        with transaction.atomic():
+            thread.save(update_fields=["is_locked"])
+            events.record(
+                events.THREAD_LOCKED if thread.is_locked else events.THREAD_UNLOCKED,
+                request.user,
+                thread.id,
+            )
         return redirect("thread-view", category_slug=thread.category.slug, pk=thread.pk)
     return HttpResponseForbidden()
 
@@ -242,7 +421,14 @@ def report_thread(request, pk):
             report = form.save(commit=False)
             report.thread = thread
             report.author = request.user
-            report.save()
+            with transaction.atomic():
+                report.save()
+                events.record(
+                    events.REPORT_CREATED,
+                    request.user,
+                    thread.id,
+                    report_id=report.id,
+                )
             messages.success(request, "Thread has been reported!")
             return redirect(
                 "thread-view", category_slug=thread.category.slug, pk=thread.pk
@@ -273,7 +459,15 @@ def report_reply(request, pk):
             report.thread = reply.thread
             report.reply = reply
             report.author = request.user
-            report.save()
+            with transaction.atomic():
+                report.save()
+                events.record(
+                    events.REPORT_CREATED,
+                    request.user,
+                    reply.thread_id,
+                    reply.id,
+                    report_id=report.id,
+                )
             messages.success(request, "Reply has been reported!")
             return redirect(
                 "thread-view",
@@ -297,9 +491,8 @@ def reports_view(request):
     reply_page_map = {}
     for report in reply_reports:
         reply = report.reply
-        index = models.Reply.objects.filter(
+        index = models.Reply.live.filter(
             thread=reply.thread,
-            is_deleted=False,
             created_timestamp__lt=reply.created_timestamp,
         ).count()
         page = (index // PER_PAGE) + 1
@@ -317,7 +510,15 @@ def resolve_report(request, pk):
     if request.method == "POST":
         report = get_object_or_404(models.Report, pk=pk)
         report.resolved = True
-        report.save()
+        with transaction.atomic():
+            report.save()
+            events.record(
+                events.REPORT_RESOLVED,
+                request.user,
+                report.thread_id,
+                report.reply_id,
+                report_id=report.id,
+            )
         return redirect("reports-list")
     return HttpResponseForbidden()
 
@@ -325,26 +526,110 @@ def resolve_report(request, pk):
 @login_required
 def load_resources_for_course(request):
     course_id = request.GET.get("course_id")
-    resources = models.Resource.objects.filter(course_id=course_id)
-    return JsonResponse([{"id": r.id, "title": r.title} for r in resources], safe=False)
+    return JsonResponse(reference.course_resources(course_id), safe=False)
+
+
+@login_required
+def similar_threads(request):
+    if request.method != "POST":
+        return HttpResponseForbidden()
+    course_id = request.POST.get("course") or None
+    try:
+        course_id = int(course_id) if course_id else None
+    except ValueError:
+        return JsonResponse([], safe=False)
+    matches = similarity.similar_threads(
+        course_id, request.POST.get("title", ""), request.POST.get("content", "")
+    )
+    return JsonResponse(
+        [
+            {
+                "id": thread.id,
+                "title": thread.title,
+                "url": reverse("thread-view", args=[thread.category.slug, thread.id]),
+                "similarity": round(score, 2),
+            }
+            for score, thread in matches
+        ],
+        safe=False,
+    )
+
+
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse({"pid": os.getpid(), **metrics.snapshot()})
+
+
+ACTIVITY_NAMES = {
+    models.DailyActivity.CATEGORY: reference.category_choices,
+    models.DailyActivity.COURSE: reference.course_choices,
+    models.DailyActivity.TAG: reference.tag_choices,
+}
+
+
+@staff_member_required
+def activity_dashboard(request):
+    dimension = request.GET.get("dimension")
+    if dimension not in ACTIVITY_NAMES:
+        dimension = models.DailyActivity.CATEGORY
+    try:
+        days = min(max(int(request.GET.get("days", 30)), 1), 365)
+    except ValueError:
+        days = 30
+    last_day = rollups.last_rolled_up() or timezone.localdate() - timedelta(days=1)
+    first_day = last_day - timedelta(days=days - 1)
+    by_key, by_day = rollups.activity(dimension, first_day, last_day)
+    names = dict(ACTIVITY_NAMES[dimension]())
+    for row in by_key:
+        row["name"] = names.get(row["key"], f"#{row['key']}")
+    return render(
+        request,
+        "forum/activity_dashboard.html",
+        {
+            "dimensions": models.DailyActivity.DIMENSIONS,
+            "dimension": dimension,
+            "days": days,
+            "first_day": first_day,
+            "last_day": last_day,
+            "by_key": by_key,
+            "by_day": by_day,
+        },
+    )
+
+
+@login_required
+def suggest_view(request):
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse(
+            {"threads": [], "tags": [], "categories": [], "courses": []}
+        )
+    return JsonResponse(suggest.index.suggest(query[:100]))
 
 
 @login_required
 def toggle_thread_like(request, pk):
     thread = get_object_or_404(models.Thread, pk=pk)
     if request.method == "POST":
-        upvote = models.UpvoteThread.objects.filter(
-            thread=thread, user=request.user
-        ).first()
-        if upvote:
-            upvote.delete()
-        else:
-            upvote = models.UpvoteThread(thread=thread, user=request.user)
-            upvote.save()
+        with transaction.atomic():
+            upvote = models.UpvoteThread.objects.filter(
+                thread=thread, user=request.user
+            ).first()
+            if upvote:
+                upvote.delete()
+                events.record(events.THREAD_UNLIKED, request.user, thread.id)
+            else:
+                upvote = models.UpvoteThread(thread=thread, user=request.user)
+                upvote.save()
+                events.record(events.THREAD_LIKED, request.user, thread.id)
     liked = models.UpvoteThread.objects.filter(
         thread=thread, user=request.user
     ).exists()
     upvote_count = models.UpvoteThread.objects.filter(thread=thread).count()
+    if request.method == "POST":
+        live.publish(
+            *live.thread_counts_events(thread.id, thread.reply_count, upvote_count)
+        )
     return JsonResponse({"upvote_count": upvote_count, "liked": liked})
 
 
@@ -352,14 +637,47 @@ def toggle_thread_like(request, pk):
 def toggle_reply_like(request, pk):
     reply = get_object_or_404(models.Reply, pk=pk)
     if request.method == "POST":
-        upvote = models.UpvoteReply.objects.filter(
-            reply=reply, user=request.user
-        ).first()
-        if upvote:
-            upvote.delete()
-        else:
-            upvote = models.UpvoteReply(reply=reply, user=request.user)
-            upvote.save()
+        with transaction.atomic():
+            upvote = models.UpvoteReply.objects.filter(
+                reply=reply, user=request.user
+            ).first()
+            if upvote:
+                upvote.delete()
+                events.record(
+                    events.REPLY_UNLIKED, request.user, reply.thread_id, reply.id
+                )
+            else:
+                upvote = models.UpvoteReply(reply=reply, user=request.user)
+                upvote.save()
+                events.record(
+                    events.REPLY_LIKED, request.user, reply.thread_id, reply.id
+                )
     liked = models.UpvoteReply.objects.filter(reply=reply, user=request.user).exists()
     upvote_count = models.UpvoteReply.objects.filter(reply=reply).count()
+    if request.method == "POST":
+        live.publish(live.reply_counts_event(reply.id, reply.thread_id, upvote_count))
     return JsonResponse({"upvote_count": upvote_count, "liked": liked})
+
+
+def _event_stream(request, channel):
+    # Under WSGI an open stream would hold a sync worker for as long as the
+    # page stays open, and a 204 tells EventSource not to reconnect
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    return StreamingHttpResponse(
+        live.stream(channel),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@login_required
+async def thread_events(request, pk):
+    if not await models.Thread.live.filter(pk=pk).aexists():
+        raise Http404
+    return _event_stream(request, live.thread_channel(pk))
+
+
+@login_required
+async def home_events(request):
+    return _event_stream(request, live.HOME)
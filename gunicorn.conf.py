@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# Load the application once in the master and fork workers from it, so the
+# imported modules and warmed caches are shared copy-on-write
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from studydeck.warmup import warm
+
+        warm()
+        server.log.info("Warmed URL resolvers, templates and in-memory indexes")
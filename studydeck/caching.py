@@ -0,0 +1,16 @@
+"""
+Whether a cache is shared by every worker.
+
+Generation and version keys only invalidate entries in the caches that see
+the bump. A local-memory cache lives in one process, so with several
+gunicorn workers (or a management command) an invalidation never reaches
+the others and anything cached by them has to expire on its own.
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias="default"):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,86 @@
+"""
+Send reads to the replica databases and writes to ``default``.
+
+A request (or management command) that has written anything reads from the
+primary for the rest of its run, and ``ReplicaStickinessMiddleware`` keeps a
+user's reads on the primary for ``REPLICA_STICKY_SECONDS`` after a POST that
+wrote, so they always see what they just posted whatever the replication lag.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SESSION_KEY = "_db_primary_until"
+# Sessions must never be read back stale or logins would appear to fail
+PRIMARY_ONLY_APPS = {"sessions"}
+
+_use_primary = ContextVar("use_primary", default=False)
+_wrote = ContextVar("wrote", default=False)
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def use_primary():
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (
+            not aliases
+            or _use_primary.get()
+            or _wrote.get()
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+        posting = request.method not in ("GET", "HEAD", "OPTIONS")
+        pinned = posting or request.session.get(SESSION_KEY, 0) > time.time()
+        use_primary_token = _use_primary.set(pinned)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            # Bookkeeping writes made while viewing (read markers, marking
+            # notifications read) don't need the user's next pages pinned
+            if posting and _wrote.get():
+                request.session[SESSION_KEY] = (
+                    time.time() + settings.REPLICA_STICKY_SECONDS
+                )
+        finally:
+            _use_primary.reset(use_primary_token)
+            _wrote.reset(wrote_token)
+        return response
@@ -53,12 +53,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "studydeck.db_router.ReplicaStickinessMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "forum.slow_queries.SlowQueryMiddleware",
 ]
 
 ROOT_URLCONF = "studydeck.urls"
@@ -73,6 +75,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "forum.context_processors.notification_count",
             ],
         },
     },
@@ -95,6 +98,109 @@ DATABASES = {
     }
 }
 
+# Connection reuse. With SQL_POOL=true (PostgreSQL only) each worker keeps a
+# psycopg pool, otherwise connections persist for SQL_CONN_MAX_AGE seconds
+# and are checked before being reused.
+SQL_POOL = os.environ.get("SQL_POOL", "false").lower() == "true"
+if SQL_POOL and DATABASES["default"]["ENGINE"].endswith("postgresql"):
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("SQL_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("SQL_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.environ.get("SQL_POOL_TIMEOUT", "10")),
+        }
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("SQL_CONN_MAX_AGE", "60"))
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = (
+        os.environ.get("SQL_CONN_HEALTH_CHECKS", "true").lower() == "true"
+    )
+
+# SQLite in production: WAL lets readers run alongside the single writer,
+# writes wait up to SQLITE_BUSY_TIMEOUT seconds for the lock instead of
+# failing, and transactions take the write lock up front (BEGIN IMMEDIATE)
+# so a read-then-write transaction can't deadlock on the lock upgrade.
+if DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    DATABASES["default"]["OPTIONS"] = {
+        "transaction_mode": "IMMEDIATE",
+        "timeout": float(os.environ.get("SQLITE_BUSY_TIMEOUT", "20")),
+        "init_command": ";".join(
+            [
+                "PRAGMA journal_mode=WAL",
+                "PRAGMA synchronous=NORMAL",
+                f"PRAGMA cache_size=-{os.environ.get('SQLITE_CACHE_KB', '65536')}",
+                f"PRAGMA mmap_size={os.environ.get('SQLITE_MMAP_BYTES', '268435456')}",
+                "PRAGMA temp_store=MEMORY",
+            ]
+        ),
+    }
+
+# Read replicas, space separated: hosts (host or host:port) for server
+# databases, or database files when SQL_ENGINE is sqlite, e.g. a copy of
+# db.sqlite3 to try the routing locally
+for index, replica in enumerate(os.environ.get("SQL_REPLICAS", "").split(), 1):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "TEST": {"MIRROR": "default"},
+    }
+    if DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+        DATABASES[f"replica{index}"]["NAME"] = replica
+    else:
+        host, _, port = replica.partition(":")
+        DATABASES[f"replica{index}"]["HOST"] = host
+        DATABASES[f"replica{index}"]["PORT"] = port or DATABASES["default"]["PORT"]
+
+# A cache shared by all workers. Sessions are only served from the cache
+# when it is shared, since a per-process cache would keep serving a session
+# another worker has since changed (or logged out).
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Queries slower than this (in ms) are logged with their EXPLAIN output in
+# the SlowQuery admin; 0 turns the logger off
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+# Also run SELECTs under EXPLAIN ANALYZE, executing them a second time
+SLOW_QUERY_EXPLAIN_ANALYZE = (
+    os.environ.get("SLOW_QUERY_EXPLAIN_ANALYZE", "false").lower() == "true"
+)
+
+# Posts longer than this are rendered in a process pool of
+# MARKDOWN_POOL_WORKERS, and shown as plain text if that takes longer than
+# MARKDOWN_RENDER_TIMEOUT seconds
+MARKDOWN_INLINE_MAX_CHARS = int(os.environ.get("MARKDOWN_INLINE_MAX_CHARS", "20000"))
+MARKDOWN_POOL_WORKERS = int(os.environ.get("MARKDOWN_POOL_WORKERS", "2"))
+MARKDOWN_RENDER_TIMEOUT = float(os.environ.get("MARKDOWN_RENDER_TIMEOUT", "2"))
+
+# Seconds a home listing page (its thread ids and total count) is served
+# from the cache; 0 turns the listing cache off
+LISTING_CACHE_TIMEOUT = float(os.environ.get("LISTING_CACHE_TIMEOUT", "10"))
+
+# forum.events.Consumer subclasses fed by the consume_events command, and
+# the days prune_events keeps events that every consumer has processed
+FORUM_EVENT_CONSUMERS = ["forum.consumers.UserActivityConsumer"]
+FORUM_EVENT_RETENTION_DAYS = int(os.environ.get("FORUM_EVENT_RETENTION_DAYS", "90"))
+
+# Live updates (forum.live). Streams reach other workers through Redis when
+# there is one, otherwise each worker polls the database every
+# LIVE_POLL_INTERVAL seconds
+LIVE_REDIS_URL = os.environ.get("REDIS_URL")
+LIVE_TRANSPORT = os.environ.get(
+    "LIVE_TRANSPORT",
+    "forum.live.RedisTransport" if LIVE_REDIS_URL else "forum.live.PollingTransport",
+)
+LIVE_POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL", "2"))
+LIVE_KEEPALIVE = float(os.environ.get("LIVE_KEEPALIVE", "15"))
+
+DATABASE_ROUTERS = ["studydeck.db_router.PrimaryReplicaRouter"]
+# How long a user's reads stay on the primary after they write something
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "15"))
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -133,8 +239,20 @@ ACCOUNT_DEFAULT_HTTP_PROTOCOL = "http"
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # Fingerprinted names with .gz and .br copies, served by nginx with
+    # immutable caching (see nginx/nginx.conf)
+    "staticfiles": {
+        "BACKEND": "studydeck.storage.CompressedManifestStaticFilesStorage"
+    },
+}
+
+MEDIA_URL = "/media/"
+MEDIA_ROOT = BASE_DIR / "mediafiles"
+
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
+    "accounts.permissions.CachedPermissionBackend",
     "allauth.account.auth_backends.AuthenticationBackend",
 ]
 
@@ -0,0 +1,57 @@
+"""
+Static files storage for production.
+
+Names are fingerprinted by ManifestStaticFilesStorage, so nginx can cache
+them forever, and every text asset gets .gz and .br copies written next to it
+at collectstatic time for nginx's gzip_static and brotli_static.
+"""
+
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (".css", ".js", ".map", ".svg", ".json", ".txt", ".html", ".ico")
+# Below this the compressed copy isn't worth a second file
+MIN_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    compress_workers = None
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # zlib and brotli release the GIL while compressing, so threads are
+        # enough to use every core
+        targets = sorted(name for name in names if name.endswith(COMPRESSIBLE))
+        with ThreadPoolExecutor(self.compress_workers) as executor:
+            list(executor.map(self.compress, targets))
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_SIZE:
+            return
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            if len(compressed) >= len(data):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self.save(name + suffix, ContentFile(compressed))
@@ -15,6 +15,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
@@ -24,3 +26,6 @@ urlpatterns = [
     path("", include("forum.urls")),
     path("login/", include("accounts.urls")),
 ]
+
+# In production nginx serves MEDIA_ROOT directly
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
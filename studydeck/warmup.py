@@ -0,0 +1,74 @@
+"""
+Warm per-process state before gunicorn forks its workers.
+
+With ``preload_app`` enabled the master imports the project once and runs
+``warm()``; workers forked afterwards share those pages copy-on-write instead
+of each rebuilding them on their first requests.
+"""
+
+import gc
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+
+
+def warm_url_resolvers():
+    resolver = get_resolver()
+    # Accessing reverse_dict populates the resolver's lookup tables
+    resolver.reverse_dict
+
+
+def warm_templates():
+    # Only the project's own templates; third-party apps ship templates for
+    # features (and tag libraries) that aren't installed here
+    for template_dir in get_app_template_dirs("templates"):
+        if not Path(template_dir).is_relative_to(settings.BASE_DIR):
+            continue
+        for path in Path(template_dir).rglob("*.html"):
+            get_template(path.relative_to(template_dir).as_posix())
+
+
+def warm_markdown():
+    from forum.templatetags.markdown_extras import markdownify
+
+    markdownify("**warm**")
+
+
+def warm_reference_caches():
+    from forum import reference
+
+    reference.warm()
+
+
+def warm_similarity_index():
+    from forum import similarity
+
+    similarity.index.build()
+
+
+def warm_suggestion_index():
+    from forum import suggest
+
+    suggest.index.build()
+
+
+def warm():
+    warm_url_resolvers()
+    warm_templates()
+    warm_markdown()
+    warm_reference_caches()
+    warm_similarity_index()
+    warm_suggestion_index()
+    # Sockets must not be shared with forked workers
+    connections.close_all()
+    for connection in connections.all():
+        if hasattr(connection, "close_pool"):
+            connection.close_pool()
+    # Keep everything allocated so far out of the collector, otherwise the
+    # first GC pass in each worker touches (and copies) every shared page
+    gc.collect()
+    gc.freeze()